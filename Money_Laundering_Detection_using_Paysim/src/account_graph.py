@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+
+# ----------------------------------------------------
+# Account transaction graph
+# ----------------------------------------------------
+# Accounts are nodes and src -> dst transactions are edges. Accounts are
+# factorized to int32 codes, so the graph is plain CSR arrays: repeated
+# transactions between the same pair collapse into one edge whose weight is
+# their summed amount. Per account:
+#   out_degree / in_degree        distinct counterparties sent to / received from
+#   out_txn_count / in_txn_count  transactions sent / received
+#   out_amount / in_amount        amount sent / received
+#   component_id, component_size  weakly connected component
+#   is_fraud_account              party to at least one is_fraud transaction
+#   fraud_hop_distance            undirected hops to the nearest fraud account
+#                                 (0 = itself; NULL beyond max_hops)
+#   fraud_exposure_{k}hop         share of an amount-weighted k-step walk over
+#                                 the undirected graph that ends on a fraud
+#                                 account (0..1)
+# Every hop is one sparse matrix-vector product, so a pass over the graph costs
+# O(edges) and max_hops passes are enough.
+
+GRAPH_MAX_HOPS = 3
+GRAPH_INPUT_COLS = ["transaction_id", "src_account_id", "dst_account_id", "transaction_amount", "is_fraud"]
+
+GRAPH_ACCOUNT_TABLE = "account_graph_features"
+GRAPH_COMPONENT_TABLE = "account_graph_components"
+GRAPH_COMPONENT_SCHEMA = [
+    ("component_id", "INTEGER PRIMARY KEY"),
+    ("n_accounts", "INTEGER"),
+    ("n_edges", "INTEGER"),
+    ("n_transactions", "INTEGER"),
+    ("total_amount", "REAL"),
+    ("n_fraud_accounts", "INTEGER"),
+    ("n_fraud_transactions", "INTEGER"),
+]
+
+
+def exposure_cols(max_hops: int = GRAPH_MAX_HOPS):
+    return [f"fraud_exposure_{k}hop" for k in range(1, max_hops + 1)]
+
+
+def graph_account_schema(max_hops: int = GRAPH_MAX_HOPS):
+    return [
+        ("account_id", "TEXT PRIMARY KEY"),
+        ("out_degree", "INTEGER"),
+        ("in_degree", "INTEGER"),
+        ("out_txn_count", "INTEGER"),
+        ("in_txn_count", "INTEGER"),
+        ("out_amount", "REAL"),
+        ("in_amount", "REAL"),
+        ("component_id", "INTEGER"),
+        ("component_size", "INTEGER"),
+        ("is_fraud_account", "INTEGER"),
+        ("fraud_hop_distance", "INTEGER"),
+    ] + [(c, "REAL") for c in exposure_cols(max_hops)]
+
+
+def build_adjacency(src, dst, amount, n_accounts: int) -> sparse.csr_matrix:
+    """Directed, amount-weighted CSR adjacency; duplicate pairs are summed."""
+    return sparse.csr_matrix((amount, (src, dst)), shape=(n_accounts, n_accounts))
+
+
+def fraud_hop_distance(undirected: sparse.csr_matrix, is_fraud_account, max_hops: int):
+    """Multi-source BFS from the fraud accounts; -1 where none is within max_hops."""
+    # Structure only: a hop is a hop whatever the amount
+    pattern = undirected.copy()
+    pattern.data = np.ones_like(pattern.data, dtype=np.float32)
+
+    distance = np.full(undirected.shape[0], -1, dtype=np.int32)
+    distance[is_fraud_account] = 0
+    frontier = is_fraud_account.astype(np.float32)
+    for hop in range(1, max_hops + 1):
+        reached = (pattern @ frontier > 0) & (distance < 0)
+        if not reached.any():
+            break
+        distance[reached] = hop
+        frontier = reached.astype(np.float32)
+    return distance
+
+
+def fraud_exposure(undirected: sparse.csr_matrix, is_fraud_account, max_hops: int):
+    """fraud_exposure_{k}hop for k = 1..max_hops (amount-weighted random walk)."""
+    strength = np.asarray(undirected.sum(axis=1)).ravel()
+    inv_strength = np.divide(1.0, strength, out=np.zeros_like(strength), where=strength > 0)
+    transition = sparse.diags(inv_strength) @ undirected
+
+    out = {}
+    exposure = is_fraud_account.astype(np.float64)
+    for col in exposure_cols(max_hops):
+        exposure = transition @ exposure
+        out[col] = exposure
+    return out
+
+
+def compute_account_graph(df: pd.DataFrame, max_hops: int = GRAPH_MAX_HOPS):
+    """GRAPH_INPUT_COLS frame -> (account features frame, component aggregates frame)."""
+    codes, account_ids = pd.factorize(pd.concat([df["src_account_id"], df["dst_account_id"]], ignore_index=True))
+    n_rows = len(df)
+    n_accounts = len(account_ids)
+    src = codes[:n_rows].astype(np.int32)
+    dst = codes[n_rows:].astype(np.int32)
+    amount = df["transaction_amount"].to_numpy(dtype=np.float64)
+    fraud_txn = df["is_fraud"].to_numpy() == 1
+
+    adjacency = build_adjacency(src, dst, amount, n_accounts)
+    undirected = (adjacency + adjacency.T).tocsr()
+
+    n_components, component = connected_components(adjacency, directed=True, connection="weak")
+    component_size = np.bincount(component, minlength=n_components)
+
+    is_fraud_account = np.zeros(n_accounts, dtype=bool)
+    is_fraud_account[src[fraud_txn]] = True
+    is_fraud_account[dst[fraud_txn]] = True
+    distance = fraud_hop_distance(undirected, is_fraud_account, max_hops)
+
+    accounts = pd.DataFrame({
+        "account_id": np.asarray(account_ids, dtype=object),
+        "out_degree": np.diff(adjacency.indptr),
+        "in_degree": np.diff(adjacency.tocsc().indptr),
+        "out_txn_count": np.bincount(src, minlength=n_accounts),
+        "in_txn_count": np.bincount(dst, minlength=n_accounts),
+        "out_amount": np.bincount(src, weights=amount, minlength=n_accounts),
+        "in_amount": np.bincount(dst, weights=amount, minlength=n_accounts),
+        "component_id": component,
+        "component_size": component_size[component],
+        "is_fraud_account": is_fraud_account.astype(np.int8),
+        # NaN is stored as NULL (and whole floats as integers in an INTEGER column)
+        "fraud_hop_distance": np.where(distance >= 0, distance, np.nan),
+    })
+    for col, values in fraud_exposure(undirected, is_fraud_account, max_hops).items():
+        accounts[col] = values
+
+    # Edges are the distinct directed pairs, i.e. the CSR non-zeros (by source row)
+    edge_rows = np.repeat(np.arange(n_accounts), np.diff(adjacency.indptr))
+    txn_component = component[src]
+    components = pd.DataFrame({
+        "component_id": np.arange(n_components),
+        "n_accounts": component_size,
+        "n_edges": np.bincount(component[edge_rows], minlength=n_components),
+        "n_transactions": np.bincount(txn_component, minlength=n_components),
+        "total_amount": np.bincount(txn_component, weights=amount, minlength=n_components),
+        "n_fraud_accounts": np.bincount(component, weights=is_fraud_account, minlength=n_components).astype(np.int64),
+        "n_fraud_transactions": np.bincount(txn_component[fraud_txn], minlength=n_components),
+    })
+    return accounts, components
@@ -0,0 +1,138 @@
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from db_indexes import table_exists
+from multi_aggregate import AGG_PROFILES, MultiGroupAggregator, grouping_sql, required_columns, where_sql
+from scoring_engine import iter_keyset_chunks
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+parser = argparse.ArgumentParser(
+    description="Benchmark the single-scan aggregation engine against one GROUP BY per grouping."
+)
+parser.add_argument("--profile", choices=sorted(AGG_PROFILES), action="append",
+                    help="Profile(s) to benchmark (default: all whose source table exists).")
+parser.add_argument("--chunk-rows", type=int, default=500000, help="Rows per keyset chunk for the engine.")
+parser.add_argument("--repeats", type=int, default=3, help="Timed runs per method (best is reported).")
+args = parser.parse_args()
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_url = f"sqlite:///{os.path.join(BASE_DIR, DB_PATH)}"
+
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        available = [name for name, profile in AGG_PROFILES.items() if table_exists(conn, profile["table"])]
+except Exception as e:
+    print("❌ Failed to connect to SQLite.")
+    print(e)
+    sys.exit(1)
+
+profiles = args.profile or available
+missing = [name for name in profiles if name not in available]
+if missing or not profiles:
+    print(f"ERROR: source table missing for profile(s) {missing or sorted(AGG_PROFILES)}.")
+    sys.exit(1)
+
+
+# ----------------------------------------------------
+# 2. The two methods
+# ----------------------------------------------------
+def run_sql(conn, profile):
+    # One statement, i.e. one scan of the source, per grouping
+    return {name: pd.read_sql(text(grouping_sql(profile, name)), conn) for name in profile["groupings"]}
+
+
+def run_engine(conn, profile):
+    # One keyset pass over just the needed (and matching) rows fills every grouping
+    aggregator = MultiGroupAggregator(profile)
+    for df_chunk, _ in iter_keyset_chunks(conn, args.chunk_rows, columns=required_columns(profile),
+                                          table=profile["table"], where=where_sql(profile)):
+        aggregator.update(df_chunk)
+    return aggregator.results()
+
+
+def best_of(fn, conn, profile):
+    timings = []
+    for _ in range(max(1, args.repeats)):
+        start = time.perf_counter()
+        result = fn(conn, profile)
+        timings.append(time.perf_counter() - start)
+    return result, min(timings)
+
+
+def same_result(expected: pd.DataFrame, actual: pd.DataFrame, key: str) -> bool:
+    if len(expected) != len(actual) or list(expected.columns) != list(actual.columns):
+        return False
+    expected = expected.sort_values(key, na_position="first", ignore_index=True)
+    actual = actual.sort_values(key, na_position="first", ignore_index=True)
+    for col in expected.columns:
+        a, b = expected[col], actual[col]
+        if pd.api.types.is_float_dtype(a) or pd.api.types.is_float_dtype(b):
+            if not np.allclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float), rtol=1e-9, equal_nan=True):
+                return False
+        elif not (a.isna().equals(b.isna()) and (a[a.notna()].astype(str) == b[b.notna()].astype(str)).all()):
+            return False
+    return True
+
+
+# ----------------------------------------------------
+# 3. Benchmark
+# ----------------------------------------------------
+rows = []
+failed = False
+with engine.connect() as conn:
+    for name in profiles:
+        profile = AGG_PROFILES[name]
+        n_source = conn.execute(text(f"SELECT COUNT(*) FROM {profile['table']};")).scalar()
+        print(f"\nProfile '{name}': {n_source:,} rows in {profile['table']}, "
+              f"{len(profile['groupings'])} groupings")
+
+        sql_result, sql_seconds = best_of(run_sql, conn, profile)
+        engine_result, engine_seconds = best_of(run_engine, conn, profile)
+
+        for grouping, spec in profile["groupings"].items():
+            ok = same_result(sql_result[grouping], engine_result[grouping], spec["key"])
+            failed |= not ok
+            print(f"  {'✅' if ok else '❌'} {grouping}: {len(sql_result[grouping]):,} groups "
+                  f"{'match' if ok else 'DIFFER'}")
+
+        rows.append({
+            "profile": name,
+            "source_rows": n_source,
+            "sql_3_scans_s": round(sql_seconds, 3),
+            "engine_1_scan_s": round(engine_seconds, 3),
+            "speedup": round(sql_seconds / engine_seconds, 2) if engine_seconds else float("nan"),
+        })
+
+print()
+print(pd.DataFrame(rows).to_string(index=False))
+
+if failed:
+    print("❌ The engine's results differ from the SQL GROUP BYs.")
+    sys.exit(1)
+print("🎉 Aggregation benchmark finished.")
@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+import numpy as np
+from sqlalchemy import create_engine, text
+import joblib
+
+from feature_encoder import encode, get_encoder
+from flat_forest import FlatForest
+from scoring_engine import iter_scoring_chunks, rows_per_sec
+
+# ----------------------------------------------------
+# 1. Load environment variables from .env
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_full_path = os.path.join(BASE_DIR, DB_PATH)
+db_url = f"sqlite:///{db_full_path}"
+print(f"Using SQLite database at: {db_full_path}")
+
+# ----------------------------------------------------
+# 2. Load the RandomForest and a sample of rows
+# ----------------------------------------------------
+model_path = os.path.join(BASE_DIR, "models", os.getenv("MODEL_FILE", "rf_aml_model.pkl"))
+
+if not os.path.exists(model_path):
+    print(f"ERROR: Model file not found at {model_path}")
+    sys.exit(1)
+
+model_bundle = joblib.load(model_path)
+model = model_bundle["model"]
+encoder = get_encoder(model_bundle)
+# Compare single-threaded against single-threaded
+if hasattr(model, "n_jobs"):
+    model.n_jobs = 1
+
+bench_rows = int(os.getenv("BENCH_ROWS", "100000"))
+threshold = 0.8
+
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        df_chunk, _ = next(iter_scoring_chunks(conn, encoder, bench_rows))
+except StopIteration:
+    print("ERROR: transaction_features is empty.")
+    sys.exit(1)
+except Exception as e:
+    print("❌ Failed to read transaction_features.")
+    print(e)
+    sys.exit(1)
+
+X = encode(df_chunk, encoder)
+print(f"Benchmark rows: {len(X):,}")
+
+try:
+    start = time.perf_counter()
+    flat = FlatForest(model)
+    flatten_seconds = time.perf_counter() - start
+except (AttributeError, ValueError) as e:
+    print(f"ERROR: {model_path} is not a flattenable RandomForest: {e}")
+    sys.exit(1)
+
+print(f"Flattened {flat.n_trees} trees / {flat.node_count:,} nodes in {flatten_seconds * 1000:.1f} ms")
+
+# ----------------------------------------------------
+# 3. Parity against sklearn predict_proba
+# ----------------------------------------------------
+# Same leaves are reached, so the only difference allowed is float summation
+# order; the suspicious/not-suspicious decision must match on every row.
+expected = model.predict_proba(X)
+actual = flat.predict_proba(X)
+
+max_diff = float(np.abs(expected - actual).max()) if len(X) else 0.0
+flipped = int(((expected[:, 1] >= threshold) != (actual[:, 1] >= threshold)).sum())
+print(f"Parity: max |sklearn - flat| = {max_diff:.3e}, decisions flipped at {threshold}: {flipped}")
+
+if max_diff > 1e-9 or flipped:
+    print("❌ Flattened forest does not match sklearn.")
+    sys.exit(1)
+
+print("✅ Flattened forest matches sklearn.")
+
+# ----------------------------------------------------
+# 4. Throughput by batch size
+# ----------------------------------------------------
+# Small batches are the online-scoring case (per-estimator overhead
+# dominates); large ones are the batch scorer's chunks.
+print(f"\n{'batch':>8} {'sklearn rows/s':>16} {'flat rows/s':>14} {'speedup':>8}")
+
+
+def time_batches(predict, batch_size: int, n_rows: int) -> float:
+    start = time.perf_counter()
+    for i in range(0, n_rows, batch_size):
+        predict(X[i:i + batch_size])
+    return time.perf_counter() - start
+
+
+for batch_size in (1, 10, 100, 1000, 10000, len(X)):
+    if batch_size < 1 or batch_size > len(X):
+        continue
+    # Enough rows for a stable timing without hours of 1-row calls
+    n_rows = min(len(X), max(batch_size, 200 * batch_size if batch_size < 100 else 20000))
+    sk_seconds = time_batches(model.predict_proba, batch_size, n_rows)
+    flat_seconds = time_batches(flat.predict_proba, batch_size, n_rows)
+    print(
+        f"{batch_size:>8} {rows_per_sec(n_rows, sk_seconds):>16,.0f} "
+        f"{rows_per_sec(n_rows, flat_seconds):>14,.0f} {sk_seconds / flat_seconds:>7.2f}x"
+    )
+
+print("\n🎉 Flat forest benchmark finished.")
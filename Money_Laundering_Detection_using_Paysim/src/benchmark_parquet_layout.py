@@ -0,0 +1,83 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+from parquet_store import has_dataset, read_table, scan_stats
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+# Compare Parquet layouts of the same data, e.g. a flat write and a
+# partitioned/sorted one from spark_clean_paysim.py:
+#   python src/spark_clean_paysim.py --output data/spark/clean_flat
+#   python src/spark_clean_paysim.py --partition-by day --sort-by step --max-records-per-file 1000000 --row-group-mb 32
+#   python src/benchmark_parquet_layout.py --datasets data/spark/clean_flat data/spark/clean_transactions
+parser = argparse.ArgumentParser(description="Report bytes scanned by typical filters on Parquet layouts.")
+parser.add_argument("--datasets", nargs="+", default=[os.path.join("data", "spark", "clean_transactions")],
+                    help="Dataset directories, relative to the project (first one sets the query values).")
+parser.add_argument("--days", type=int, default=7, help="Window of the 'last N days' query.")
+parser.add_argument("--types", nargs="+", default=["TRANSFER", "CASH_OUT"], help="Types for the type query.")
+args = parser.parse_args()
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+paths = [os.path.join(PROJECT_DIR, d) for d in args.datasets]
+missing = [p for p in paths if not has_dataset(p)]
+if missing:
+    print(f"ERROR: no Parquet dataset at {missing}")
+    sys.exit(1)
+
+COLUMNS = ["transaction_id", "step", "transaction_type", "transaction_amount",
+           "src_account_id", "dst_account_id", "is_fraud"]
+
+# ----------------------------------------------------
+# 1. Queries
+# ----------------------------------------------------
+# Filters are written the way a reader would: on step, plus the event_day
+# partition column when the layout has one (so directories can be pruned).
+first = ds.dataset(paths[0], format="parquet", partitioning="hive")
+max_step = pc.max(first.to_table(columns=["step"]).column("step")).as_py()
+account = first.head(1, columns=["src_account_id"]).column("src_account_id")[0].as_py()
+first_step = max_step - 24 * args.days + 1
+
+
+def queries(schema_names):
+    last_days = [("step", ">=", first_step)]
+    if "event_day" in schema_names:
+        last_days.append(("event_day", ">=", first_step // 24))
+    return {
+        "full scan": None,
+        f"last {args.days} days": last_days,
+        "/".join(args.types): [("transaction_type", "in", args.types)],
+        "one src account": [("src_account_id", "=", account)],
+    }
+
+
+# ----------------------------------------------------
+# 2. Measure each layout
+# ----------------------------------------------------
+rows = []
+for path, name in zip(paths, args.datasets):
+    schema_names = ds.dataset(path, format="parquet", partitioning="hive").schema.names
+    for query, filters in queries(schema_names).items():
+        stats = scan_stats(path, columns=COLUMNS, filters=filters)
+        start = time.perf_counter()
+        n_rows = len(read_table(path, columns=COLUMNS, filters=filters))
+        rows.append({
+            "dataset": name,
+            "query": query,
+            "rows": n_rows,
+            "files": f"{stats['files_read']}/{stats['files']}",
+            "row_groups": f"{stats['row_groups_read']}/{stats['row_groups']}",
+            "mb_scanned": round(stats["bytes_scanned"] / 1e6, 2),
+            "pct_of_dataset": round(100 * stats["bytes_scanned"] / stats["bytes_total"], 1),
+            "read_s": round(time.perf_counter() - start, 3),
+        })
+
+print(pd.DataFrame(rows).to_string(index=False))
+print("\nmb_scanned: compressed column chunks left after partition and row-group pruning.")
+print("🎉 Parquet layout benchmark finished.")
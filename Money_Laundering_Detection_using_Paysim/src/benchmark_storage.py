@@ -0,0 +1,96 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from dotenv import load_dotenv
+import pandas as pd
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+# Runs the real pandas stages once per storage backend and times them:
+#   export_parquet (parquet only: the one-off SQLite -> Parquet copy)
+#   train_model -> score_transactions -> export_for_bi
+# Like running the pipeline, this rewrites the stages' outputs (the model,
+# suspicious_transactions, data/bi/). Parquet runs first, so the final state
+# is that of an ordinary SQLite run.
+parser = argparse.ArgumentParser(description="Benchmark pipeline time on SQLite vs Parquet storage.")
+parser.add_argument("--skip-train", action="store_true", help="Leave train_model.py out (keeps the current model).")
+parser.add_argument("--repeats", type=int, default=1, help="Runs per backend (best per stage is reported).")
+args = parser.parse_args()
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+BASE_DIR = os.path.dirname(SRC_DIR)
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+stages = ["train_model", "score_transactions", "export_for_bi"]
+if args.skip_train:
+    stages.remove("train_model")
+
+# Same work for both backends: full serial rescore
+base_env = dict(os.environ, SCORE_INCREMENTAL="0", SCORE_WORKERS="1", SCORE_PIPELINE="0")
+
+
+def run_stage(stage: str, backend: str) -> float:
+    # Scripts read .env via load_dotenv, which doesn't override these
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, os.path.join(SRC_DIR, f"{stage}.py")],
+        env=dict(base_env, STORAGE_BACKEND=backend), capture_output=True, text=True,
+    )
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        print(f"❌ {stage} failed with STORAGE_BACKEND={backend}:")
+        print(result.stdout[-2000:])
+        print(result.stderr[-2000:])
+        sys.exit(1)
+    return seconds
+
+
+# ----------------------------------------------------
+# 2. Run the stages per backend
+# ----------------------------------------------------
+timings = {}
+for backend in ("parquet", "sqlite"):
+    backend_stages = (["export_parquet"] if backend == "parquet" else []) + stages
+    for repeat in range(max(1, args.repeats)):
+        for stage in backend_stages:
+            seconds = run_stage(stage, backend)
+            key = (stage, backend)
+            timings[key] = min(timings.get(key, seconds), seconds)
+            print(f"{backend:<8} {stage:<20} {seconds:7.2f}s")
+
+# ----------------------------------------------------
+# 3. Report
+# ----------------------------------------------------
+rows = []
+for stage in ["export_parquet"] + stages:
+    sqlite_s = timings.get((stage, "sqlite"))
+    parquet_s = timings.get((stage, "parquet"))
+    rows.append({
+        "stage": stage,
+        "sqlite_s": sqlite_s,
+        "parquet_s": parquet_s,
+        "speedup": round(sqlite_s / parquet_s, 2) if sqlite_s and parquet_s else None,
+    })
+
+sqlite_total = sum(timings.get((s, "sqlite"), 0.0) for s in stages)
+parquet_total = sum(timings.get((s, "parquet"), 0.0) for s in stages)
+rows.append({"stage": "total (excl. export)", "sqlite_s": sqlite_total, "parquet_s": parquet_total,
+             "speedup": round(sqlite_total / parquet_total, 2) if parquet_total else None})
+
+print()
+print(pd.DataFrame(rows).round(2).to_string(index=False))
+print("\nStage times include interpreter start-up and imports (same for both backends).")
+print("🎉 Storage benchmark finished.")
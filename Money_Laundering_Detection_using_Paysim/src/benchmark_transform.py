@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from transform_sql import TRANSFORM_ENGINES, build_clean_sql
+
+# ----------------------------------------------------
+# 1. Load environment variables from .env
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_full_path = os.path.join(BASE_DIR, DB_PATH)
+db_url = f"sqlite:///{db_full_path}"
+print(f"Using SQLite database at: {db_full_path}")
+
+# ----------------------------------------------------
+# 2. Connect to SQLite
+# ----------------------------------------------------
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print("✅ Successfully connected to SQLite database.")
+except Exception as e:
+    print("❌ Failed to connect to SQLite.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 3. Benchmark the clean_transactions engines
+# ----------------------------------------------------
+# Builds the clean table once per engine (into bench_clean_<engine>) from the
+# full raw_transactions table, times each build, and checks every engine's
+# output is identical to the legacy SQL. clean_transactions is not touched.
+with engine.connect() as conn:
+    n_rows = conn.execute(text("SELECT COUNT(*) FROM raw_transactions;")).scalar()
+
+print(f"raw_transactions rows: {n_rows:,}")
+
+timings = {}
+
+for name in ("legacy",) + tuple(e for e in TRANSFORM_ENGINES if e != "legacy"):
+    bench_table = f"bench_clean_{name}"
+    script = build_clean_sql(name, table=bench_table)
+
+    print(f"\nBuilding {bench_table} with engine '{name}'...")
+    try:
+        t0 = time.perf_counter()
+        with engine.begin() as conn:
+            for statement in script.strip().split(";"):
+                stmt = statement.strip()
+                if stmt:
+                    conn.execute(text(stmt + ";"))
+        timings[name] = time.perf_counter() - t0
+    except Exception as e:
+        print(f"❌ Engine '{name}' failed.")
+        print(e)
+        sys.exit(1)
+
+    print(f"✅ {name}: {timings[name]:.2f}s ({n_rows / max(timings[name], 1e-9):,.0f} rows/s)")
+
+# ----------------------------------------------------
+# 4. Check outputs match the legacy engine
+# ----------------------------------------------------
+print("\nComparing outputs against legacy...")
+mismatch = False
+
+with engine.connect() as conn:
+    for name in timings:
+        if name == "legacy":
+            continue
+        diff = conn.execute(text(f"""
+        SELECT
+            (SELECT COUNT(*) FROM (SELECT * FROM bench_clean_{name} EXCEPT SELECT * FROM bench_clean_legacy)) +
+            (SELECT COUNT(*) FROM (SELECT * FROM bench_clean_legacy EXCEPT SELECT * FROM bench_clean_{name}));
+        """)).scalar()
+        status = "identical" if diff == 0 else f"{diff} differing rows"
+        mismatch = mismatch or diff != 0
+        print(f"  {name:<7} vs legacy: {status}")
+
+with engine.begin() as conn:
+    for name in timings:
+        conn.execute(text(f"DROP TABLE IF EXISTS bench_clean_{name};"))
+
+# ----------------------------------------------------
+# 5. Summary
+# ----------------------------------------------------
+print("\nEngine    seconds   speedup vs legacy")
+for name, seconds in timings.items():
+    print(f"{name:<8} {seconds:8.2f}   {timings['legacy'] / max(seconds, 1e-9):6.2f}x")
+
+if mismatch:
+    print("❌ At least one engine's output differs from the legacy SQL.")
+    sys.exit(1)
+
+print("🎉 Transform benchmark finished.")
@@ -0,0 +1,151 @@
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from account_graph import (
+    GRAPH_ACCOUNT_TABLE,
+    GRAPH_COMPONENT_SCHEMA,
+    GRAPH_COMPONENT_TABLE,
+    GRAPH_INPUT_COLS,
+    GRAPH_MAX_HOPS,
+    compute_account_graph,
+    graph_account_schema,
+)
+from db_indexes import apply_indexes
+from scoring_engine import iter_keyset_chunks
+import sqlite_bulk
+
+# ----------------------------------------------------
+# 1. Load environment variables from .env
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_full_path = os.path.join(BASE_DIR, DB_PATH)
+db_url = f"sqlite:///{db_full_path}"
+print(f"Using SQLite database at: {db_full_path}")
+
+# GRAPH_MAX_HOPS: how far fraud_hop_distance / fraud_exposure_{k}hop reach
+max_hops = int(os.getenv("GRAPH_MAX_HOPS", str(GRAPH_MAX_HOPS)))
+chunk_rows = int(os.getenv("GRAPH_CHUNK_ROWS", "500000"))
+
+# ----------------------------------------------------
+# 2. Connect to SQLite
+# ----------------------------------------------------
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print("✅ Successfully connected to SQLite database.")
+except Exception as e:
+    print("❌ Failed to connect to SQLite.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 3. Read the edge list from clean_transactions
+# ----------------------------------------------------
+# Only the columns the graph needs (transaction_id is the keyset key)
+print("Reading src/dst accounts, amounts and fraud labels from clean_transactions...")
+start = time.perf_counter()
+try:
+    with engine.connect() as conn:
+        parts = [
+            df_chunk for df_chunk, _ in iter_keyset_chunks(
+                conn, chunk_rows, columns=GRAPH_INPUT_COLS,
+                dtype={"transaction_amount": "float64", "is_fraud": "int8"},
+                table="clean_transactions",
+            )
+        ]
+    df_edges = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=GRAPH_INPUT_COLS)
+    del parts
+except Exception as e:
+    print("❌ Failed to read clean_transactions.")
+    print(e)
+    sys.exit(1)
+
+if df_edges.empty:
+    print("ERROR: clean_transactions is empty.")
+    sys.exit(1)
+
+read_seconds = time.perf_counter() - start
+print(f"✅ Read {len(df_edges):,} transactions in {read_seconds:.1f}s")
+
+# ----------------------------------------------------
+# 4. Build the graph and compute account features
+# ----------------------------------------------------
+# Integer-coded accounts, amount-weighted CSR adjacency, degrees, weakly
+# connected components and 1..max_hops fraud exposure (see account_graph.py)
+print(f"Building account graph (fraud exposure up to {max_hops} hops)...")
+start = time.perf_counter()
+try:
+    df_accounts, df_components = compute_account_graph(df_edges, max_hops)
+except Exception as e:
+    print("❌ Failed to compute account graph features.")
+    print(e)
+    sys.exit(1)
+del df_edges
+
+compute_seconds = time.perf_counter() - start
+n_edges = int(df_components["n_edges"].sum())
+print(f"✅ {len(df_accounts):,} accounts, {n_edges:,} edges, {len(df_components):,} components "
+      f"in {compute_seconds:.1f}s")
+
+# ----------------------------------------------------
+# 5. Write account_graph_features and account_graph_components
+# ----------------------------------------------------
+print(f"Writing '{GRAPH_ACCOUNT_TABLE}' and '{GRAPH_COMPONENT_TABLE}'...")
+start = time.perf_counter()
+try:
+    conn = sqlite_bulk.connect(db_full_path)
+    # Shared warehouse DB: with a journal a crash rolls back this rebuild
+    with sqlite_bulk.fast_load_pragmas(conn, journal_mode="WAL", synchronous="NORMAL"):
+        conn.execute("BEGIN;")
+        for table, schema, df in (
+            (GRAPH_ACCOUNT_TABLE, graph_account_schema(max_hops), df_accounts),
+            (GRAPH_COMPONENT_TABLE, GRAPH_COMPONENT_SCHEMA, df_components),
+        ):
+            sqlite_bulk.create_table(conn, table, schema)
+            insert_cols = [name for name, _ in schema]
+            for i in range(0, len(df), chunk_rows):
+                sqlite_bulk.insert_frame(conn, table, df.iloc[i:i + chunk_rows], insert_cols)
+        conn.execute("COMMIT;")
+    conn.close()
+
+    with engine.begin() as conn:
+        apply_indexes(conn, GRAPH_ACCOUNT_TABLE)
+except Exception as e:
+    print("❌ Failed to write account graph tables.")
+    print(e)
+    sys.exit(1)
+
+print(f"✅ Tables written in {time.perf_counter() - start:.1f}s")
+
+# ----------------------------------------------------
+# 6. Summary
+# ----------------------------------------------------
+n_fraud = int(df_accounts["is_fraud_account"].sum())
+exposed = df_accounts["fraud_hop_distance"].between(1, max_hops).sum()
+print(f"Fraud accounts: {n_fraud:,} | accounts within {max_hops} hops of one: {exposed:,}")
+
+top = df_components.sort_values(["n_fraud_accounts", "n_accounts"], ascending=False).head(5)
+print("Components with the most fraud accounts:")
+print(top.to_string(index=False))
+
+print("🎉 Account graph stage finished successfully.")
@@ -1,9 +1,25 @@
+import argparse
 import os
 import sys
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 
+from db_indexes import apply_indexes, table_exists
+from multi_aggregate import AGG_PROFILES, MultiGroupAggregator, required_columns
+from scoring_engine import iter_keyset_chunks, read_watermark
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+parser = argparse.ArgumentParser(description="Build the suspicious-activity aggregate tables.")
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Merge only suspicious rows added since the last run (default: AGG_INCREMENTAL from .env).",
+)
+args = parser.parse_args()
+
 # ----------------------------------------------------
 # 1. Load environment variables
 # ----------------------------------------------------
@@ -21,6 +37,15 @@ if not DB_PATH:
     print("ERROR: DB_PATH is not set in .env")
     sys.exit(1)
 
+incremental = args.incremental or os.getenv("AGG_INCREMENTAL", "0") == "1"
+# Full builds: "sql" (one GROUP BY upsert per table) or "numpy" (one scan of
+# suspicious_transactions fills all three, see multi_aggregate.py)
+agg_engine = os.getenv("AGG_ENGINE", "sql")
+if agg_engine not in ("sql", "numpy"):
+    print(f"ERROR: AGG_ENGINE must be 'sql' or 'numpy', got {agg_engine!r}")
+    sys.exit(1)
+agg_chunk_rows = int(os.getenv("AGG_CHUNK_ROWS", "500000"))
+
 db_full_path = os.path.join(BASE_DIR, DB_PATH)
 db_url = f"sqlite:///{db_full_path}"
 print(f"Using SQLite database at: {db_full_path}")
@@ -39,58 +64,241 @@ except Exception as e:
     sys.exit(1)
 
 # ----------------------------------------------------
-# 3. Build aggregate tables from suspicious_transactions
+# 3. Aggregate tables, maintained by UPSERT
 # ----------------------------------------------------
-sql_script = """
--- 1) Suspicious customers: aggregate by src_account_id
+# Every run aggregates a transaction_id range of suspicious_transactions and
+# merges it into the tables with INSERT ... ON CONFLICT DO UPDATE. A full
+# build is the same merge into freshly created tables over every row. An
+# incremental run merges only the rows past aggregate_watermark, so its cost
+# follows the delta, not the history. Counts and sums add and maxes take the
+# larger value. avg_fraud_score is kept as fraud_score_sum / count so it
+# merges exactly too (fraud_score_sum is stored, the average recomputed).
+AGG_TABLES = ("suspicious_customers", "suspicious_by_day", "suspicious_by_type")
+AGG_WATERMARK_TABLE = "aggregate_watermark"
+
+# A UNIQUE index never treats two NULLs as equal, so a NULL key would never
+# hit ON CONFLICT: every merge would add another NULL row. NULL keys are
+# stored as this sentinel instead, and the key columns are NOT NULL.
+NULL_KEY = "(unknown)"
+
+create_sql = """
 DROP TABLE IF EXISTS suspicious_customers;
 
-CREATE TABLE suspicious_customers AS
-SELECT
-    src_account_id,
-    COUNT(*) AS suspicious_txn_count,
-    SUM(transaction_amount) AS suspicious_total_amount,
-    MAX(fraud_score) AS max_fraud_score,
-    MAX(event_time) AS last_suspicious_time
-FROM suspicious_transactions
-GROUP BY src_account_id;
+CREATE TABLE suspicious_customers (
+    src_account_id TEXT NOT NULL,
+    suspicious_txn_count INTEGER,
+    suspicious_total_amount REAL,
+    max_fraud_score REAL,
+    last_suspicious_time TEXT
+);
 
--- 2) Suspicious by day
 DROP TABLE IF EXISTS suspicious_by_day;
 
-CREATE TABLE suspicious_by_day AS
-SELECT
-    DATE(event_time) AS event_date,
-    COUNT(*) AS suspicious_txn_count,
-    SUM(transaction_amount) AS suspicious_total_amount,
-    AVG(fraud_score) AS avg_fraud_score
-FROM suspicious_transactions
-GROUP BY DATE(event_time);
+CREATE TABLE suspicious_by_day (
+    event_date TEXT NOT NULL,
+    suspicious_txn_count INTEGER,
+    suspicious_total_amount REAL,
+    fraud_score_sum REAL,
+    avg_fraud_score REAL
+);
 
--- 3) Suspicious by transaction type
 DROP TABLE IF EXISTS suspicious_by_type;
 
-CREATE TABLE suspicious_by_type AS
+CREATE TABLE suspicious_by_type (
+    transaction_type TEXT NOT NULL,
+    suspicious_txn_count INTEGER,
+    suspicious_total_amount REAL,
+    fraud_score_sum REAL,
+    avg_fraud_score REAL
+);
+"""
+
+# Multi-argument MAX() is NULL if either side is; keep the non-NULL one
+def merged_max(col: str) -> str:
+    return f"MAX(COALESCE({col}, excluded.{col}), COALESCE(excluded.{col}, {col}))"
+
+
+DELTA = "FROM suspicious_transactions WHERE transaction_id > :after AND transaction_id <= :upto"
+
+upsert_sql = f"""
+-- 1) Suspicious customers: aggregate by src_account_id
+INSERT INTO suspicious_customers
+    (src_account_id, suspicious_txn_count, suspicious_total_amount, max_fraud_score, last_suspicious_time)
+SELECT
+    COALESCE(src_account_id, '{NULL_KEY}'),
+    COUNT(*),
+    SUM(transaction_amount),
+    MAX(fraud_score),
+    MAX(event_time)
+{DELTA}
+GROUP BY src_account_id
+ON CONFLICT (src_account_id) DO UPDATE SET
+    suspicious_txn_count = suspicious_txn_count + excluded.suspicious_txn_count,
+    suspicious_total_amount = suspicious_total_amount + excluded.suspicious_total_amount,
+    max_fraud_score = {merged_max("max_fraud_score")},
+    last_suspicious_time = {merged_max("last_suspicious_time")};
+
+-- 2) Suspicious by day
+INSERT INTO suspicious_by_day
+    (event_date, suspicious_txn_count, suspicious_total_amount, fraud_score_sum, avg_fraud_score)
+SELECT
+    COALESCE(DATE(event_time), '{NULL_KEY}'),
+    COUNT(*),
+    SUM(transaction_amount),
+    SUM(fraud_score),
+    AVG(fraud_score)
+{DELTA}
+GROUP BY DATE(event_time)
+ON CONFLICT (event_date) DO UPDATE SET
+    suspicious_txn_count = suspicious_txn_count + excluded.suspicious_txn_count,
+    suspicious_total_amount = suspicious_total_amount + excluded.suspicious_total_amount,
+    fraud_score_sum = fraud_score_sum + excluded.fraud_score_sum,
+    avg_fraud_score = (fraud_score_sum + excluded.fraud_score_sum)
+                      / (suspicious_txn_count + excluded.suspicious_txn_count);
+
+-- 3) Suspicious by transaction type
+INSERT INTO suspicious_by_type
+    (transaction_type, suspicious_txn_count, suspicious_total_amount, fraud_score_sum, avg_fraud_score)
 SELECT
-    transaction_type,
-    COUNT(*) AS suspicious_txn_count,
-    SUM(transaction_amount) AS suspicious_total_amount,
-    AVG(fraud_score) AS avg_fraud_score
-FROM suspicious_transactions
-GROUP BY transaction_type;
+    COALESCE(transaction_type, '{NULL_KEY}'),
+    COUNT(*),
+    SUM(transaction_amount),
+    SUM(fraud_score),
+    AVG(fraud_score)
+{DELTA}
+GROUP BY transaction_type
+ON CONFLICT (transaction_type) DO UPDATE SET
+    suspicious_txn_count = suspicious_txn_count + excluded.suspicious_txn_count,
+    suspicious_total_amount = suspicious_total_amount + excluded.suspicious_total_amount,
+    fraud_score_sum = fraud_score_sum + excluded.fraud_score_sum,
+    avg_fraud_score = (fraud_score_sum + excluded.fraud_score_sum)
+                      / (suspicious_txn_count + excluded.suspicious_txn_count);
 """
 
-print("Creating aggregate tables (suspicious_customers, suspicious_by_day, suspicious_by_type)...")
 
+def run_script(conn, script: str, params=None):
+    for statement in script.strip().split(";"):
+        stmt = statement.strip()
+        if stmt:
+            conn.execute(text(stmt + ";"), params or {})
+
+
+def read_aggregate_watermark(conn):
+    if not table_exists(conn, AGG_WATERMARK_TABLE):
+        return None
+    row = conn.execute(text(
+        f"SELECT max_transaction_id, aggregated_rows, model_sha256, threshold FROM {AGG_WATERMARK_TABLE};"
+    )).mappings().fetchone()
+    return dict(row) if row else None
+
+
+def write_aggregate_watermark(conn, max_transaction_id: int, aggregated_rows: int, scoring):
+    conn.execute(text(f"""
+    CREATE TABLE IF NOT EXISTS {AGG_WATERMARK_TABLE} (
+        max_transaction_id INTEGER NOT NULL,
+        aggregated_rows INTEGER NOT NULL,
+        model_sha256 TEXT,
+        threshold REAL,
+        built_at TEXT NOT NULL
+    );
+    """))
+    conn.execute(text(f"DELETE FROM {AGG_WATERMARK_TABLE};"))
+    conn.execute(
+        text(f"""
+        INSERT INTO {AGG_WATERMARK_TABLE} (max_transaction_id, aggregated_rows, model_sha256, threshold, built_at)
+        VALUES (:max_id, :n_rows, :sha, :threshold, datetime('now'));
+        """),
+        {
+            "max_id": max_transaction_id,
+            "n_rows": aggregated_rows,
+            "sha": scoring["model_sha256"] if scoring else None,
+            "threshold": scoring["threshold"] if scoring else None,
+        },
+    )
+
+
+# ----------------------------------------------------
+# 4. Decide between a full build and an incremental merge
+# ----------------------------------------------------
+# suspicious_transactions is only ever appended to by incremental scoring, so
+# the rows up to the watermark are the ones already merged, unless scoring
+# ran a full rescore with another model/threshold, or the row count below the
+# watermark no longer matches (a walk of the transaction_id index over the
+# suspicious rows only).
 try:
     with engine.begin() as conn:
-        for statement in sql_script.strip().split(";"):
-            stmt = statement.strip()
-            if stmt:
-                conn.execute(text(stmt + ";"))
-    print("✅ Aggregate tables created successfully.")
+        # Covering indexes let each GROUP BY walk an index instead of the table
+        apply_indexes(conn, "suspicious_transactions")
+        scoring = read_watermark(conn)
+        watermark = read_aggregate_watermark(conn)
+        upto = conn.execute(text("SELECT COALESCE(MAX(transaction_id), 0) FROM suspicious_transactions;")).scalar()
+
+        full_build = True
+        if incremental:
+            if watermark is None or not all(table_exists(conn, t) for t in AGG_TABLES):
+                print("No aggregate watermark / tables yet: running a full build.")
+            elif scoring and (watermark["model_sha256"], watermark["threshold"]) != (
+                    scoring["model_sha256"], scoring["threshold"]):
+                print("suspicious_transactions was rescored with another model/threshold: running a full build.")
+            elif conn.execute(
+                text("SELECT COUNT(*) FROM suspicious_transactions WHERE transaction_id <= :wm;"),
+                {"wm": watermark["max_transaction_id"]},
+            ).scalar() != watermark["aggregated_rows"]:
+                print("Rows below the aggregate watermark changed: running a full build.")
+            else:
+                full_build = False
+except Exception as e:
+    print("❌ Failed to read suspicious_transactions / aggregate watermark.")
+    print(e)
+    sys.exit(1)
+
+after = 0 if full_build else watermark["max_transaction_id"]
+already_aggregated = 0 if full_build else watermark["aggregated_rows"]
+
+# ----------------------------------------------------
+# 5. Build / merge the aggregate tables
+# ----------------------------------------------------
+if full_build:
+    print("Creating aggregate tables (suspicious_customers, suspicious_by_day, suspicious_by_type) "
+          f"with the {agg_engine} engine...")
+else:
+    print(f"Incremental run: merging suspicious rows with transaction_id in ({after}, {upto}]...")
+
+try:
+    with engine.begin() as conn:
+        if full_build:
+            run_script(conn, create_sql)
+        # The unique key indexes are also the ON CONFLICT targets
+        for table in AGG_TABLES:
+            apply_indexes(conn, table)
+
+        if full_build and agg_engine == "numpy":
+            profile = AGG_PROFILES["suspicious"]
+            aggregator = MultiGroupAggregator(profile)
+            for df_chunk, _ in iter_keyset_chunks(conn, agg_chunk_rows, end_at=upto,
+                                                  columns=required_columns(profile), table=profile["table"]):
+                aggregator.update(df_chunk)
+            for table, df_agg in aggregator.results().items():
+                cols = list(df_agg.columns)
+                # Key first; the aggregator's NULL-key group gets the sentinel too
+                df_agg[cols[0]] = df_agg[cols[0]].fillna(NULL_KEY)
+                if not df_agg.empty:
+                    conn.execute(
+                        text(f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)});"),
+                        df_agg.to_dict("records"),
+                    )
+            delta_rows = aggregator.rows_aggregated
+        else:
+            delta_rows = conn.execute(
+                text(f"SELECT COUNT(*) {DELTA};"), {"after": after, "upto": upto}
+            ).scalar()
+            if delta_rows:
+                run_script(conn, upsert_sql, {"after": after, "upto": upto})
+        write_aggregate_watermark(conn, max(upto, after), already_aggregated + delta_rows, scoring)
+    print(f"✅ Aggregate tables {'created' if full_build else 'updated'}: {delta_rows:,} suspicious rows merged "
+          f"({already_aggregated + delta_rows:,} in total).")
 except Exception as e:
-    print("❌ Failed to create aggregate tables.")
+    print("❌ Failed to build aggregate tables.")
     print(e)
     sys.exit(1)
 
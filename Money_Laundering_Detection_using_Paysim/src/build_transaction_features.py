@@ -1,9 +1,31 @@
 import os
 import sys
+import time
 
 from dotenv import load_dotenv
+import pandas as pd
 from sqlalchemy import create_engine, text
 
+from db_indexes import apply_indexes
+from feature_rules import HIGH_VALUE_AMOUNT, NIGHT_HOUR_END, NIGHT_HOUR_START
+from scoring_engine import iter_keyset_chunks
+from mule_links import (
+    MULE_FEATURE_COLS,
+    MULE_INPUT_COLS,
+    MULE_SCHEMA,
+    MULE_TABLE,
+    MULE_WINDOW_STEPS,
+    link_transfers_to_cashouts,
+)
+import sqlite_bulk
+from velocity_features import (
+    VELOCITY_FEATURE_COLS,
+    VELOCITY_INPUT_COLS,
+    VELOCITY_SCHEMA,
+    VELOCITY_TABLE,
+    compute_velocity,
+)
+
 # ----------------------------------------------------
 # 1. Load environment variables from .env
 # ----------------------------------------------------
@@ -40,40 +62,158 @@ except Exception as e:
     sys.exit(1)
 
 # ----------------------------------------------------
-# 3. Create transaction_features table from clean_transactions
+# 3. Read the inputs for the in-memory feature stages
+# ----------------------------------------------------
+# Velocity (FEATURES_VELOCITY=1) and mule linkage (FEATURES_MULE_LINKS=1) are
+# computed in NumPy/pandas from one keyset read of just the columns they need.
+# Each is stored in its own table keyed by transaction_id and LEFT JOINed into
+# transaction_features below. Both are off by default: the read holds those
+# columns of the whole of clean_transactions (account ids included) in memory.
+with_velocity = os.getenv("FEATURES_VELOCITY", "0") == "1"
+with_mule_links = os.getenv("FEATURES_MULE_LINKS", "0") == "1"
+mule_window_steps = int(os.getenv("MULE_WINDOW_STEPS", str(MULE_WINDOW_STEPS)))
+chunk_rows = int(os.getenv("FEATURES_CHUNK_ROWS", "500000"))
+
+input_cols = []
+if with_velocity:
+    input_cols += VELOCITY_INPUT_COLS
+if with_mule_links:
+    input_cols += MULE_INPUT_COLS
+input_cols = list(dict.fromkeys(input_cols))
+input_dtypes = {"step": "int32", "transaction_amount": "float64", "transaction_type": "category"}
+
+
+def write_feature_table(df, table, schema):
+    conn = sqlite_bulk.connect(db_full_path)
+    # Shared warehouse DB: with a journal a crash rolls back this rebuild
+    with sqlite_bulk.fast_load_pragmas(conn, journal_mode="WAL", synchronous="NORMAL"):
+        conn.execute("BEGIN;")
+        sqlite_bulk.create_table(conn, table, schema)
+        insert_cols = [name for name, _ in schema]
+        for i in range(0, len(df), chunk_rows):
+            sqlite_bulk.insert_frame(conn, table, df.iloc[i:i + chunk_rows], insert_cols)
+        conn.execute("COMMIT;")
+    conn.close()
+
+
+df_inputs = None
+if input_cols:
+    print(f"Reading {', '.join(input_cols)} from clean_transactions...")
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            parts = [
+                df_chunk for df_chunk, _ in iter_keyset_chunks(
+                    conn, chunk_rows, columns=input_cols,
+                    dtype={c: t for c, t in input_dtypes.items() if c in input_cols},
+                    table="clean_transactions",
+                )
+            ]
+        df_inputs = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=input_cols)
+        del parts
+    except Exception as e:
+        print("❌ Failed to read clean_transactions.")
+        print(e)
+        sys.exit(1)
+    print(f"✅ Read {len(df_inputs):,} rows in {time.perf_counter() - start:.1f}s")
+
+# ----------------------------------------------------
+# 4. Account velocity features
+# ----------------------------------------------------
+# Per-account rolling counts/amounts over 1/6/24 hours, hours since the previous
+# transaction and distinct counterparties, for both src and dst accounts (see
+# velocity_features.py), in one sorted NumPy pass.
+if with_velocity:
+    print("Computing account velocity features...")
+    start = time.perf_counter()
+    try:
+        df_velocity = compute_velocity(df_inputs[VELOCITY_INPUT_COLS])
+        compute_seconds = time.perf_counter() - start
+        write_feature_table(df_velocity, VELOCITY_TABLE, VELOCITY_SCHEMA)
+    except Exception as e:
+        print("❌ Failed to build account velocity features.")
+        print(e)
+        sys.exit(1)
+
+    total_seconds = time.perf_counter() - start
+    print(
+        f"✅ {len(df_velocity):,} rows into '{VELOCITY_TABLE}' in {total_seconds:.1f}s "
+        f"(compute {compute_seconds:.1f}s, write {total_seconds - compute_seconds:.1f}s)"
+    )
+    del df_velocity
+
+# ----------------------------------------------------
+# 5. TRANSFER -> CASH_OUT mule linkage
+# ----------------------------------------------------
+# Links each TRANSFER into an account with that account's nearest CASH_OUT
+# within MULE_WINDOW_STEPS hours (and each CASH_OUT back to its transfer), via
+# a sorted merge per account (see mule_links.py). Only linked legs get a row.
+if with_mule_links:
+    print(f"Linking TRANSFER -> CASH_OUT legs (window {mule_window_steps} steps)...")
+    start = time.perf_counter()
+    try:
+        df_links = link_transfers_to_cashouts(df_inputs[MULE_INPUT_COLS], mule_window_steps)
+        compute_seconds = time.perf_counter() - start
+        write_feature_table(df_links, MULE_TABLE, MULE_SCHEMA)
+    except Exception as e:
+        print("❌ Failed to build mule linkage features.")
+        print(e)
+        sys.exit(1)
+
+    total_seconds = time.perf_counter() - start
+    print(
+        f"✅ {len(df_links):,} linked legs into '{MULE_TABLE}' in {total_seconds:.1f}s "
+        f"(compute {compute_seconds:.1f}s, write {total_seconds - compute_seconds:.1f}s)"
+    )
+    del df_links
+
+del df_inputs
+
+# ----------------------------------------------------
+# 6. Create transaction_features table from clean_transactions
 # ----------------------------------------------------
 # We engineer a few simple features:
 # - is_high_value: transaction_amount > 200000
 # - is_night_txn: hour_of_day < 8 OR hour_of_day > 20
 # - src_balance_change, dst_balance_change (already in clean)
+# - account velocity features (section 4)
+# - TRANSFER -> CASH_OUT linkage (section 5); mule_is_linked is 0 when unlinked
 #
 # You can extend this later with more complex patterns.
+# The thresholds come from feature_rules, so the scoring service derives the
+# same values in memory.
+velocity_select = "".join(f",\n    v.{c}" for c in VELOCITY_FEATURE_COLS) if with_velocity else ""
+velocity_join = f"\nLEFT JOIN {VELOCITY_TABLE} v ON v.transaction_id = c.transaction_id" if with_velocity else ""
+mule_select = "".join(
+    f",\n    COALESCE(m.{c}, 0) AS {c}" if c == "mule_is_linked" else f",\n    m.{c}" for c in MULE_FEATURE_COLS
+) if with_mule_links else ""
+mule_join = f"\nLEFT JOIN {MULE_TABLE} m ON m.transaction_id = c.transaction_id" if with_mule_links else ""
 
-create_sql = """
+create_sql = f"""
 DROP TABLE IF EXISTS transaction_features;
 
 CREATE TABLE transaction_features AS
 SELECT
-    transaction_id,
-    event_time,
-    step,
-    transaction_type,
-    transaction_amount,
-    hour_of_day,
-    day_of_week,
-    src_account_id,
-    old_balance_orig,
-    new_balance_orig,
-    src_balance_change,
-    dst_account_id,
-    old_balance_dest,
-    new_balance_dest,
-    dst_balance_change,
-    CASE WHEN transaction_amount > 200000 THEN 1 ELSE 0 END AS is_high_value,
-    CASE WHEN hour_of_day < 8 OR hour_of_day > 20 THEN 1 ELSE 0 END AS is_night_txn,
-    is_fraud,
-    is_flagged_fraud
-FROM clean_transactions;
+    c.transaction_id,
+    c.event_time,
+    c.step,
+    c.transaction_type,
+    c.transaction_amount,
+    c.hour_of_day,
+    c.day_of_week,
+    c.src_account_id,
+    c.old_balance_orig,
+    c.new_balance_orig,
+    c.src_balance_change,
+    c.dst_account_id,
+    c.old_balance_dest,
+    c.new_balance_dest,
+    c.dst_balance_change,
+    CASE WHEN c.transaction_amount > {HIGH_VALUE_AMOUNT} THEN 1 ELSE 0 END AS is_high_value,
+    CASE WHEN c.hour_of_day < {NIGHT_HOUR_START} OR c.hour_of_day > {NIGHT_HOUR_END} THEN 1 ELSE 0 END AS is_night_txn,
+    c.is_fraud,
+    c.is_flagged_fraud{velocity_select}{mule_select}
+FROM clean_transactions c{velocity_join}{mule_join};
 """
 
 print("Creating table 'transaction_features' in SQLite using SQL...")
@@ -84,7 +224,9 @@ try:
             stmt = statement.strip()
             if stmt:
                 conn.execute(text(stmt + ";"))
-    print("✅ Successfully created table 'transaction_features'.")
+        # CREATE TABLE AS carries no indexes; re-apply the declared ones
+        apply_indexes(conn, "transaction_features")
+    print("✅ Successfully created table 'transaction_features' (with indexes).")
 except Exception as e:
     print("❌ Failed to create 'transaction_features' table.")
     print(e)
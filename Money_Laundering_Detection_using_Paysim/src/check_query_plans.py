@@ -0,0 +1,80 @@
+import os
+import sys
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from db_indexes import INDEX_SPECS, INDEX_WALK_QUERIES, apply_indexes, check_query_plans
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_full_path = os.path.join(BASE_DIR, DB_PATH)
+db_url = f"sqlite:///{db_full_path}"
+print(f"Using SQLite database at: {db_full_path}")
+
+# ----------------------------------------------------
+# 2. Connect to SQLite
+# ----------------------------------------------------
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print("✅ Successfully connected to SQLite database.")
+except Exception as e:
+    print("❌ Failed to connect to SQLite.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 3. Make sure the declared indexes exist
+# ----------------------------------------------------
+# Idempotent (CREATE INDEX IF NOT EXISTS); tables that don't exist yet are
+# skipped.
+try:
+    with engine.begin() as conn:
+        for table in INDEX_SPECS:
+            applied = apply_indexes(conn, table)
+            if applied:
+                print(f"{table}: {', '.join(applied)}")
+except Exception as e:
+    print("❌ Failed to apply index specs.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 4. EXPLAIN QUERY PLAN for the hot queries
+# ----------------------------------------------------
+print("\nChecking query plans...")
+
+with engine.connect() as conn:
+    results = check_query_plans(conn)
+
+failures = 0
+for label, plan, scans in results:
+    status = "❌ FULL SCAN of " + ", ".join(scans) if scans else "✅"
+    note = " (reads every row by design)" if not scans and label in INDEX_WALK_QUERIES else ""
+    print(f"{status} {label}{note}")
+    for line in plan:
+        print(f"      {line}")
+    failures += bool(scans)
+
+if failures:
+    print(f"\n❌ {failures} hot quer{'y' if failures == 1 else 'ies'} fell back to a full table or index scan.")
+    sys.exit(1)
+
+print(f"\n🎉 All {len(results)} hot queries use an index.")
@@ -0,0 +1,105 @@
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+from db_indexes import table_exists
+from parquet_store import has_dataset, id_range_filters, read_table
+from scoring_engine import KEY_COL, iter_keyset_chunks
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+# spark_clean_paysim.py and ingest_paysim.py + transform_to_clean.py both
+# number rows 1..n in CSV order, so their outputs join on transaction_id.
+parser = argparse.ArgumentParser(description="Join the Spark clean dataset with SQLite clean_transactions.")
+parser.add_argument("--spark-dir", default=os.path.join("data", "spark", "clean_transactions"),
+                    help="Spark output, relative to the project (default: data/spark/clean_transactions).")
+parser.add_argument("--chunk-rows", type=int, default=500000, help="Rows compared per keyset chunk.")
+args = parser.parse_args()
+
+COMPARE_COLS = [KEY_COL, "step", "transaction_type", "transaction_amount", "src_account_id",
+                "old_balance_orig", "new_balance_orig", "dst_account_id", "old_balance_dest",
+                "new_balance_dest", "is_fraud", "is_flagged_fraud"]
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+spark_dir = os.path.join(BASE_DIR, args.spark_dir)
+if not has_dataset(spark_dir):
+    print(f"ERROR: no Spark output at {spark_dir} (run spark_clean_paysim.py first)")
+    sys.exit(1)
+
+engine = create_engine(f"sqlite:///{os.path.join(BASE_DIR, DB_PATH)}")
+
+
+def same_values(a: pd.Series, b: pd.Series) -> np.ndarray:
+    if pd.api.types.is_float_dtype(a) or pd.api.types.is_float_dtype(b):
+        return np.isclose(a.to_numpy(dtype=float), b.to_numpy(dtype=float), rtol=1e-12, equal_nan=True)
+    return ((a == b) | (a.isna() & b.isna())).to_numpy()
+
+
+# ----------------------------------------------------
+# 2. Compare chunk by chunk
+# ----------------------------------------------------
+# Each SQLite keyset chunk covers (previous max id, max id]; the Spark rows in
+# that id range are read with a pushed-down filter, so the whole of both
+# outputs is covered without holding either in memory.
+only_sqlite = only_spark = n_sqlite = 0
+mismatches = {c: 0 for c in COMPARE_COLS[1:]}
+prev_max = None
+try:
+    with engine.connect() as conn:
+        if not table_exists(conn, "clean_transactions"):
+            print("ERROR: table 'clean_transactions' does not exist.")
+            sys.exit(1)
+        for df_sqlite, _ in iter_keyset_chunks(conn, args.chunk_rows, columns=COMPARE_COLS,
+                                               table="clean_transactions"):
+            chunk_max = int(df_sqlite[KEY_COL].max())
+            df_spark = read_table(spark_dir, columns=COMPARE_COLS, filters=id_range_filters(prev_max, chunk_max))
+            merged = df_sqlite.merge(df_spark, on=KEY_COL, how="outer", suffixes=("", "_spark"), indicator=True)
+            only_sqlite += int((merged["_merge"] == "left_only").sum())
+            only_spark += int((merged["_merge"] == "right_only").sum())
+            both = merged[merged["_merge"] == "both"]
+            for col in mismatches:
+                mismatches[col] += int((~same_values(both[col], both[f"{col}_spark"])).sum())
+            n_sqlite += len(df_sqlite)
+            prev_max = chunk_max
+        only_spark += len(read_table(spark_dir, columns=[KEY_COL], filters=id_range_filters(prev_max, None)))
+except Exception as e:
+    print("❌ Failed to compare the Spark and SQLite outputs.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 3. Report
+# ----------------------------------------------------
+print(f"SQLite clean_transactions rows: {n_sqlite:,}")
+print(f"transaction_id only in SQLite: {only_sqlite:,}")
+print(f"transaction_id only in Spark:  {only_spark:,}")
+for col, n in mismatches.items():
+    if n:
+        print(f"❌ {col}: {n:,} rows differ")
+
+if only_sqlite or only_spark or any(mismatches.values()):
+    print("❌ Spark and SQLite outputs differ.")
+    sys.exit(1)
+print("🎉 Spark and SQLite outputs match row for row.")
@@ -0,0 +1,174 @@
+import re
+import sqlite3
+
+# ----------------------------------------------------
+# Declarative index specs for the SQLite warehouse
+# ----------------------------------------------------
+# Every stage rebuilds its table with CREATE TABLE AS (which carries no
+# indexes), then calls apply_indexes(conn, table) to recreate the indexes
+# listed here. Specs are plain dicts:
+#   name     index name
+#   columns  column names or expressions, in key order
+#   unique   UNIQUE index (stands in for a primary key on CTAS tables)
+#   where    optional partial-index predicate
+#
+# check_query_plans() runs EXPLAIN QUERY PLAN over HOT_QUERIES and reports
+# any that fall back to a full table scan or walk a whole index.
+
+INDEX_SPECS = {
+    "raw_transactions": [
+        {"name": "ix_raw_transactions_transaction_id", "columns": ["transaction_id"], "unique": True},
+        # Natural key: append-mode dedup probes, MIN/MAX(step)
+        {"name": "ix_raw_transactions_natural_key", "columns": ["step", "name_orig", "name_dest", "amount"]},
+    ],
+    "clean_transactions": [
+        {"name": "ix_clean_transactions_transaction_id", "columns": ["transaction_id"], "unique": True},
+    ],
+    "transaction_features": [
+        # Keyset paging, parallel id ranges, joining suspicious rows back
+        {"name": "ix_transaction_features_transaction_id", "columns": ["transaction_id"], "unique": True},
+        # Training reads every fraud row; fraud is ~0.1% of the table
+        {"name": "ix_transaction_features_fraud", "columns": ["transaction_id"], "where": "is_fraud = 1"},
+    ],
+    "suspicious_transactions": [
+        {"name": "ix_suspicious_transactions_transaction_id", "columns": ["transaction_id"], "unique": True},
+        # Covering indexes for the build_aggregates.py groupings
+        {"name": "ix_suspicious_transactions_src_account",
+         "columns": ["src_account_id", "transaction_amount", "fraud_score", "event_time"]},
+        {"name": "ix_suspicious_transactions_event_date",
+         "columns": ["DATE(event_time)", "transaction_amount", "fraud_score"]},
+        {"name": "ix_suspicious_transactions_type",
+         "columns": ["transaction_type", "transaction_amount", "fraud_score"]},
+    ],
+    "suspicious_customers": [
+        {"name": "ix_suspicious_customers_src_account", "columns": ["src_account_id"], "unique": True},
+    ],
+    "suspicious_by_day": [
+        {"name": "ix_suspicious_by_day_event_date", "columns": ["event_date"], "unique": True},
+    ],
+    "suspicious_by_type": [
+        {"name": "ix_suspicious_by_type_transaction_type", "columns": ["transaction_type"], "unique": True},
+    ],
+    "account_graph_features": [
+        # Listing the members of a component
+        {"name": "ix_account_graph_features_component", "columns": ["component_id"]},
+    ],
+}
+
+# (label, sql) pairs the pipeline runs often enough that a full scan hurts.
+# Bound parameters are given as literals; only the plan matters.
+HOT_QUERIES = [
+    ("train: fraud rows",
+     "SELECT transaction_id, transaction_amount FROM transaction_features WHERE is_fraud = 1"),
+    ("score: keyset page",
+     "SELECT transaction_id, transaction_amount FROM transaction_features "
+     "WHERE transaction_id > 0 ORDER BY transaction_id LIMIT 100000"),
+    ("score: key bounds",
+     "SELECT (SELECT MIN(transaction_id) FROM transaction_features), "
+     "(SELECT MAX(transaction_id) FROM transaction_features)"),
+    ("score: join suspicious rows back",
+     "SELECT * FROM transaction_features WHERE transaction_id IN (1, 2, 3)"),
+    ("aggregate: by src_account_id",
+     "SELECT src_account_id, COUNT(*), SUM(transaction_amount), MAX(fraud_score), MAX(event_time) "
+     "FROM suspicious_transactions GROUP BY src_account_id"),
+    ("aggregate: by day",
+     "SELECT DATE(event_time), COUNT(*), SUM(transaction_amount), AVG(fraud_score) "
+     "FROM suspicious_transactions GROUP BY DATE(event_time)"),
+    ("aggregate: by type",
+     "SELECT transaction_type, COUNT(*), SUM(transaction_amount), AVG(fraud_score) "
+     "FROM suspicious_transactions GROUP BY transaction_type"),
+    ("aggregate: incremental delta",
+     "SELECT src_account_id, COUNT(*) FROM suspicious_transactions "
+     "WHERE transaction_id > 100 AND transaction_id <= 200 GROUP BY src_account_id"),
+]
+
+# Hot queries whose job is to read every row once (full aggregate builds):
+# walking a covering index is the plan they should get
+INDEX_WALK_QUERIES = {"aggregate: by src_account_id", "aggregate: by day", "aggregate: by type"}
+
+# "SCAN t" is a full table scan; "SCAN t USING [COVERING] INDEX ix" walks the
+# whole index (no SEARCH range constraint), which costs O(n) just the same.
+# Walking a partial index only touches the rows it covers, so that is fine.
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: USING (?:COVERING )?INDEX (\w+))?$")
+_PARTIAL_INDEXES = {spec["name"] for specs in INDEX_SPECS.values() for spec in specs if spec.get("where")}
+
+
+def _run(conn, sql: str):
+    # Accepts a raw sqlite3 connection or a SQLAlchemy Connection
+    if isinstance(conn, sqlite3.Connection):
+        conn.execute(sql)
+    else:
+        conn.exec_driver_sql(sql)
+
+
+def _query(conn, sql: str):
+    if isinstance(conn, sqlite3.Connection):
+        return conn.execute(sql).fetchall()
+    return conn.exec_driver_sql(sql).fetchall()
+
+
+def table_exists(conn, table: str) -> bool:
+    rows = _query(conn, f"SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = '{table}'")
+    return bool(rows)
+
+
+def _is_rowid_alias(conn, table: str, column: str) -> bool:
+    # An INTEGER PRIMARY KEY column already is the table's b-tree key
+    pk_cols = [row for row in _query(conn, f"PRAGMA table_info({table})") if row[5] > 0]
+    return len(pk_cols) == 1 and pk_cols[0][1] == column and pk_cols[0][2].upper() == "INTEGER"
+
+
+def index_sql(table: str, spec) -> str:
+    unique = "UNIQUE " if spec.get("unique") else ""
+    where = f" WHERE {spec['where']}" if spec.get("where") else ""
+    return (
+        f"CREATE {unique}INDEX IF NOT EXISTS {spec['name']} "
+        f"ON {table} ({', '.join(spec['columns'])}){where}"
+    )
+
+
+def apply_indexes(conn, table: str):
+    """Create the spec'd indexes for table (idempotent); returns names applied."""
+    if not table_exists(conn, table):
+        return []
+
+    applied = []
+    for spec in INDEX_SPECS.get(table, []):
+        if spec.get("unique") and spec["columns"] == ["transaction_id"] and _is_rowid_alias(conn, table, "transaction_id"):
+            continue
+        _run(conn, index_sql(table, spec))
+        applied.append(spec["name"])
+
+    # Refresh planner statistics for the indexed table
+    _run(conn, f"ANALYZE {table}")
+    return applied
+
+
+def explain(conn, sql: str):
+    return [row[-1] for row in _query(conn, f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def plan_scans(plan, allow_index_walk: bool = False):
+    """Full scans in an EXPLAIN QUERY PLAN, e.g. "transaction_features (index walk: ix_...)"."""
+    scans = []
+    for m in (_SCAN.match(line.strip()) for line in plan):
+        if not m:
+            continue
+        table, index = m.groups()
+        if index is None:
+            scans.append(f"{table} (table scan)")
+        elif index not in _PARTIAL_INDEXES and not allow_index_walk:
+            scans.append(f"{table} (index walk: {index})")
+    return scans
+
+
+def check_query_plans(conn, queries=HOT_QUERIES):
+    """Return (label, plan_lines, full_scans) per query whose tables exist."""
+    results = []
+    for label, sql in queries:
+        tables = re.findall(r"\bFROM (\w+)", sql)
+        if not all(table_exists(conn, t) for t in tables):
+            continue
+        plan = explain(conn, sql)
+        results.append((label, plan, plan_scans(plan, allow_index_walk=label in INDEX_WALK_QUERIES)))
+    return results
@@ -5,6 +5,8 @@ from dotenv import load_dotenv
 import pandas as pd
 from sqlalchemy import create_engine, text
 
+from parquet_store import check_snapshot, dataset_dir, has_dataset, read_table, storage_backend, write_frame
+
 # ----------------------------------------------------
 # 1. Load environment variables
 # ----------------------------------------------------
@@ -26,6 +28,21 @@ db_full_path = os.path.join(BASE_DIR, DB_PATH)
 db_url = f"sqlite:///{db_full_path}"
 print(f"Using SQLite database at: {db_full_path}")
 
+# STORAGE_BACKEND=parquet: read a table from its Parquet dataset when there is
+# one (else SQLite). The output format is separate, since BI tools read CSV:
+# BI_EXPORT_FORMAT=csv (default) or parquet.
+try:
+    backend = storage_backend()
+except ValueError as e:
+    print(f"ERROR: {e}")
+    sys.exit(1)
+
+BI_EXPORT_FORMATS = ("csv", "parquet")
+export_format = os.getenv("BI_EXPORT_FORMAT", "csv").strip().lower()
+if export_format not in BI_EXPORT_FORMATS:
+    print(f"ERROR: BI_EXPORT_FORMAT must be one of {', '.join(BI_EXPORT_FORMATS)}, got '{export_format}'")
+    sys.exit(1)
+
 # ----------------------------------------------------
 # 2. Connect to SQLite
 # ----------------------------------------------------
@@ -46,12 +63,24 @@ output_dir = os.path.join(BASE_DIR, "data", "bi")
 os.makedirs(output_dir, exist_ok=True)
 
 def export_table(table_name: str):
-    csv_path = os.path.join(output_dir, f"{table_name}.csv")
-    print(f"\nExporting {table_name} -> {csv_path}")
+    out_path = os.path.join(output_dir, f"{table_name}.{export_format}")
+    print(f"\nExporting {table_name} -> {out_path}")
 
+    parquet_path = dataset_dir(BASE_DIR, table_name)
     try:
         with engine.connect() as conn:
-            df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
+            use_parquet = backend == "parquet" and has_dataset(parquet_path)
+            if use_parquet:
+                try:
+                    check_snapshot(conn, table_name, parquet_path)
+                except ValueError as e:
+                    # SQLite has the current rows; read those instead
+                    print(f"WARNING: {e}; reading SQLite instead.")
+                    use_parquet = False
+            if use_parquet:
+                df = read_table(parquet_path)
+            else:
+                df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
     except Exception as e:
         print(f"❌ Failed to read table '{table_name}'.")
         print(e)
@@ -59,10 +88,13 @@ def export_table(table_name: str):
 
     print(f"{table_name} shape: {df.shape}")
     try:
-        df.to_csv(csv_path, index=False)
-        print(f"✅ Exported {table_name} to {csv_path}")
+        if export_format == "parquet":
+            write_frame(df, out_path)
+        else:
+            df.to_csv(out_path, index=False)
+        print(f"✅ Exported {table_name} to {out_path}")
     except Exception as e:
-        print(f"❌ Failed to write CSV for '{table_name}'.")
+        print(f"❌ Failed to write {export_format.upper()} for '{table_name}'.")
         print(e)
 
 # ----------------------------------------------------
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from db_indexes import table_exists
+from parquet_store import dataset_dir, export_sqlite_table
+from scoring_engine import KEY_COL, source_columns
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+parser = argparse.ArgumentParser(description="Export SQLite tables to Parquet datasets (STORAGE_BACKEND=parquet).")
+parser.add_argument("--tables", nargs="+", default=["transaction_features"],
+                    help="Tables with a transaction_id column to export (default: transaction_features).")
+parser.add_argument("--chunk-rows", type=int, default=500000, help="Rows read from SQLite per keyset page.")
+args = parser.parse_args()
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_full_path = os.path.join(BASE_DIR, DB_PATH)
+db_url = f"sqlite:///{db_full_path}"
+print(f"Using SQLite database at: {db_full_path}")
+
+# ----------------------------------------------------
+# 2. Connect to SQLite
+# ----------------------------------------------------
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print("✅ Successfully connected to SQLite database.")
+except Exception as e:
+    print("❌ Failed to connect to SQLite.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 3. Check the requested tables
+# ----------------------------------------------------
+# The export pages through transaction_id, and the staleness check compares
+# row count and max transaction_id. Keyless tables (the suspicious_* aggregates)
+# change values in place under incremental builds, so they stay in SQLite.
+with engine.connect() as conn:
+    for table in args.tables:
+        if not table_exists(conn, table):
+            print(f"ERROR: table '{table}' does not exist.")
+            sys.exit(1)
+        if KEY_COL not in source_columns(conn, table):
+            print(f"ERROR: table '{table}' has no {KEY_COL} column; only keyed tables can be exported to Parquet.")
+            sys.exit(1)
+
+# ----------------------------------------------------
+# 4. Export each table
+# ----------------------------------------------------
+# Re-run after build_transaction_features.py: the Parquet copy is a snapshot,
+# and scoring/training refuse one whose recorded source row count, max id or
+# columns no longer match SQLite.
+# Each dataset is rebuilt in a temporary directory and swapped in at the end.
+for table in args.tables:
+    out_dir = dataset_dir(BASE_DIR, table)
+    print(f"\nExporting {table} -> {out_dir}")
+    start = time.perf_counter()
+    try:
+        with engine.connect() as conn:
+            n_rows = export_sqlite_table(conn, table, out_dir, chunk_rows=args.chunk_rows)
+    except Exception as e:
+        print(f"❌ Failed to export '{table}' to Parquet.")
+        print(e)
+        sys.exit(1)
+
+    seconds = time.perf_counter() - start
+    size_mb = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir)) / 1e6
+    print(f"✅ {n_rows:,} rows in {seconds:.1f}s ({size_mb:.1f} MB on disk)")
+
+print("\n🎉 Parquet export finished.")
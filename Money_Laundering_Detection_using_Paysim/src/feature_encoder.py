@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------
+# Fixed-schema feature encoder shared by training and scoring
+# ----------------------------------------------------
+# pd.get_dummies(drop_first=True) derives the one-hot columns from whatever
+# types happen to be in the frame, so a chunk (or a training sample) missing a
+# type changes the column set. The encoder pins the five PaySim types to fixed
+# codes and writes the float32 feature matrix straight into a NumPy array, in
+# the exact column order the model was trained on.
+#
+# The encoder is a plain dict so it can live inside the joblib model bundle
+# without tying the artifact to this module.
+
+TYPE_COL = "transaction_type"
+TRANSACTION_TYPES = ["CASH_IN", "CASH_OUT", "DEBIT", "PAYMENT", "TRANSFER"]
+
+BASE_FEATURE_COLS = [
+    "transaction_amount",
+    "hour_of_day",
+    "day_of_week",
+    "is_high_value",
+    "is_night_txn",
+    "src_balance_change",
+    "dst_balance_change",
+]
+
+
+def build_encoder(numeric_cols=BASE_FEATURE_COLS):
+    # Same layout as get_dummies(drop_first=True): CASH_IN is the reference level
+    one_hot = TRANSACTION_TYPES[1:]
+    return {
+        "numeric_cols": list(numeric_cols),
+        "type_col": TYPE_COL,
+        "one_hot_categories": list(one_hot),
+        "feature_cols": list(numeric_cols) + [f"{TYPE_COL}_{c}" for c in one_hot],
+    }
+
+
+def encoder_from_feature_cols(feature_cols):
+    """Rebuild an encoder for model bundles saved before the encoder existed."""
+    prefix = f"{TYPE_COL}_"
+    numeric_cols = [c for c in feature_cols if not c.startswith(prefix)]
+    one_hot = [c[len(prefix):] for c in feature_cols if c.startswith(prefix)]
+
+    encoder = {
+        "numeric_cols": numeric_cols,
+        "type_col": TYPE_COL,
+        "one_hot_categories": one_hot,
+        "feature_cols": numeric_cols + [f"{prefix}{c}" for c in one_hot],
+    }
+    if encoder["feature_cols"] != list(feature_cols):
+        raise ValueError("feature_cols must list numeric columns before the one-hot columns")
+    return encoder
+
+
+def get_encoder(model_bundle):
+    if "encoder" in model_bundle:
+        return model_bundle["encoder"]
+    return encoder_from_feature_cols(model_bundle["feature_cols"])
+
+
+def type_codes(values, encoder) -> np.ndarray:
+    # Index into one_hot_categories; -1 for the reference level or unknown types.
+    # get_indexer rather than pd.Categorical(values, categories=...), which
+    # pandas deprecates for values outside the categories (CASH_IN here)
+    return pd.Index(encoder["one_hot_categories"]).get_indexer(values)
+
+
+def encode(df: pd.DataFrame, encoder) -> np.ndarray:
+    """Build the (n_rows, n_features) float32 matrix for the model.
+
+    df may also be a dict of column arrays (online_features.derive_features).
+    """
+    numeric_cols = encoder["numeric_cols"]
+    n_numeric = len(numeric_cols)
+    n_rows = len(df[encoder["type_col"]])
+    X = np.zeros((n_rows, len(encoder["feature_cols"])), dtype=np.float32)
+
+    for j, col in enumerate(numeric_cols):
+        X[:, j] = np.asarray(df[col])
+
+    codes = type_codes(df[encoder["type_col"]], encoder)
+    rows = np.flatnonzero(codes >= 0)
+    X[rows, n_numeric + codes[rows]] = 1.0
+    return X
+
+
+# ----------------------------------------------------
+# Column projection with compact dtypes
+# ----------------------------------------------------
+# Training and scoring only need the model inputs plus a few id/label columns.
+# Reading just those (instead of SELECT *) keeps the account-id strings and raw
+# balances out of pandas; the compact dtypes shrink each chunk further.
+# float32 loses nothing here: the forest casts its input to float32 anyway.
+# transaction_type stays a string column; a categorical dtype with fixed
+# categories is the pd.Categorical(values, categories=...) conversion
+# type_codes avoids, and it warns (later raises) on a type outside the list.
+
+COLUMN_DTYPES = {
+    "transaction_id": "int64",
+    "step": "int32",
+    "hour_of_day": "int8",
+    "day_of_week": "int8",
+    "is_high_value": "int8",
+    "is_night_txn": "int8",
+    "is_fraud": "int8",
+    "is_flagged_fraud": "int8",
+    "transaction_amount": "float32",
+    "src_balance_change": "float32",
+    "dst_balance_change": "float32",
+    TYPE_COL: "str",
+}
+
+
+def projected_columns(encoder, key_cols=("transaction_id",)):
+    cols = list(key_cols) + encoder["numeric_cols"] + [encoder["type_col"]]
+    return list(dict.fromkeys(cols))
+
+
+def projected_dtypes(columns):
+    return {c: COLUMN_DTYPES[c] for c in columns if c in COLUMN_DTYPES}
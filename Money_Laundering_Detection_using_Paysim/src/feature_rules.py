@@ -0,0 +1,10 @@
+# ----------------------------------------------------
+# Rule thresholds for the derived transaction_features flags
+# ----------------------------------------------------
+# Shared by the batch stage (build_transaction_features.py builds its SQL
+# from them) and the scoring service (online_features.derive_features), so
+# both derive the same flags.
+
+HIGH_VALUE_AMOUNT = 200000   # is_high_value: amount > HIGH_VALUE_AMOUNT
+NIGHT_HOUR_START = 8         # is_night_txn: hour < NIGHT_HOUR_START
+NIGHT_HOUR_END = 20          #            or hour > NIGHT_HOUR_END
@@ -0,0 +1,161 @@
+import numpy as np
+
+# ----------------------------------------------------
+# Flattened RandomForest inference
+# ----------------------------------------------------
+# RandomForestClassifier.predict_proba walks each of its estimators in turn
+# and allocates a (rows x classes) array per tree. Here every tree of the
+# fitted forest is copied into one set of contiguous node arrays
+#   feature, threshold, children, leaf_proba
+# (node ids of tree t are offset by the node count of trees 0..t-1), and a
+# batch is evaluated by advancing all (tree, row) pairs one level per NumPy
+# step. Pairs that reach a leaf add their class-1 probability to the row and
+# drop out, so each level only touches the paths still descending.
+#
+# Splits use sklearn's rule exactly: go left when x <= threshold, with
+# float32 inputs compared against float64 thresholds, and NaN routed by the
+# node's missing_go_to_left flag. Children are stored as adjacent pairs so one
+# gather picks the next node, and leaves point to themselves (threshold +inf),
+# so pairs are only checked for leaves every few levels.
+#
+# Pure NumPy cannot out-walk sklearn's Cython traversal on big batches, but it
+# skips the per-estimator Python/joblib overhead, which dominates for small
+# ones (online scoring). benchmark_flat_forest.py shows the crossover.
+
+SCORE_BACKENDS = ("sklearn", "flat")
+
+# (tree, row) pairs per traversal block; small enough to stay cache-resident
+MAX_PAIRS_PER_BLOCK = 200_000
+# Levels advanced between leaf checks / compactions
+LEVELS_PER_CHECK = 4
+
+
+class FlatForest:
+    """Binary RandomForestClassifier flattened into NumPy arrays.
+
+    Drop-in for the scorer: predict_proba(X) returns the same (n, 2) array as
+    the source forest, up to float summation order.
+    """
+
+    def __init__(self, forest):
+        if getattr(forest, "n_outputs_", 1) != 1 or len(forest.classes_) != 2:
+            raise ValueError("FlatForest supports single-output binary classifiers only")
+
+        trees = [est.tree_ for est in forest.estimators_]
+        sizes = np.array([t.node_count for t in trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        self.classes_ = forest.classes_
+        self.n_features_in_ = forest.n_features_in_
+        self.n_trees = len(trees)
+        self.roots = offsets
+
+        feature, threshold, left, right, leaf_proba, missing_left = [], [], [], [], [], []
+        for tree, offset in zip(trees, offsets):
+            node_ids = np.arange(tree.node_count, dtype=np.int64) + offset
+            is_leaf = tree.children_left == -1
+
+            # Leaf value -> P(class 1). value may hold counts or fractions
+            # depending on the sklearn version, so normalise per node.
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1)
+            totals[totals == 0] = 1.0
+
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            leaf_proba.append(np.where(is_leaf, value[:, 1] / totals, 0.0))
+            missing_left.append(
+                getattr(tree, "missing_go_to_left", np.zeros(tree.node_count, dtype=np.uint8)).astype(bool)
+                & ~is_leaf
+            )
+
+        self.feature = np.concatenate(feature).astype(np.int64)
+        self.threshold = np.concatenate(threshold).astype(np.float64)
+        # Forests compacted by train_model.py already have float32 thresholds
+        # (model_compaction.round_thresholds_float32); then the comparison
+        # can stay in float32 without changing any split.
+        threshold32 = self.threshold.astype(np.float32)
+        if np.array_equal(threshold32.astype(np.float64), self.threshold):
+            self.threshold = threshold32
+        left = np.concatenate(left).astype(np.int64)
+        right = np.concatenate(right).astype(np.int64)
+        # children[2 * node] = left, children[2 * node + 1] = right
+        self.children = np.empty(2 * len(left), dtype=np.int64)
+        self.children[0::2] = left
+        self.children[1::2] = right
+        self.leaf_proba = np.concatenate(leaf_proba)
+        self.is_leaf = left == np.arange(len(left))
+        self.missing_go_to_left = np.concatenate(missing_left)
+
+    # Everything predict_proba reads; model_store.py saves these as .npy files
+    ARRAY_FIELDS = ("roots", "feature", "threshold", "children", "leaf_proba", "is_leaf", "missing_go_to_left")
+
+    @property
+    def node_count(self) -> int:
+        return len(self.feature)
+
+    def meta(self) -> dict:
+        return {"n_trees": self.n_trees, "n_features_in": int(self.n_features_in_),
+                "classes": self.classes_.tolist()}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Rebuild from ARRAY_FIELDS arrays (may be read-only memory maps) and meta()."""
+        flat = cls.__new__(cls)
+        for name in cls.ARRAY_FIELDS:
+            setattr(flat, name, arrays[name])
+        flat.n_trees = meta["n_trees"]
+        flat.n_features_in_ = meta["n_features_in"]
+        flat.classes_ = np.asarray(meta["classes"])
+        return flat
+
+    def _sum_leaf_proba(self, X: np.ndarray, roots: np.ndarray, out: np.ndarray):
+        n_rows, n_features = X.shape
+        X_flat = X.ravel()
+        has_nan = np.isnan(X_flat).any()
+
+        node = np.repeat(roots, n_rows)
+        # Offset of each pair's row in X_flat
+        row_base = np.tile(np.arange(n_rows, dtype=np.int64) * n_features, len(roots))
+
+        while node.size:
+            for _ in range(LEVELS_PER_CHECK):
+                x = X_flat[row_base + self.feature[node]]
+                go_right = ~(x <= self.threshold[node])
+                if has_nan:
+                    go_right &= ~(np.isnan(x) & self.missing_go_to_left[node])
+                node = self.children[2 * node + go_right]
+
+            leaf = self.is_leaf[node]
+            if leaf.any():
+                out += np.bincount(row_base[leaf] // n_features,
+                                   weights=self.leaf_proba[node[leaf]], minlength=n_rows)
+                keep = ~leaf
+                node = node[keep]
+                row_base = row_base[keep]
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Expected X with {self.n_features_in_} columns, got shape {X.shape}")
+
+        proba = np.zeros(X.shape[0], dtype=np.float64)
+        if X.shape[0]:
+            trees_per_block = max(1, MAX_PAIRS_PER_BLOCK // X.shape[0])
+            for i in range(0, self.n_trees, trees_per_block):
+                self._sum_leaf_proba(X, self.roots[i:i + trees_per_block], proba)
+        proba /= self.n_trees
+        return np.column_stack([1.0 - proba, proba])
+
+
+def scoring_model(model, backend: str = "sklearn"):
+    """Return the object the scorer calls predict_proba on for this backend."""
+    if backend == "sklearn":
+        return model
+    if backend == "flat":
+        if not hasattr(model, "estimators_") or not hasattr(model.estimators_[0], "tree_"):
+            raise ValueError(f"The flat backend needs a fitted RandomForest, got {type(model).__name__}")
+        return FlatForest(model)
+    raise ValueError(f"Unknown scoring backend '{backend}', expected one of {SCORE_BACKENDS}")
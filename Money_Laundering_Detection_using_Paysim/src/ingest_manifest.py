@@ -0,0 +1,62 @@
+import hashlib
+import os
+import sqlite3
+
+# ----------------------------------------------------
+# Manifest of PaySim files already loaded into raw_transactions
+# ----------------------------------------------------
+# Files are identified by (file_name, file_size, sha256). Append-mode ingestion
+# skips any file whose checksum is already in the manifest; the full-reload
+# modes reset it to the single file they loaded.
+
+MANIFEST_TABLE = "ingest_manifest"
+
+# Natural key used to skip rows that were already ingested
+NATURAL_KEY = ["step", "name_orig", "name_dest", "amount"]
+
+
+def file_checksum(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def ensure_manifest(conn: sqlite3.Connection):
+    conn.execute(f"""
+    CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+        file_name TEXT NOT NULL,
+        file_size INTEGER NOT NULL,
+        sha256 TEXT NOT NULL PRIMARY KEY,
+        rows_in_file INTEGER NOT NULL,
+        rows_loaded INTEGER NOT NULL,
+        first_transaction_id INTEGER,
+        last_transaction_id INTEGER,
+        loaded_at TEXT NOT NULL
+    );
+    """)
+
+
+def loaded_checksums(conn: sqlite3.Connection) -> set:
+    ensure_manifest(conn)
+    return {row[0] for row in conn.execute(f"SELECT sha256 FROM {MANIFEST_TABLE};")}
+
+
+def reset_manifest(conn: sqlite3.Connection):
+    conn.execute(f"DROP TABLE IF EXISTS {MANIFEST_TABLE};")
+    ensure_manifest(conn)
+
+
+def record_file(conn: sqlite3.Connection, path: str, sha256: str, rows_in_file: int,
+                rows_loaded: int, first_id=None, last_id=None):
+    conn.execute(
+        f"""
+        INSERT OR REPLACE INTO {MANIFEST_TABLE}
+            (file_name, file_size, sha256, rows_in_file, rows_loaded,
+             first_transaction_id, last_transaction_id, loaded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'));
+        """,
+        (os.path.basename(path), os.path.getsize(path), sha256, rows_in_file, rows_loaded,
+         first_id, last_id),
+    )
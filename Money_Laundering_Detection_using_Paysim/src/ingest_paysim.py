@@ -1,10 +1,36 @@
+import argparse
 import os
 import sys
+import time
 
 from dotenv import load_dotenv
 import pandas as pd
 from sqlalchemy import create_engine, text
 
+import sqlite_bulk
+from db_indexes import apply_indexes
+from ingest_manifest import (
+    NATURAL_KEY,
+    file_checksum,
+    loaded_checksums,
+    record_file,
+    reset_manifest,
+)
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+parser = argparse.ArgumentParser(description="Load the PaySim CSV into SQLite (raw_transactions).")
+parser.add_argument(
+    "--mode",
+    choices=["pandas", "bulk", "append"],
+    default=None,
+    help="pandas: read whole CSV + to_sql; bulk: streamed chunks via raw sqlite3; "
+         "append: load only new files in data/raw, deduplicated "
+         "(default: INGEST_MODE from .env, else pandas).",
+)
+args = parser.parse_args()
+
 # ----------------------------------------------------
 # 1. Load environment variables from .env
 # ----------------------------------------------------
@@ -23,6 +49,10 @@ if not DB_PATH:
     print("ERROR: DB_PATH is not set in .env")
     sys.exit(1)
 
+ingest_mode = (args.mode or os.getenv("INGEST_MODE", "pandas")).lower()
+chunk_rows = int(os.getenv("INGEST_CHUNK_ROWS", "250000"))
+journal_mode = os.getenv("INGEST_JOURNAL_MODE", "OFF").upper()  # OFF or WAL during bulk load
+
 # Create db directory if it doesn't exist
 db_full_path = os.path.join(BASE_DIR, DB_PATH)
 db_dir = os.path.dirname(db_full_path)
@@ -45,7 +75,7 @@ except Exception as e:
     sys.exit(1)
 
 # ----------------------------------------------------
-# 3. Locate the PaySim CSV file in data/raw
+# 3. Locate the PaySim CSV file(s) in data/raw
 # ----------------------------------------------------
 raw_dir = os.path.join(BASE_DIR, "data", "raw")
 
@@ -59,31 +89,22 @@ if not csv_files:
     print(f"ERROR: No CSV files found in {raw_dir}")
     sys.exit(1)
 
-if len(csv_files) > 1:
+if ingest_mode == "append":
+    # Every file is considered; the manifest decides which ones are new
+    csv_files = sorted(csv_files)
+    print(f"Found {len(csv_files)} CSV file(s) in data/raw.")
+elif len(csv_files) > 1:
     print("WARNING: Multiple CSV files found in data/raw. Using the first one:")
     for f in csv_files:
         print(" -", f)
 
 csv_name = csv_files[0]
 csv_path = os.path.join(raw_dir, csv_name)
-print(f"Reading PaySim data from: {csv_path}")
-
-# ----------------------------------------------------
-# 4. Read CSV into pandas
-# ----------------------------------------------------
-try:
-    df = pd.read_csv(csv_path)
-except Exception as e:
-    print("❌ Failed to read CSV file.")
-    print(e)
-    sys.exit(1)
-
-print("✅ CSV loaded.")
-print("DataFrame shape:", df.shape)
-print("Columns:", df.columns.tolist())
+if ingest_mode != "append":
+    print(f"Reading PaySim data from: {csv_path}")
 
 # ----------------------------------------------------
-# 5. Validate and rename columns
+# 4. Validate the CSV header and set up the column mapping
 # ----------------------------------------------------
 rename_map = {
     "step": "step",
@@ -99,30 +120,233 @@ rename_map = {
     "isFlaggedFraud": "is_flagged_fraud",
 }
 
-missing_cols = [c for c in rename_map.keys() if c not in df.columns]
-if missing_cols:
-    print("ERROR: The CSV is missing expected columns:", missing_cols)
-    sys.exit(1)
+# Declared dtypes for the streaming paths (no inference pass over the file)
+csv_dtypes = {
+    "step": "int32",
+    "type": "str",
+    "amount": "float64",
+    "nameOrig": "str",
+    "oldbalanceOrg": "float64",
+    "newbalanceOrig": "float64",
+    "nameDest": "str",
+    "oldbalanceDest": "float64",
+    "newbalanceDest": "float64",
+    "isFraud": "int8",
+    "isFlaggedFraud": "int8",
+}
 
-df = df.rename(columns=rename_map)
+raw_schema = [
+    ("transaction_id", "INTEGER PRIMARY KEY"),
+    ("step", "INTEGER"),
+    ("type", "TEXT"),
+    ("amount", "REAL"),
+    ("name_orig", "TEXT"),
+    ("old_balance_orig", "REAL"),
+    ("new_balance_orig", "REAL"),
+    ("name_dest", "TEXT"),
+    ("old_balance_dest", "REAL"),
+    ("new_balance_dest", "REAL"),
+    ("is_fraud", "INTEGER"),
+    ("is_flagged_fraud", "INTEGER"),
+]
+data_cols = [name for name, _ in raw_schema[1:]]
 
-# Add synthetic primary key
-df.insert(0, "transaction_id", range(1, len(df) + 1))
 
-# ----------------------------------------------------
-# 6. Write to SQLite: table 'raw_transactions'
-# ----------------------------------------------------
-table_name = "raw_transactions"
+def check_header(path: str) -> bool:
+    try:
+        header = pd.read_csv(path, nrows=0).columns.tolist()
+    except Exception as e:
+        print(f"❌ Failed to read CSV file {path}.")
+        print(e)
+        return False
 
-print(f"Writing DataFrame to SQLite table '{table_name}' (this may take a while)...")
+    missing_cols = [c for c in rename_map.keys() if c not in header]
+    if missing_cols:
+        print(f"ERROR: {os.path.basename(path)} is missing expected columns:", missing_cols)
+        return False
+    return True
 
-try:
-    df.to_sql(table_name, engine, if_exists="replace", index=False, chunksize=100000)
-    print(f"✅ Successfully loaded data into table '{table_name}'.")
-except Exception as e:
-    print("❌ Failed to write DataFrame to SQLite.")
-    print(e)
+
+def iter_csv_chunks(path: str):
+    reader = pd.read_csv(
+        path,
+        usecols=list(rename_map.keys()),
+        dtype=csv_dtypes,
+        chunksize=chunk_rows,
+    )
+    for chunk in reader:
+        yield chunk.rename(columns=rename_map)
+
+
+if ingest_mode != "append" and not check_header(csv_path):
     sys.exit(1)
 
-print("🎉 Ingestion completed successfully.")
+table_name = "raw_transactions"
+
+if ingest_mode == "append":
+    # ------------------------------------------------
+    # 5. Append path: load only new files, dedupe on the natural key
+    # ------------------------------------------------
+    # Each new file is streamed into a staging table, then inserted in one
+    # INSERT ... SELECT that skips rows whose (step, name_orig, name_dest,
+    # amount) already exists (an index probe per row, no rescans) and numbers
+    # the survivors from the current max transaction_id. The insert and the
+    # manifest row commit together. A rollback journal is needed here, so a
+    # journal_mode of OFF is upgraded to WAL.
+    append_journal_mode = "WAL" if journal_mode == "OFF" else journal_mode
+    staging = "ingest_staging"
+    key_match = " AND ".join(f"r.{c} = s.{c}" for c in NATURAL_KEY)
+    key_list = ", ".join(NATURAL_KEY)
+
+    try:
+        conn = sqlite_bulk.connect(db_full_path)
+        with sqlite_bulk.fast_load_pragmas(conn, journal_mode=append_journal_mode):
+            sqlite_bulk.create_table(conn, table_name, raw_schema, replace=False)
+            # Includes the natural-key index the dedup probes rely on
+            apply_indexes(conn, table_name)
+            already_loaded = loaded_checksums(conn)
+
+            for name in csv_files:
+                path = os.path.join(raw_dir, name)
+                sha256 = file_checksum(path)
+                if sha256 in already_loaded:
+                    print(f"Skipping {name}: already loaded (sha256 {sha256[:12]}...).")
+                    continue
+                if not check_header(path):
+                    sys.exit(1)
+
+                print(f"\nAppending {name} ...")
+                file_start = time.perf_counter()
+                conn.execute("BEGIN;")
+
+                sqlite_bulk.create_table(
+                    conn, f"temp.{staging}", [("seq", "INTEGER PRIMARY KEY")] + raw_schema[1:]
+                )
+                rows_in_file = 0
+                for chunk in iter_csv_chunks(path):
+                    chunk.insert(0, "seq", range(rows_in_file + 1, rows_in_file + len(chunk) + 1))
+                    rows_in_file += sqlite_bulk.insert_frame(
+                        conn, f"temp.{staging}", chunk, ["seq"] + data_cols
+                    )
+
+                base_id = conn.execute(f"SELECT COALESCE(MAX(transaction_id), 0) FROM {table_name};").fetchone()[0]
+                cur = conn.execute(f"""
+                INSERT INTO {table_name} (transaction_id, {", ".join(data_cols)})
+                SELECT {base_id} + ROW_NUMBER() OVER (ORDER BY s.seq), {", ".join("s." + c for c in data_cols)}
+                FROM temp.{staging} s
+                WHERE s.seq IN (SELECT MIN(seq) FROM temp.{staging} GROUP BY {key_list})
+                  AND NOT EXISTS (SELECT 1 FROM {table_name} r WHERE {key_match});
+                """)
+                rows_loaded = cur.rowcount
+                last_id = base_id + rows_loaded
+
+                record_file(conn, path, sha256, rows_in_file, rows_loaded,
+                            base_id + 1 if rows_loaded else None, last_id if rows_loaded else None)
+                conn.execute(f"DROP TABLE temp.{staging};")
+                conn.execute("COMMIT;")
+                already_loaded.add(sha256)
+
+                file_seconds = time.perf_counter() - file_start
+                print(
+                    f"✅ {name}: {rows_in_file:,} rows read, {rows_loaded:,} appended, "
+                    f"{rows_in_file - rows_loaded:,} duplicates skipped; transaction_id now up to {last_id:,} "
+                    f"({rows_in_file / max(file_seconds, 1e-9):,.0f} rows/s)"
+                )
+        conn.close()
+    except Exception as e:
+        print("❌ Incremental ingestion failed.")
+        print(e)
+        sys.exit(1)
+
+elif ingest_mode == "bulk":
+    # ------------------------------------------------
+    # 5. Bulk path: stream CSV chunks -> raw sqlite3 executemany
+    # ------------------------------------------------
+    # One transaction, load-time PRAGMAs (restored afterwards), and at most
+    # one chunk of the CSV in memory regardless of file size.
+    print(f"Bulk-loading into '{table_name}' ({chunk_rows} rows per chunk, journal_mode={journal_mode})...")
+
+    insert_cols = [name for name, _ in raw_schema]
+    loaded = 0
+    load_start = time.perf_counter()
+
+    try:
+        conn = sqlite_bulk.connect(db_full_path)
+        with sqlite_bulk.fast_load_pragmas(conn, journal_mode=journal_mode):
+            conn.execute("BEGIN;")
+            sqlite_bulk.create_table(conn, table_name, raw_schema)
+
+            for chunk in iter_csv_chunks(csv_path):
+                chunk_start = time.perf_counter()
+                # Same synthetic primary key as the pandas path: 1..n in file order
+                chunk.insert(0, "transaction_id", range(loaded + 1, loaded + len(chunk) + 1))
 
+                loaded += sqlite_bulk.insert_frame(conn, table_name, chunk, insert_cols)
+                chunk_seconds = time.perf_counter() - chunk_start
+                print(
+                    f"Loaded {loaded:,} rows "
+                    f"({len(chunk) / chunk_seconds:,.0f} rows/s this chunk)"
+                )
+
+            # Full reload: the manifest now describes just this file
+            reset_manifest(conn)
+            record_file(conn, csv_path, file_checksum(csv_path), loaded, loaded, 1, loaded)
+            conn.execute("COMMIT;")
+
+            print(f"Building indexes on '{table_name}'...")
+            apply_indexes(conn, table_name)
+        conn.close()
+    except Exception as e:
+        print("❌ Bulk load into SQLite failed.")
+        print(e)
+        sys.exit(1)
+
+    load_seconds = time.perf_counter() - load_start
+    print(f"✅ Successfully loaded {loaded:,} rows into table '{table_name}'.")
+    print(f"Bulk load time: {load_seconds:.1f}s ({loaded / max(load_seconds, 1e-9):,.0f} rows/s)")
+else:
+    # ------------------------------------------------
+    # 5. pandas path: read CSV into pandas
+    # ------------------------------------------------
+    try:
+        df = pd.read_csv(csv_path)
+    except Exception as e:
+        print("❌ Failed to read CSV file.")
+        print(e)
+        sys.exit(1)
+
+    print("✅ CSV loaded.")
+    print("DataFrame shape:", df.shape)
+
+    df = df.rename(columns=rename_map)
+
+    # Add synthetic primary key
+    df.insert(0, "transaction_id", range(1, len(df) + 1))
+
+    # ------------------------------------------------
+    # 6. Write to SQLite: table 'raw_transactions'
+    # ------------------------------------------------
+    print(f"Writing DataFrame to SQLite table '{table_name}' (this may take a while)...")
+
+    try:
+        df.to_sql(table_name, engine, if_exists="replace", index=False, chunksize=100000)
+        print(f"✅ Successfully loaded data into table '{table_name}'.")
+    except Exception as e:
+        print("❌ Failed to write DataFrame to SQLite.")
+        print(e)
+        sys.exit(1)
+
+    # Full reload: the manifest now describes just this file
+    try:
+        conn = sqlite_bulk.connect(db_full_path)
+        reset_manifest(conn)
+        record_file(conn, csv_path, file_checksum(csv_path), len(df), len(df), 1, len(df))
+        print(f"Building indexes on '{table_name}'...")
+        apply_indexes(conn, table_name)
+        conn.close()
+    except Exception as e:
+        print("❌ Failed to update the ingest manifest / indexes.")
+        print(e)
+        sys.exit(1)
+
+print("🎉 Ingestion completed successfully.")
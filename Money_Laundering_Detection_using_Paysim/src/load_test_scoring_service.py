@@ -0,0 +1,165 @@
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+import numpy as np
+from sqlalchemy import create_engine
+
+from sampling import sample_rows
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+parser = argparse.ArgumentParser(description="Load-test the online scoring service.")
+parser.add_argument("--url", default=None,
+                    help="Service base URL (default: from SCORE_SERVICE_HOST/PORT in .env).")
+parser.add_argument("--requests", type=int, default=2000, help="Requests to send after warm-up.")
+parser.add_argument("--concurrency", type=int, default=4, help="Client threads.")
+parser.add_argument("--batch-size", type=int, default=1, help="Transactions per request.")
+parser.add_argument("--warmup", type=int, default=50, help="Untimed requests sent first.")
+args = parser.parse_args()
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_url = f"sqlite:///{os.path.join(BASE_DIR, DB_PATH)}"
+url = args.url or (f"http://{os.getenv('SCORE_SERVICE_HOST', '127.0.0.1')}:"
+                   f"{os.getenv('SCORE_SERVICE_PORT', '8765')}")
+target = urlparse(url)
+
+# ----------------------------------------------------
+# 2. Build request payloads from raw_transactions
+# ----------------------------------------------------
+# Real PaySim rows, sent in raw form so the service does the derivations
+raw_cols = ["transaction_id", "step", "type", "amount", "name_orig", "old_balance_orig",
+            "new_balance_orig", "name_dest", "old_balance_dest", "new_balance_dest"]
+n_payload_rows = min(args.requests, 1000) * args.batch_size
+
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        df_raw = sample_rows(conn, n_payload_rows, raw_cols, table="raw_transactions", seed=7)
+except Exception as e:
+    print("❌ Failed to read raw_transactions.")
+    print(e)
+    sys.exit(1)
+
+if df_raw.empty:
+    print("ERROR: raw_transactions is empty.")
+    sys.exit(1)
+
+records = json.loads(df_raw.to_json(orient="records"))
+bodies = []
+for i in range(0, len(records), args.batch_size):
+    batch = records[i:i + args.batch_size]
+    payload = batch[0] if args.batch_size == 1 else {"transactions": batch}
+    bodies.append(json.dumps(payload).encode("utf-8"))
+
+print(f"Target: {url} | {args.requests} requests x {args.batch_size} transaction(s), "
+      f"{args.concurrency} client threads")
+
+# ----------------------------------------------------
+# 3. Fire requests
+# ----------------------------------------------------
+latencies = []
+errors = []
+lock = threading.Lock()
+counter = iter(range(args.warmup + args.requests))
+
+
+def client():
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    local_latencies, local_errors = [], []
+    while True:
+        with lock:
+            i = next(counter, None)
+        if i is None:
+            break
+        body = bodies[i % len(bodies)]
+        start = time.perf_counter()
+        try:
+            conn.request("POST", "/score", body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            response.read()
+            ok = response.status == 200
+        except (OSError, http.client.HTTPException) as e:
+            ok = False
+            conn.close()
+            conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+            response = e
+        elapsed = time.perf_counter() - start
+        if i < args.warmup:
+            continue
+        if ok:
+            local_latencies.append(elapsed)
+        else:
+            local_errors.append(getattr(response, "status", str(response)))
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        errors.extend(local_errors)
+
+
+threads = [threading.Thread(target=client) for _ in range(max(1, args.concurrency))]
+wall_start = time.perf_counter()
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+wall_seconds = time.perf_counter() - wall_start
+
+# ----------------------------------------------------
+# 4. Report
+# ----------------------------------------------------
+if not latencies:
+    print(f"❌ No successful requests ({len(errors)} errors, e.g. {errors[:3]}).")
+    sys.exit(1)
+
+ms = np.array(latencies) * 1000
+n_ok = len(latencies)
+print(f"\nSuccessful requests: {n_ok}, errors: {len(errors)}")
+print(f"Latency ms: p50 {np.percentile(ms, 50):.2f} | p90 {np.percentile(ms, 90):.2f} | "
+      f"p99 {np.percentile(ms, 99):.2f} | max {ms.max():.2f}")
+# Wall time includes the warm-up requests
+print(f"Throughput: {n_ok / wall_seconds:,.0f} requests/s, "
+      f"{n_ok * args.batch_size / wall_seconds:,.0f} transactions/s")
+
+if errors:
+    print(f"⚠️ Error responses: {sorted(set(map(str, errors)))[:5]}")
+
+# Batch sizes the service's micro-batcher actually achieved (cumulative)
+try:
+    conn = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=10)
+    conn.request("GET", "/stats")
+    stats = json.loads(conn.getresponse().read())
+    conn.close()
+except (OSError, http.client.HTTPException, ValueError):
+    stats = {}
+
+if "batch_size" in stats:
+    bs = stats["batch_size"]
+    print(f"Service batches: {stats['batches']} | batch size mean {bs['mean']}, p50 {bs['p50']:.0f}, "
+          f"p90 {bs['p90']:.0f}, max {bs['max']} | histogram {bs['histogram']}")
+    print(f"Service settings: max_batch {stats['max_batch']}, max_wait {stats['max_wait_ms']} ms "
+          f"(adaptive {stats['adaptive']}, fit {stats['predict_fit_ms']})")
+print("🎉 Load test finished.")
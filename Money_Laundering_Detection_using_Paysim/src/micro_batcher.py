@@ -0,0 +1,244 @@
+import collections
+import queue
+import threading
+import time
+
+import numpy as np
+
+# ----------------------------------------------------
+# Adaptive micro-batching for the scoring service
+# ----------------------------------------------------
+# A predict call on one row costs nearly as much as one on a few hundred, so
+# concurrent requests are coalesced: a single scorer thread takes the first
+# waiting request, keeps collecting until max_batch rows or max_wait_ms have
+# passed, scores them in one call and hands each caller its own slice.
+#
+# With adaptive=True both limits are re-derived from what predict actually
+# costs. Every batch's (rows, seconds) is recorded and a linear fit
+#   predict_ms(n) = overhead_ms + per_row_ms * n
+# is refreshed every TUNE_EVERY batches. Then:
+#   max_batch    largest n whose predict fits in half of target_ms
+#   max_wait_ms  what is left of target_ms after predicting max_batch rows,
+#                at most half of target_ms
+# Waiting only helps when another request is likely to arrive. The smoothed
+# number of callers already in flight when a request arrives estimates how
+# many requests a batch can expect: collection stops once that many (+1) are
+# in, and the wait is skipped entirely when callers don't overlap (e.g. one
+# sequential client) or the smoothed inter-arrival gap exceeds max_wait_ms.
+
+TUNE_EVERY = 20
+HISTORY = 500
+# Batch-size buckets for report()
+BATCH_BUCKETS = (1, 4, 16, 64, 256, 1024)
+
+
+class _Request:
+    __slots__ = ("records", "done", "results", "error")
+
+    def __init__(self, records):
+        self.records = records
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesce score(records) calls from many threads into batched predicts.
+
+    predict_fn(records) -> list of per-record results, same order.
+    """
+
+    def __init__(self, predict_fn, max_batch: int = 256, max_wait_ms: float = 2.0,
+                 target_ms: float = 10.0, adaptive: bool = True, hard_max_batch: int = 4096):
+        self.predict_fn = predict_fn
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.target_ms = target_ms
+        self.adaptive = adaptive
+        self.hard_max_batch = hard_max_batch
+
+        self._queue = queue.Queue()
+        self._observations = collections.deque(maxlen=HISTORY)
+        self._batch_sizes = collections.Counter()
+        self._lock = threading.Lock()
+        self._fit = None
+        self._gap_ms = None
+        self._last_arrival = None
+        self._in_flight = 0
+        self._overlap = 0.0
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------
+    # Caller side
+    # ------------------------------------------------
+    def score(self, records):
+        """Block until records are scored; re-raises predict_fn's exception."""
+        request = _Request(records)
+        now = time.perf_counter()
+        with self._lock:
+            if self._last_arrival is not None:
+                gap = (now - self._last_arrival) * 1000
+                self._gap_ms = gap if self._gap_ms is None else 0.9 * self._gap_ms + 0.1 * gap
+            self._last_arrival = now
+            self._overlap = 0.9 * self._overlap + 0.1 * self._in_flight
+            self._in_flight += 1
+        try:
+            self._queue.put(request)
+            request.done.wait()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def close(self):
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join()
+
+    # ------------------------------------------------
+    # Scorer thread
+    # ------------------------------------------------
+    def _collect(self, first):
+        batch, n_rows = [first], len(first.records)
+        wait_ms = self.max_wait_ms
+        with self._lock:
+            if self._overlap < 0.5 or (self._gap_ms is not None and self._gap_ms > wait_ms):
+                wait_ms = 0.0
+            expected_requests = int(round(self._overlap)) + 1
+        deadline = time.perf_counter() + wait_ms / 1000
+
+        while n_rows < self.max_batch:
+            if len(batch) >= expected_requests and self._queue.empty():
+                break
+            try:
+                # Whatever is already queued is taken even when not waiting
+                timeout = deadline - time.perf_counter()
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._stopped = True
+                break
+            batch.append(request)
+            n_rows += len(request.records)
+        return batch, n_rows
+
+    def _run(self):
+        while not self._stopped:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, n_rows = self._collect(first)
+
+            records = [r for request in batch for r in request.records]
+            start = time.perf_counter()
+            try:
+                results = self.predict_fn(records)
+            except Exception:
+                # One bad request must not fail its neighbours: retry singly
+                self._score_individually(batch)
+                continue
+            self._observe(n_rows, time.perf_counter() - start)
+
+            offset = 0
+            for request in batch:
+                request.results = results[offset:offset + len(request.records)]
+                offset += len(request.records)
+                request.done.set()
+
+        # Release anyone still queued at shutdown
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None:
+                request.error = RuntimeError("micro-batcher stopped")
+                request.done.set()
+
+    def _score_individually(self, batch):
+        for request in batch:
+            try:
+                request.results = self.predict_fn(request.records)
+            except Exception as e:
+                request.error = e
+            request.done.set()
+
+    # ------------------------------------------------
+    # Tuning & reporting
+    # ------------------------------------------------
+    def _observe(self, n_rows: int, seconds: float):
+        with self._lock:
+            self._batch_sizes[n_rows] += 1
+            self._observations.append((n_rows, seconds * 1000))
+            n_batches = sum(self._batch_sizes.values())
+        if self.adaptive and n_batches % TUNE_EVERY == 0:
+            self._tune()
+
+    def _tune(self):
+        with self._lock:
+            obs = np.array(self._observations)
+        if len(obs) < TUNE_EVERY:
+            return
+        budget_ms = self.target_ms / 2
+        if np.ptp(obs[:, 0]) > 0:
+            per_row_ms, overhead_ms = np.polyfit(obs[:, 0], obs[:, 1], 1)
+            per_row_ms = max(per_row_ms, 1e-6)
+            overhead_ms = max(overhead_ms, 0.0)
+            max_batch = int((budget_ms - overhead_ms) / per_row_ms)
+            max_batch = min(max(max_batch, 1), self.hard_max_batch)
+        else:
+            # Only one batch size seen so far: the per-row cost is unknown, so
+            # keep max_batch and charge the observed time to it
+            max_batch = self.max_batch
+            per_row_ms = float(np.median(obs[:, 1])) / max(obs[0, 0], 1)
+            overhead_ms = 0.0
+        predict_ms = overhead_ms + per_row_ms * max_batch
+        max_wait_ms = min(max(self.target_ms - predict_ms, 0.0), budget_ms)
+
+        with self._lock:
+            self._fit = (overhead_ms, per_row_ms)
+            self.max_batch = max_batch
+            self.max_wait_ms = max_wait_ms
+
+    def report(self) -> dict:
+        """Current settings, the latency fit and the achieved batch sizes."""
+        with self._lock:
+            sizes = dict(self._batch_sizes)
+            fit = self._fit
+            gap_ms = self._gap_ms
+            overlap = self._overlap
+
+        n_batches = sum(sizes.values())
+        n_rows = sum(size * count for size, count in sizes.items())
+        buckets = {}
+        lower = 1
+        for upper in BATCH_BUCKETS + (None,):
+            label = f"{lower}+" if upper is None else (str(lower) if lower == upper else f"{lower}-{upper}")
+            buckets[label] = sum(c for s, c in sizes.items() if s >= lower and (upper is None or s <= upper))
+            if upper is not None:
+                lower = upper + 1
+
+        expanded = np.repeat(list(sizes.keys()), list(sizes.values())) if sizes else np.zeros(1)
+        return {
+            "adaptive": self.adaptive,
+            "max_batch": self.max_batch,
+            "max_wait_ms": round(self.max_wait_ms, 3),
+            "target_ms": self.target_ms,
+            "predict_fit_ms": None if fit is None else {"overhead": round(fit[0], 4), "per_row": round(fit[1], 6)},
+            "mean_gap_ms": None if gap_ms is None else round(gap_ms, 3),
+            "mean_overlap": round(overlap, 3),
+            "batches": n_batches,
+            "rows": n_rows,
+            "batch_size": {
+                "mean": round(n_rows / n_batches, 2) if n_batches else 0.0,
+                "p50": float(np.percentile(expanded, 50)),
+                "p90": float(np.percentile(expanded, 90)),
+                "max": int(expanded.max()),
+                "histogram": buckets,
+            },
+        }
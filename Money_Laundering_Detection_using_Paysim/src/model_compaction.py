@@ -0,0 +1,127 @@
+import copy
+import io
+import time
+
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import roc_auc_score
+
+# ----------------------------------------------------
+# Size/latency-aware compaction of the RandomForest
+# ----------------------------------------------------
+# The unbounded forest (max_depth=None, 200 trees) is large on disk, slow to
+# joblib.load and slow to walk. train_model.py can instead fit a small grid of
+# capped candidates, measure each one, and keep the fastest that stays within
+# a tolerated AUC loss of the full forest:
+#   depth / leaf caps   max_depth, max_leaf_nodes (refit)
+#   pruning             ccp_alpha cost-complexity pruning (refit)
+#   fewer trees         the first k estimators of the full forest (no refit)
+#
+# Every candidate also gets float32 thresholds. Rounding each threshold DOWN
+# to the nearest float32 keeps predictions bit-identical, because scoring
+# inputs are float32 (feature_encoder.encode): for float32 x,
+#   x <= t  <=>  x <= largest float32 <= t.
+# Round-to-nearest could move a threshold above an input and flip a split.
+
+# name -> RandomForestClassifier overrides (refit) or {"n_estimators": k,
+# "truncate": True} (first k trees of the full forest)
+COMPACTION_CANDIDATES = {
+    "full": {},
+    "depth_16": {"max_depth": 16},
+    "depth_12": {"max_depth": 12},
+    "depth_8": {"max_depth": 8},
+    "leaves_256": {"max_leaf_nodes": 256},
+    "leaves_64": {"max_leaf_nodes": 64},
+    "ccp_1e-4": {"ccp_alpha": 1e-4},
+    "trees_100": {"n_estimators": 100, "truncate": True},
+    "trees_50": {"n_estimators": 50, "truncate": True},
+}
+
+
+def round_thresholds_float32(forest):
+    """Round every split threshold down to a float32 value, in place."""
+    for est in forest.estimators_:
+        thresholds = est.tree_.threshold  # writable view of the node array
+        internal = est.tree_.children_left != -1
+        t32 = thresholds[internal].astype(np.float32)
+        # astype rounds to nearest; step down wherever that went above t
+        above = t32.astype(np.float64) > thresholds[internal]
+        t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+        thresholds[internal] = t32
+    return forest
+
+
+def truncate_forest(forest, n_estimators: int):
+    """Shallow copy of a fitted forest keeping only its first n_estimators trees."""
+    small = copy.copy(forest)
+    small.estimators_ = forest.estimators_[:n_estimators]
+    small.n_estimators = len(small.estimators_)
+    return small
+
+
+def forest_nodes(forest) -> int:
+    return int(sum(est.tree_.node_count for est in forest.estimators_))
+
+
+def measure_candidate(forest, X_test, y_test, latency_rows: int = 1000, repeats: int = 5):
+    """AUC, pickled size, load time and single-threaded predict latency."""
+    buf = io.BytesIO()
+    joblib.dump(forest, buf)
+    size_bytes = buf.tell()
+
+    buf.seek(0)
+    start = time.perf_counter()
+    joblib.load(buf)
+    load_seconds = time.perf_counter() - start
+
+    n_jobs = forest.n_jobs
+    forest.n_jobs = 1
+    try:
+        auc = roc_auc_score(y_test, forest.predict_proba(X_test)[:, 1])
+        batch = X_test[:latency_rows]
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            forest.predict_proba(batch)
+            timings.append(time.perf_counter() - start)
+    finally:
+        forest.n_jobs = n_jobs
+
+    return {
+        "auc": float(auc),
+        "size_mb": size_bytes / 1e6,
+        "load_ms": load_seconds * 1000,
+        # Median of repeats, per latency_rows batch
+        "predict_ms": float(np.median(timings)) * 1000,
+        "nodes": forest_nodes(forest),
+    }
+
+
+def build_candidates(full_model, X_train, y_train, names=None):
+    """Yield (name, params, fitted forest) for each compaction candidate."""
+    for name, params in COMPACTION_CANDIDATES.items():
+        if names is not None and name not in names:
+            continue
+        if name == "full":
+            forest = copy.deepcopy(full_model)
+        elif params.get("truncate"):
+            forest = copy.deepcopy(truncate_forest(full_model, params["n_estimators"]))
+        else:
+            forest = clone(full_model).set_params(**params)
+            forest.fit(X_train, y_train)
+        yield name, params, round_thresholds_float32(forest)
+
+
+def select_candidate(results, max_auc_loss: float, latency_budget_ms=None):
+    """Fastest candidate within max_auc_loss of the full forest (and within
+    the latency budget when one is given); falls back to "full"."""
+    reference_auc = results["full"]["auc"]
+    eligible = [
+        name for name, r in results.items()
+        if r["auc"] >= reference_auc - max_auc_loss
+        and (latency_budget_ms is None or r["predict_ms"] <= latency_budget_ms)
+    ]
+    if not eligible:
+        return "full"
+    return min(eligible, key=lambda name: (results[name]["predict_ms"], results[name]["size_mb"]))
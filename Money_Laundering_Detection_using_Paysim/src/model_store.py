@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import joblib
+import numpy as np
+
+from feature_encoder import get_encoder
+from flat_forest import FlatForest, scoring_model
+
+# ----------------------------------------------------
+# Model loading: mmap-friendly layout + in-process cache
+# ----------------------------------------------------
+# joblib.load unpickles the whole forest into private memory on every call,
+# and sklearn's Tree copies its node arrays on unpickle even under
+# mmap_mode, so N scorer processes hold N copies. For the flat backend the
+# bundle is also exported next to the .pkl as raw .npy arrays:
+#
+#   models/rf_aml_model.flat/
+#       meta.json          source sha256, feature_cols, encoder, forest meta
+#       feature.npy, threshold.npy, children.npy, ...
+#
+# and loaded with np.load(mmap_mode="r"): no unpickling, and every process
+# maps the same page-cache pages. The export is rebuilt when the .pkl's hash
+# no longer matches meta.json.
+#
+# load_model() caches what it loads per (sha256, backend), so repeated calls
+# in one process (or in workers forked after the first load) don't reload.
+
+STORE_SUFFIX = ".flat"
+META_FILE = "meta.json"
+
+_MODEL_CACHE = {}
+# (path, mtime_ns, size) -> sha256, so cache hits don't re-hash the file
+_HASH_CACHE = {}
+
+
+def model_fingerprint(model_path: str) -> str:
+    stat = os.stat(model_path)
+    key = (os.path.abspath(model_path), stat.st_mtime_ns, stat.st_size)
+    if key not in _HASH_CACHE:
+        h = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        _HASH_CACHE[key] = h.hexdigest()
+    return _HASH_CACHE[key]
+
+
+def store_dir_for(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + STORE_SUFFIX
+
+
+def export_flat_store(model_bundle, model_sha256: str, store_dir: str):
+    """Write the flattened forest + bundle metadata as .npy files (atomically).
+
+    Raises ValueError (via scoring_model) if the bundle isn't a RandomForest.
+    """
+    flat = scoring_model(model_bundle["model"], "flat")
+    meta = dict(
+        flat.meta(),
+        source_sha256=model_sha256,
+        feature_cols=list(model_bundle["feature_cols"]),
+        encoder=get_encoder(model_bundle),
+    )
+
+    parent = os.path.dirname(os.path.abspath(store_dir))
+    tmp_dir = tempfile.mkdtemp(prefix=".flat-", dir=parent)
+    try:
+        for name in FlatForest.ARRAY_FIELDS:
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(flat, name))
+        with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+            json.dump(meta, f)
+        if os.path.isdir(store_dir):
+            shutil.rmtree(store_dir)
+        os.replace(tmp_dir, store_dir)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return flat
+
+
+def read_flat_store(store_dir: str, model_sha256: str):
+    """Return (FlatForest, meta) memory-mapped from store_dir, or None if the
+    store is missing or was exported from a different model file."""
+    meta_path = os.path.join(store_dir, META_FILE)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path) as f:
+        meta = json.load(f)
+    if meta.get("source_sha256") != model_sha256:
+        return None
+
+    arrays = {
+        name: np.load(os.path.join(store_dir, f"{name}.npy"), mmap_mode="r")
+        for name in FlatForest.ARRAY_FIELDS
+    }
+    return FlatForest.from_arrays(arrays, meta), meta
+
+
+def load_model(model_path: str, backend: str = "sklearn"):
+    """Return {"model", "feature_cols", "encoder", "sha256"} for backend,
+    where model is ready for predict_proba (see flat_forest.scoring_model)."""
+    model_sha256 = model_fingerprint(model_path)
+    key = (model_sha256, backend)
+    if key in _MODEL_CACHE:
+        return _MODEL_CACHE[key]
+
+    loaded = None
+    if backend == "flat":
+        store_dir = store_dir_for(model_path)
+        stored = read_flat_store(store_dir, model_sha256)
+        if stored is None:
+            # First load of this model file: export, then map the export
+            export_flat_store(joblib.load(model_path), model_sha256, store_dir)
+            stored = read_flat_store(store_dir, model_sha256)
+        flat, meta = stored
+        loaded = {"model": flat, "feature_cols": meta["feature_cols"], "encoder": meta["encoder"]}
+    else:
+        model_bundle = joblib.load(model_path)
+        loaded = {
+            "model": scoring_model(model_bundle["model"], backend),
+            "feature_cols": model_bundle["feature_cols"],
+            "encoder": get_encoder(model_bundle),
+        }
+
+    loaded["sha256"] = model_sha256
+    _MODEL_CACHE[key] = loaded
+    return loaded
+
+
+def clear_model_cache():
+    _MODEL_CACHE.clear()
+    _HASH_CACHE.clear()
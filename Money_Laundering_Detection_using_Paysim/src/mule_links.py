@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------
+# TRANSFER -> CASH_OUT (mule) linkage
+# ----------------------------------------------------
+# The PaySim laundering pattern is a TRANSFER into an account that soon makes
+# a CASH_OUT. The two legs share an account: the transfer's dst_account_id is
+# the cash-out's src_account_id. Each leg is linked to its nearest partner on
+# that account within MULE_WINDOW_STEPS hours, in (step, transaction_id) order:
+#   CASH_OUT  -> the latest earlier inbound TRANSFER
+#   TRANSFER  -> the first later outbound CASH_OUT
+# Both directions are one sorted merge (pd.merge_asof, grouped by account) over
+# just the TRANSFER and CASH_OUT rows. There are no correlated subqueries and
+# no per-row lookups.
+#
+# Output columns, one row per linked leg (unlinked rows are absent):
+#   mule_link_transaction_id   the other leg
+#   mule_link_step_gap         cash-out step - transfer step (>= 0)
+#   mule_link_amount_ratio     cash-out amount / transfer amount
+#   mule_is_linked             1
+
+MULE_WINDOW_STEPS = 24
+
+MULE_INPUT_COLS = ["transaction_id", "step", "transaction_type", "transaction_amount",
+                   "src_account_id", "dst_account_id"]
+MULE_FEATURE_COLS = ["mule_link_transaction_id", "mule_link_step_gap", "mule_link_amount_ratio", "mule_is_linked"]
+
+MULE_TABLE = "transaction_mule_links"
+MULE_SCHEMA = [
+    ("transaction_id", "INTEGER PRIMARY KEY"),
+    ("mule_link_transaction_id", "INTEGER"),
+    ("mule_link_step_gap", "INTEGER"),
+    ("mule_link_amount_ratio", "REAL"),
+    ("mule_is_linked", "INTEGER"),
+]
+
+# (step, transaction_id) packed into one int64 merge key
+_ID_BITS = 36
+
+
+def _legs(df: pd.DataFrame, transaction_type: str, account_col: str, account_codes) -> pd.DataFrame:
+    mask = (df["transaction_type"] == transaction_type).to_numpy()
+    step = df["step"].to_numpy(dtype=np.int64)[mask]
+    transaction_id = df["transaction_id"].to_numpy(dtype=np.int64)[mask]
+    legs = pd.DataFrame({
+        "seq": (step << _ID_BITS) | transaction_id,
+        "account": account_codes[account_col][mask],
+        "transaction_id": transaction_id,
+        "step": step,
+        "amount": df["transaction_amount"].to_numpy(dtype=np.float64)[mask],
+    })
+    return legs.sort_values("seq", kind="stable", ignore_index=True)
+
+
+def _link(left: pd.DataFrame, right: pd.DataFrame, direction: str, window_steps: int) -> pd.DataFrame:
+    merged = pd.merge_asof(left, right, on="seq", by="account", direction=direction, suffixes=("", "_link"))
+    merged = merged[merged["transaction_id_link"].notna()]
+    gap = (merged["step"] - merged["step_link"]).abs()
+    # The nearest partner is the only candidate: if it is out of the window,
+    # every other one is too
+    return merged[gap <= window_steps].assign(step_gap=gap)
+
+
+def link_transfers_to_cashouts(df: pd.DataFrame, window_steps: int = MULE_WINDOW_STEPS) -> pd.DataFrame:
+    """MULE_INPUT_COLS frame -> transaction_id + MULE_FEATURE_COLS for linked legs."""
+    accounts = pd.concat([df["src_account_id"], df["dst_account_id"]], ignore_index=True)
+    codes, _ = pd.factorize(accounts)
+    n = len(df)
+    account_codes = {"src_account_id": codes[:n], "dst_account_id": codes[n:]}
+
+    # The shared account is the transfer's destination and the cash-out's source
+    transfers = _legs(df, "TRANSFER", "dst_account_id", account_codes)
+    cashouts = _legs(df, "CASH_OUT", "src_account_id", account_codes)
+
+    # Cash-outs look back to a transfer, transfers look forward to a cash-out
+    back = _link(cashouts, transfers, "backward", window_steps)
+    forward = _link(transfers, cashouts, "forward", window_steps)
+
+    out = []
+    for merged, cashout_is_left in ((back, True), (forward, False)):
+        cashout_amount = merged["amount"] if cashout_is_left else merged["amount_link"]
+        transfer_amount = merged["amount_link"] if cashout_is_left else merged["amount"]
+        out.append(pd.DataFrame({
+            "transaction_id": merged["transaction_id"].to_numpy(dtype=np.int64),
+            "mule_link_transaction_id": merged["transaction_id_link"].to_numpy(dtype=np.int64),
+            "mule_link_step_gap": merged["step_gap"].to_numpy(dtype=np.int64),
+            "mule_link_amount_ratio": (cashout_amount / transfer_amount.where(transfer_amount != 0)).to_numpy(),
+            "mule_is_linked": np.ones(len(merged), dtype=np.int8),
+        }))
+    return pd.concat(out, ignore_index=True).sort_values("transaction_id", ignore_index=True)
@@ -0,0 +1,261 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------------------------------
+# Single-scan, multi-grouping aggregation
+# ----------------------------------------------------
+# build_aggregates.py and the dbt marts each run three GROUP BYs over the same
+# source, so the source is scanned three times. MultiGroupAggregator fills any
+# number of groupings from a single streaming pass. Each chunk's keys are
+# factorized to integer codes, and per-group partials come from np.bincount /
+# np.maximum.at on those codes. The partials are then folded into
+# per-grouping accumulators addressed by a global key code. Only the
+# accumulators (one slot per distinct key) outlive a chunk.
+#
+# Groupings are plain dicts:
+#   key       source column, or a DERIVED_KEYS name (e.g. event_date)
+#   measures  (output column, aggregate, source column) triples, where the
+#             aggregate is count / sum / max / mean. NULLs are skipped as in SQL:
+#             count is COUNT(*); sum, max and mean over no values give NaN/None.
+# mean is accumulated as sum + count, so partials merge exactly.
+
+AGGREGATES = ("count", "sum", "max", "mean")
+
+# Keys computed from a source column: pandas transform + the same key in SQL
+DERIVED_KEYS = {
+    # event_time is ISO text ("YYYY-MM-DD HH:MM:SS"): the date is its prefix
+    "event_date": {"source": "event_time", "sql": "DATE(event_time)", "derive": lambda s: s.str.slice(0, 10)},
+}
+
+# The three build_aggregates.py tables (source: suspicious_transactions)
+SUSPICIOUS_GROUPINGS = {
+    "suspicious_customers": {
+        "key": "src_account_id",
+        "measures": [
+            ("suspicious_txn_count", "count", None),
+            ("suspicious_total_amount", "sum", "transaction_amount"),
+            ("max_fraud_score", "max", "fraud_score"),
+            ("last_suspicious_time", "max", "event_time"),
+        ],
+    },
+    "suspicious_by_day": {
+        "key": "event_date",
+        "measures": [
+            ("suspicious_txn_count", "count", None),
+            ("suspicious_total_amount", "sum", "transaction_amount"),
+            ("fraud_score_sum", "sum", "fraud_score"),
+            ("avg_fraud_score", "mean", "fraud_score"),
+        ],
+    },
+    "suspicious_by_type": {
+        "key": "transaction_type",
+        "measures": [
+            ("suspicious_txn_count", "count", None),
+            ("suspicious_total_amount", "sum", "transaction_amount"),
+            ("fraud_score_sum", "sum", "fraud_score"),
+            ("avg_fraud_score", "mean", "fraud_score"),
+        ],
+    },
+}
+
+# The three dbt marts (source: transaction_features, which has no fraud_score,
+# so mart_suspicious_customers' max_fraud_score is left out)
+MART_GROUPINGS = {
+    "mart_suspicious_customers": {
+        "key": "src_account_id",
+        "measures": [
+            ("suspicious_txn_count", "count", None),
+            ("suspicious_total_amount", "sum", "transaction_amount"),
+            ("last_suspicious_time", "max", "event_time"),
+        ],
+    },
+    "mart_suspicious_by_day": {
+        "key": "event_date",
+        "measures": [
+            ("suspicious_txn_count", "count", None),
+            ("suspicious_total_amount", "sum", "transaction_amount"),
+        ],
+    },
+    "mart_suspicious_by_type": {
+        "key": "transaction_type",
+        "measures": [
+            ("suspicious_txn_count", "count", None),
+            ("suspicious_total_amount", "sum", "transaction_amount"),
+        ],
+    },
+}
+
+# Source table, row filter (any of these flags = 1) and groupings
+AGG_PROFILES = {
+    "suspicious": {"table": "suspicious_transactions", "any_of": [], "groupings": SUSPICIOUS_GROUPINGS},
+    "marts": {"table": "transaction_features", "any_of": ["is_fraud", "is_high_value", "is_night_txn"],
+              "groupings": MART_GROUPINGS},
+}
+
+
+def key_source(key: str) -> str:
+    return DERIVED_KEYS[key]["source"] if key in DERIVED_KEYS else key
+
+
+def required_columns(profile):
+    """Columns a single pass over profile["table"] needs (transaction_id first, for keyset paging)."""
+    cols = ["transaction_id"] + list(profile["any_of"])
+    for grouping in profile["groupings"].values():
+        cols.append(key_source(grouping["key"]))
+        cols += [source for _, _, source in grouping["measures"] if source]
+    return list(dict.fromkeys(cols))
+
+
+def where_sql(profile):
+    """profile's row filter as a SQL predicate (None if it has none)."""
+    return " OR ".join(f"{c} = 1" for c in profile["any_of"]) or None
+
+
+def grouping_sql(profile, name: str) -> str:
+    """The equivalent standalone GROUP BY statement (one scan per grouping)."""
+    grouping = profile["groupings"][name]
+    key = grouping["key"]
+    key_sql = DERIVED_KEYS[key]["sql"] if key in DERIVED_KEYS else key
+    select = [f"{key_sql} AS {key}"]
+    for out_col, agg, source in grouping["measures"]:
+        expr = "COUNT(*)" if agg == "count" else f"{'AVG' if agg == 'mean' else agg.upper()}({source})"
+        select.append(f"{expr} AS {out_col}")
+    where = where_sql(profile)
+    return (f"SELECT {', '.join(select)} FROM {profile['table']}"
+            f"{f' WHERE {where}' if where else ''} GROUP BY {key_sql}")
+
+
+def _grow(array, size: int, fill):
+    if len(array) >= size:
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _Grouping:
+    def __init__(self, spec):
+        self.key = spec["key"]
+        self.measures = spec["measures"]
+        self.slots = {}        # key value -> global code
+        self.keys = []         # global code -> key value
+        self.count = np.zeros(0, dtype=np.int64)
+        # Per measure: accumulator and number of non-NULL values folded in
+        self.acc = {}
+        self.valid = {}
+        for out_col, agg, _ in self.measures:
+            if agg == "count":
+                continue
+            self.acc[out_col] = np.zeros(0, dtype=object if agg == "max" else np.float64)
+            self.valid[out_col] = np.zeros(0, dtype=np.int64)
+
+    def _global_codes(self, uniques):
+        # Only this chunk's distinct keys go through the dict
+        codes = np.fromiter(map(self.slots.get, uniques, itertools.repeat(-1)), dtype=np.int64, count=len(uniques))
+        for i in np.flatnonzero(codes < 0):
+            value = uniques[i]
+            codes[i] = self.slots[value] = len(self.keys)
+            self.keys.append(value)
+        return codes
+
+    def update(self, key_values, df: pd.DataFrame):
+        local, uniques = pd.factorize(key_values)
+        uniques = list(uniques)
+        # NULL keys (-1) become one extra group, as in SQL
+        if (local < 0).any():
+            local = np.where(local < 0, len(uniques), local)
+            uniques.append(None)
+        n_local = len(uniques)
+        target = self._global_codes(uniques)
+        n_global = len(self.keys)
+
+        self.count = _grow(self.count, n_global, 0)
+        self.count[target] += np.bincount(local, minlength=n_local)
+
+        for out_col, agg, source in self.measures:
+            if agg == "count":
+                continue
+            values = df[source]
+            valid = values.notna().to_numpy()
+            codes = local[valid]
+            self.valid[out_col] = _grow(self.valid[out_col], n_global, 0)
+            self.valid[out_col][target] += np.bincount(codes, minlength=n_local)
+
+            if agg in ("sum", "mean"):
+                self.acc[out_col] = _grow(self.acc[out_col], n_global, 0.0)
+                weights = values.to_numpy(dtype=np.float64)[valid]
+                self.acc[out_col][target] += np.bincount(codes, weights=weights, minlength=n_local)
+            else:
+                self.acc[out_col] = _grow(self.acc[out_col], n_global, None)
+                self._fold_max(out_col, codes, values[valid], n_local, target)
+
+    def _fold_max(self, out_col, codes, values, n_local: int, target):
+        # Rank the chunk's values (sort=True keeps order), take the max rank per
+        # group, then keep whichever of partial and running max is larger.
+        # Works for numbers and for ISO timestamp strings alike.
+        ranks, ordered = pd.factorize(values, sort=True)
+        best = np.full(n_local, -1, dtype=np.int64)
+        np.maximum.at(best, codes, ranks)
+        has = best >= 0
+        partial = np.asarray(ordered, dtype=object)[best[has]]
+        slots = target[has]
+        current = self.acc[out_col][slots]
+        replace = pd.isna(current)
+        seen = ~replace
+        replace[seen] = partial[seen] > current[seen]
+        self.acc[out_col][slots[replace]] = partial[replace]
+
+    def result(self) -> pd.DataFrame:
+        n = len(self.keys)
+        out = {self.key: self.keys}
+        for out_col, agg, _ in self.measures:
+            if agg == "count":
+                out[out_col] = self.count[:n]
+                continue
+            acc = self.acc[out_col][:n]
+            valid = self.valid[out_col][:n]
+            if agg == "sum":
+                out[out_col] = np.where(valid > 0, acc, np.nan)
+            elif agg == "mean":
+                out[out_col] = np.divide(acc, valid, out=np.full(n, np.nan), where=valid > 0)
+            else:
+                # object accumulator: back to float64 for numeric maxes
+                out[out_col] = pd.Series(acc, dtype=object).infer_objects().to_numpy()
+        return pd.DataFrame(out)
+
+
+class MultiGroupAggregator:
+    """Fill every grouping of a profile from one pass of update(df_chunk) calls."""
+
+    def __init__(self, profile):
+        self.any_of = list(profile["any_of"])
+        self.groupings = {name: _Grouping(spec) for name, spec in profile["groupings"].items()}
+        self.rows_scanned = 0
+        self.rows_aggregated = 0
+
+    def update(self, df: pd.DataFrame):
+        # The row filter is re-applied here, so chunks may come pre-filtered
+        # (where_sql pushed into the read) or not
+        self.rows_scanned += len(df)
+        if self.any_of:
+            keep = np.zeros(len(df), dtype=bool)
+            for col in self.any_of:
+                keep |= df[col].to_numpy() == 1
+            df = df[keep]
+        if df.empty:
+            return
+        self.rows_aggregated += len(df)
+
+        # Derived keys are computed once per chunk even if several groupings use them
+        derived = {}
+        for grouping in self.groupings.values():
+            key = grouping.key
+            if key in DERIVED_KEYS and key not in derived:
+                derived[key] = DERIVED_KEYS[key]["derive"](df[DERIVED_KEYS[key]["source"]])
+            grouping.update(derived[key] if key in derived else df[key], df)
+
+    def results(self):
+        """{grouping name: DataFrame(key + measure columns)}"""
+        return {name: grouping.result() for name, grouping in self.groupings.items()}
@@ -0,0 +1,86 @@
+import numpy as np
+
+from feature_rules import HIGH_VALUE_AMOUNT, NIGHT_HOUR_END, NIGHT_HOUR_START
+from transform_sql import BASE_DOW
+
+# ----------------------------------------------------
+# In-memory feature derivation for online scoring
+# ----------------------------------------------------
+# The batch path derives features in SQL: transform_sql (raw -> clean) and
+# build_transaction_features.py (clean -> features). The scoring service gets
+# raw PaySim-shaped transactions instead, so the same rules are applied here
+# to a dict of column arrays. The rule thresholds live in feature_rules,
+# which the feature SQL is built from too.
+
+# PaySim CSV names -> raw_transactions names; either spelling is accepted
+PAYSIM_FIELDS = {
+    "step": "step",
+    "type": "type",
+    "amount": "amount",
+    "nameOrig": "name_orig",
+    "oldbalanceOrg": "old_balance_orig",
+    "newbalanceOrig": "new_balance_orig",
+    "nameDest": "name_dest",
+    "oldbalanceDest": "old_balance_dest",
+    "newbalanceDest": "new_balance_dest",
+}
+
+
+def _field(records, name):
+    # Value of a field in every record, under either of its names
+    aliases = [k for k, v in PAYSIM_FIELDS.items() if v == name and k != name]
+    values = []
+    for record in records:
+        value = record.get(name)
+        if value is None:
+            for alias in aliases:
+                value = record.get(alias)
+                if value is not None:
+                    break
+        if value is None:
+            raise ValueError(f"missing field '{name}'")
+        values.append(value)
+    return values
+
+
+def _numeric(records, name) -> np.ndarray:
+    values = _field(records, name)
+    try:
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"field '{name}' must be numeric") from None
+
+
+def derive_features(records):
+    """Raw PaySim transactions (list of dicts) -> dict of transaction_features
+    columns (NumPy arrays), ready for feature_encoder.encode.
+
+    Plain lists/arrays rather than a DataFrame: for the one-to-few rows of a
+    service request, pandas construction costs more than the model. Raises
+    ValueError for missing or non-numeric fields.
+    """
+    step = _numeric(records, "step").astype(np.int64)
+    amount = _numeric(records, "amount")
+    hour_of_day = step % 24
+
+    # clean_transactions (transform_sql, "arith" engine)
+    features = {
+        "step": step,
+        "transaction_type": np.array([str(t).upper() for t in _field(records, "type")], dtype=object),
+        "transaction_amount": amount,
+        "hour_of_day": hour_of_day,
+        "day_of_week": (step // 24 + BASE_DOW) % 7,
+        "src_balance_change": _numeric(records, "new_balance_orig") - _numeric(records, "old_balance_orig"),
+        "dst_balance_change": _numeric(records, "new_balance_dest") - _numeric(records, "old_balance_dest"),
+    }
+    # transaction_features (build_transaction_features.py)
+    features["is_high_value"] = (amount > HIGH_VALUE_AMOUNT).astype(np.int8)
+    features["is_night_txn"] = ((hour_of_day < NIGHT_HOUR_START) | (hour_of_day > NIGHT_HOUR_END)).astype(np.int8)
+
+    # Identifiers are passed through when every record has them
+    for col in ("transaction_id", "name_orig", "name_dest"):
+        try:
+            features[col] = _field(records, col)
+        except ValueError:
+            pass
+    return features
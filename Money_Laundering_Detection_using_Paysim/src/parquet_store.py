@@ -0,0 +1,305 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from scoring_engine import KEY_COL, columns_sha256, get_key_bounds, iter_keyset_chunks, source_columns
+
+# ----------------------------------------------------
+# Columnar Parquet storage for the pandas stages
+# ----------------------------------------------------
+# STORAGE_BACKEND=parquet in .env makes train_model.py, score_transactions.py
+# and export_for_bi.py read their big inputs from Parquet datasets instead of
+# SQLite. The datasets are written by export_parquet.py:
+#   <PARQUET_DIR>/<table>/part-00000.parquet ...  (PARQUET_DIR: data/parquet)
+# Rows are sorted by transaction_id, so each row group covers an id (and
+# roughly a step) range, with snappy compression as in spark_clean_paysim.py.
+#
+# Reads go through pyarrow.dataset:
+#   columns   only the projected columns are decoded
+#   filters   pyarrow DNF tuples, e.g. [("is_fraud", "=", 1), ("step", "<=", 24)].
+#             They are pushed into the scan: row groups whose min/max statistics
+#             can't match are skipped, and rows are filtered before pandas.
+#   batches   iter_parquet_chunks streams record batches row group by row
+#             group, so only one chunk is in pandas at a time
+# SQLite stays the store for everything small or transactional: watermarks,
+# suspicious_transactions and the aggregate tables.
+#
+# A dataset is a snapshot. export_parquet.py stores the source table's row
+# count, max transaction_id and column list in the file metadata, and
+# check_snapshot() compares them with SQLite before a stage reads the
+# dataset, so a features rebuild after the export isn't silently missed.
+
+STORAGE_BACKENDS = ("sqlite", "parquet")
+PARQUET_COMPRESSION = "snappy"
+PARQUET_ROW_GROUP_ROWS = 128_000
+
+# SQLite declared type -> Arrow type (SQLite type affinity rules)
+_AFFINITY_TYPES = (("INT", pa.int64()), ("CHAR", pa.string()), ("CLOB", pa.string()), ("TEXT", pa.string()),
+                   ("REAL", pa.float64()), ("FLOA", pa.float64()), ("DOUB", pa.float64()))
+# typeof() of a stored value -> Arrow type, for CTAS columns without a declared type
+_STORAGE_CLASS_TYPES = {"integer": pa.int64(), "real": pa.float64(), "text": pa.string()}
+
+
+def storage_backend() -> str:
+    backend = os.getenv("STORAGE_BACKEND", "sqlite")
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of {STORAGE_BACKENDS}, got {backend!r}")
+    return backend
+
+
+def parquet_root(base_dir: str) -> str:
+    return os.path.join(base_dir, os.getenv("PARQUET_DIR", os.path.join("data", "parquet")))
+
+
+def dataset_dir(base_dir: str, table: str) -> str:
+    return os.path.join(parquet_root(base_dir), table)
+
+
+def has_dataset(path: str) -> bool:
+    # Partitioned datasets (spark_clean_paysim.py) keep their files in subdirectories
+    return os.path.isdir(path) and any(
+        name.endswith(".parquet") for _, _, files in os.walk(path) for name in files
+    )
+
+
+def _open(path: str) -> ds.Dataset:
+    if not has_dataset(path):
+        raise FileNotFoundError(f"No Parquet dataset at {path} (run export_parquet.py first)")
+    # hive: event_day=3/transaction_type=TRANSFER/ directories become columns
+    return ds.dataset(path, format="parquet", partitioning="hive")
+
+
+def _expression(filters):
+    return pq.filters_to_expression(filters) if filters else None
+
+
+def id_range_filters(start_after=None, end_at=None):
+    """Filters for start_after < transaction_id <= end_at (either side optional)."""
+    filters = []
+    if start_after is not None:
+        filters.append((KEY_COL, ">", start_after))
+    if end_at is not None:
+        filters.append((KEY_COL, "<=", end_at))
+    return filters
+
+
+def _to_pandas(table: pa.Table, dtype=None) -> pd.DataFrame:
+    df = table.to_pandas()
+    if dtype:
+        df = df.astype({c: t for c, t in dtype.items() if c in df.columns})
+    return df
+
+
+# ----------------------------------------------------
+# SQLite -> Parquet export
+# ----------------------------------------------------
+def arrow_schema(conn, table: str) -> pa.Schema:
+    """Arrow schema from the SQLite declared column types.
+
+    CREATE TABLE AS leaves expression columns (CASE ..., a - b) undeclared;
+    those take the storage class of their first non-NULL value.
+    """
+    fields = []
+    for _, name, declared, *_ in conn.exec_driver_sql(f"PRAGMA table_info({table});").fetchall():
+        declared = (declared or "").upper()
+        arrow_type = next((t for marker, t in _AFFINITY_TYPES if marker in declared), None)
+        if arrow_type is None:
+            storage_class = conn.exec_driver_sql(
+                f"SELECT typeof({name}) FROM {table} WHERE {name} IS NOT NULL LIMIT 1;"
+            ).scalar()
+            arrow_type = _STORAGE_CLASS_TYPES.get(storage_class, pa.float64())
+        fields.append(pa.field(name, arrow_type))
+    if not fields:
+        raise ValueError(f"table {table!r} does not exist")
+    return pa.schema(fields)
+
+
+def source_snapshot(conn, table: str) -> dict:
+    """What a Parquet copy of table must match: row count, max id, columns."""
+    _, max_id = get_key_bounds(conn, table)
+    return {
+        "source_rows": conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table};").scalar(),
+        "source_max_id": max_id,
+        "source_columns_sha256": columns_sha256(source_columns(conn, table)),
+    }
+
+
+def snapshot_info(path: str):
+    """The source_snapshot() stored by export_sqlite_table, or None."""
+    metadata = _open(path).schema.metadata or {}
+    if b"source_snapshot" not in metadata:
+        return None
+    return json.loads(metadata[b"source_snapshot"])
+
+
+def check_snapshot(conn, table: str, path: str):
+    """Raise ValueError unless the dataset at path matches SQLite table now."""
+    stored = snapshot_info(path)
+    if stored is None:
+        raise ValueError(f"{path} has no source snapshot metadata; re-run export_parquet.py")
+    current = source_snapshot(conn, table)
+    changed = [f"{k} {stored.get(k)} -> {v}" for k, v in current.items() if stored.get(k) != v]
+    if changed:
+        raise ValueError(f"Parquet copy of {table} is stale ({', '.join(changed)}); re-run export_parquet.py")
+
+
+def export_sqlite_table(conn, table: str, out_dir: str, chunk_rows: int = 500_000,
+                        row_group_rows: int = PARQUET_ROW_GROUP_ROWS) -> int:
+    """Stream table (keyset order) into out_dir/part-00000.parquet; returns rows.
+
+    Written to a temporary directory that replaces out_dir at the end, so
+    readers never see a half-written dataset.
+    """
+    if KEY_COL not in source_columns(conn, table):
+        raise ValueError(f"table '{table}' has no {KEY_COL} column; only keyed tables can be exported")
+    snapshot = source_snapshot(conn, table)
+    schema = arrow_schema(conn, table).with_metadata({"source_snapshot": json.dumps(snapshot)})
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    n_rows = 0
+    writer = pq.ParquetWriter(os.path.join(tmp_dir, "part-00000.parquet"), schema,
+                              compression=PARQUET_COMPRESSION)
+    try:
+        for df_chunk, _ in iter_keyset_chunks(conn, chunk_rows, table=table):
+            writer.write_table(pa.Table.from_pandas(df_chunk, schema=schema, preserve_index=False),
+                               row_group_size=row_group_rows)
+            n_rows += len(df_chunk)
+    except BaseException:
+        writer.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    writer.close()
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return n_rows
+
+
+# ----------------------------------------------------
+# Reads
+# ----------------------------------------------------
+def read_table(path: str, columns=None, filters=None, dtype=None) -> pd.DataFrame:
+    table = _open(path).to_table(columns=columns, filter=_expression(filters))
+    return _to_pandas(table, dtype)
+
+
+def iter_parquet_chunks(path: str, chunk_rows: int, columns=None, filters=None, dtype=None):
+    """Yield (df_chunk, read_seconds) of about chunk_rows rows, in file order.
+
+    Same contract as scoring_engine.iter_keyset_chunks. Batches are decoded
+    row group by row group and regrouped into chunk_rows-sized frames.
+    """
+    scanner = _open(path).scanner(columns=columns, filter=_expression(filters),
+                                  batch_size=min(chunk_rows, PARQUET_ROW_GROUP_ROWS))
+    batches, n_pending = [], 0
+    t0 = time.perf_counter()
+    for batch in scanner.to_batches():
+        if batch.num_rows == 0:
+            continue
+        batches.append(batch)
+        n_pending += batch.num_rows
+        if n_pending >= chunk_rows:
+            df_chunk = _to_pandas(pa.Table.from_batches(batches), dtype)
+            yield df_chunk, time.perf_counter() - t0
+            batches, n_pending = [], 0
+            t0 = time.perf_counter()
+    if batches:
+        yield _to_pandas(pa.Table.from_batches(batches), dtype), time.perf_counter() - t0
+
+
+def dataset_columns(path: str):
+    return _open(path).schema.names
+
+
+def key_bounds(path: str, filters=None):
+    """(min, max) transaction_id, or (None, None) for no rows."""
+    ids = _open(path).to_table(columns=[KEY_COL], filter=_expression(filters)).column(KEY_COL)
+    if len(ids) == 0:
+        return None, None
+    bounds = pc.min_max(ids)
+    return bounds["min"].as_py(), bounds["max"].as_py()
+
+
+def fetch_rows(path: str, ids, columns=None, dtype=None) -> pd.DataFrame:
+    """Rows whose transaction_id is in ids, in transaction_id order."""
+    ids = [int(i) for i in ids]
+    df = read_table(path, columns=columns, filters=[(KEY_COL, "in", ids)], dtype=dtype)
+    return df.sort_values(KEY_COL, ignore_index=True)
+
+
+def fetch_full_rows(path: str, df_scores: pd.DataFrame) -> pd.DataFrame:
+    """Parquet counterpart of scoring_engine.fetch_full_rows."""
+    df_full = fetch_rows(path, df_scores[KEY_COL].tolist())
+    scores = df_scores.set_index(KEY_COL)["fraud_score"]
+    df_full["fraud_score"] = df_full[KEY_COL].map(scores).astype("float64")
+    return df_full
+
+
+def sample_table(path: str, n: int, columns, filters=None, seed: int = 42, dtype=None) -> pd.DataFrame:
+    """Up to n uniformly random rows matching filters (parquet sample_rows).
+
+    Pass 1 reads only transaction_id for the matching rows; pass 2 fetches the
+    drawn ids with an "in" filter.
+    """
+    ids = _open(path).to_table(columns=[KEY_COL], filter=_expression(filters)).column(KEY_COL).to_numpy()
+    if n <= 0 or len(ids) == 0:
+        return pd.DataFrame(columns=list(columns))
+    rng = np.random.default_rng(seed)
+    drawn = rng.choice(ids, size=min(n, len(ids)), replace=False)
+    df = fetch_rows(path, drawn, columns=columns, dtype=dtype)
+    # Draw order, as sample_rows returns it
+    order = pd.Series(np.arange(len(drawn)), index=drawn)
+    return df.iloc[np.argsort(order[df[KEY_COL]].to_numpy(), kind="stable")].reset_index(drop=True)
+
+
+def scan_stats(path: str, columns=None, filters=None) -> dict:
+    """Bytes a read of (columns, filters) has to fetch, without reading it.
+
+    Partition directories are pruned on the path, row groups on their min/max
+    statistics; what is left is summed as compressed column chunk sizes of
+    the projected columns (footers aside, what a reader fetches from disk).
+    """
+    dataset = _open(path)
+    expression = _expression(filters)
+    wanted = set(columns or dataset.schema.names)
+
+    def row_group_bytes(metadata, row_group: int, projected: bool) -> int:
+        rg = metadata.row_group(row_group)
+        return sum(
+            rg.column(i).total_compressed_size
+            for i in range(rg.num_columns)
+            if not projected or rg.column(i).path_in_schema in wanted
+        )
+
+    stats = {"files": 0, "files_read": 0, "row_groups": 0, "row_groups_read": 0,
+             "bytes_total": 0, "bytes_scanned": 0}
+    for fragment in dataset.get_fragments():
+        metadata = fragment.metadata
+        stats["files"] += 1
+        stats["row_groups"] += metadata.num_row_groups
+        stats["bytes_total"] += sum(row_group_bytes(metadata, i, False) for i in range(metadata.num_row_groups))
+    for fragment in dataset.get_fragments(filter=expression):
+        kept = [rg.id for piece in fragment.split_by_row_group(filter=expression, schema=dataset.schema) for rg in piece.row_groups]
+        stats["files_read"] += bool(kept)
+        stats["row_groups_read"] += len(kept)
+        stats["bytes_scanned"] += sum(row_group_bytes(fragment.metadata, i, True) for i in kept)
+    return stats
+
+
+# ----------------------------------------------------
+# Writes
+# ----------------------------------------------------
+def write_frame(df: pd.DataFrame, file_path: str, row_group_rows: int = PARQUET_ROW_GROUP_ROWS):
+    """Write one DataFrame as a single Parquet file (e.g. BI exports)."""
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), file_path,
+                   compression=PARQUET_COMPRESSION, row_group_size=row_group_rows)
@@ -0,0 +1,81 @@
+import math
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+# ----------------------------------------------------
+# Sort-free random sampling of transaction_features rows
+# ----------------------------------------------------
+# "ORDER BY RANDOM() LIMIT n" makes SQLite generate a key for and sort every
+# candidate row to keep a handful. Instead, draw random transaction_ids in
+# Python (uniform, without replacement, over the id range) and fetch only
+# those rows through the transaction_id index. Ids that are gaps or fail the
+# filter (e.g. fraud rows) are simply topped up in the next round.
+#
+# Results are reproducible for a given seed and table contents: rows are kept
+# in draw order and the first n are returned.
+
+
+def sample_rows(conn, n: int, columns, where: str = "1 = 1", seed: int = 42,
+                table: str = "transaction_features", dtype=None,
+                batch_size: int = 900, max_rounds: int = 50) -> pd.DataFrame:
+    """Return up to n random rows of table matching where (fewer only if the
+    table runs out of matching rows within max_rounds)."""
+    if n <= 0:
+        return pd.DataFrame(columns=list(columns))
+
+    # One subquery per bound: each is a single index seek
+    min_id, max_id = conn.execute(text(
+        f"SELECT (SELECT MIN(transaction_id) FROM {table}), (SELECT MAX(transaction_id) FROM {table});"
+    )).fetchone()
+    if min_id is None:
+        return pd.DataFrame(columns=list(columns))
+
+    id_span = max_id - min_id + 1
+    # Fraction of drawn ids that exist and pass the filter; starts optimistic
+    # and is re-estimated from each round
+    hit_rate = 1.0
+
+    rng = np.random.default_rng(seed)
+    drawn = set()
+    parts = []
+    n_found = 0
+    select_cols = ", ".join(columns)
+
+    for _ in range(max_rounds):
+        need = n - n_found
+        if need <= 0 or len(drawn) >= id_span:
+            break
+
+        # Oversample a little so one round usually suffices
+        k = int(math.ceil(need / hit_rate * 1.1)) + 16
+        draws = rng.integers(min_id, max_id + 1, size=k).tolist()
+        candidates = [c for c in dict.fromkeys(draws) if c not in drawn]
+        drawn.update(candidates)
+        found_before = n_found
+
+        for i in range(0, len(candidates), batch_size):
+            batch = candidates[i:i + batch_size]
+            params = {f"id{j}": v for j, v in enumerate(batch)}
+            placeholders = ", ".join(f":id{j}" for j in range(len(batch)))
+            query = text(f"""
+            SELECT {select_cols}
+            FROM {table}
+            WHERE transaction_id IN ({placeholders}) AND ({where});
+            """)
+            df = pd.read_sql(query, conn, params=params, dtype=dtype)
+            if df.empty:
+                continue
+            # Keep draw order (not index order) so the cut below is random
+            order = {v: j for j, v in enumerate(batch)}
+            df = df.iloc[np.argsort([order[v] for v in df["transaction_id"]], kind="stable")]
+            parts.append(df)
+            n_found += len(df)
+
+        if candidates:
+            hit_rate = max((n_found - found_before) / len(candidates), 1e-3)
+
+    if not parts:
+        return pd.DataFrame(columns=list(columns))
+    return pd.concat(parts, ignore_index=True).head(n).reset_index(drop=True)
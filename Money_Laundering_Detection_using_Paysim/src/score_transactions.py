@@ -1,10 +1,64 @@
+import argparse
+import contextlib
 import os
 import sys
+import time
 
 from dotenv import load_dotenv
 import pandas as pd
 from sqlalchemy import create_engine, text
-import joblib
+
+from db_indexes import apply_indexes
+from feature_encoder import projected_columns, projected_dtypes
+from flat_forest import SCORE_BACKENDS
+from model_store import load_model
+import parquet_store
+from scoring_engine import (
+    KEY_COL,
+    PIPELINE_STAGES,
+    columns_sha256,
+    fetch_full_rows,
+    get_key_bounds,
+    iter_scoring_chunks,
+    parallel_scoring_supported,
+    read_watermark,
+    rows_per_sec,
+    score_chunk,
+    score_pipelined,
+    score_ranges_parallel,
+    source_columns,
+    split_key_ranges,
+    write_watermark,
+)
+
+# ----------------------------------------------------
+# 0. Command-line options
+# ----------------------------------------------------
+parser = argparse.ArgumentParser(description="Score transaction_features with the trained AML model.")
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=None,
+    help="Number of scoring processes (default: SCORE_WORKERS from .env, else 1).",
+)
+parser.add_argument(
+    "--pipeline",
+    action="store_true",
+    help="Overlap read/featurize/predict/write in threads (default: SCORE_PIPELINE from .env).",
+)
+parser.add_argument(
+    "--incremental",
+    action="store_true",
+    help="Score only rows past the stored watermark (default: SCORE_INCREMENTAL from .env).",
+)
+parser.add_argument(
+    "--backend",
+    choices=SCORE_BACKENDS,
+    default=None,
+    help="Inference backend: sklearn predict_proba or the flattened forest "
+         "(default: SCORE_BACKEND from .env, else sklearn).",
+)
+args = parser.parse_args()
 
 # ----------------------------------------------------
 # 1. Load environment variables
@@ -27,6 +81,17 @@ db_full_path = os.path.join(BASE_DIR, DB_PATH)
 db_url = f"sqlite:///{db_full_path}"
 print(f"Using SQLite database at: {db_full_path}")
 
+# STORAGE_BACKEND=parquet scans transaction_features from its Parquet export;
+# suspicious_transactions and the watermark stay in SQLite either way
+try:
+    storage = parquet_store.storage_backend()
+except ValueError as e:
+    print(f"ERROR: {e}")
+    sys.exit(1)
+features_path = parquet_store.dataset_dir(BASE_DIR, "transaction_features")
+if storage == "parquet":
+    print(f"Reading transaction_features from Parquet: {features_path}")
+
 # ----------------------------------------------------
 # 2. Connect to SQLite
 # ----------------------------------------------------
@@ -44,122 +109,302 @@ except Exception as e:
 # 3. Load trained model & feature columns
 # ----------------------------------------------------
 models_dir = os.path.join(BASE_DIR, "models")
-model_path = os.path.join(models_dir, "rf_aml_model.pkl")
+# MODEL_FILE selects the bundle, e.g. sgd_aml_model.pkl from train_model_streaming.py
+model_path = os.path.join(models_dir, os.getenv("MODEL_FILE", "rf_aml_model.pkl"))
 
 if not os.path.exists(model_path):
     print(f"ERROR: Model file not found at {model_path}")
     sys.exit(1)
 
+backend = args.backend or os.getenv("SCORE_BACKEND", "sklearn")
+
 print(f"Loading model from: {model_path}")
-model_bundle = joblib.load(model_path)
-model = model_bundle["model"]
-feature_cols = model_bundle["feature_cols"]
+try:
+    # Cached per file hash; the flat backend memory-maps models/<name>.flat/
+    loaded = load_model(model_path, backend)
+except ValueError as e:
+    print(f"ERROR: {e}")
+    sys.exit(1)
 
-print("✅ Model loaded.")
+model = loaded["model"]
+feature_cols = loaded["feature_cols"]
+encoder = loaded["encoder"]
+model_sha256 = loaded["sha256"]
+
+print(f"✅ Model loaded (backend: {backend}).")
 print("Feature columns used by model:")
 print(feature_cols)
 
 # ----------------------------------------------------
-# 4. Prepare suspicious_transactions table (drop if exists)
+# 4. Prepare suspicious_transactions (incremental or full rescore)
 # ----------------------------------------------------
-print("Dropping existing 'suspicious_transactions' table if it exists...")
+# Incremental mode scores only transaction_ids past the stored watermark and
+# appends to suspicious_transactions. A full rescore (drop + score everything)
+# happens when not incremental, when there is no watermark yet, or when the
+# model file's hash, the threshold or the transaction_features column list
+# (copied whole into suspicious_transactions) changed since the watermark
+# was written.
+chunk_size = 100000  # number of rows per batch
+threshold = 0.8      # classify as suspicious if fraud_score >= threshold
+
+incremental = args.incremental or os.getenv("SCORE_INCREMENTAL", "0") == "1"
+
+print("Ensuring transaction_features indexes (keyset paging on transaction_id)...")
 
 try:
     with engine.begin() as conn:
-        conn.execute(text("DROP TABLE IF EXISTS suspicious_transactions;"))
-    print("✅ Old suspicious_transactions (if any) dropped.")
+        apply_indexes(conn, "transaction_features")
+    with engine.connect() as conn:
+        if storage == "parquet":
+            # The watermark is shared with SQLite runs: never score a stale copy
+            parquet_store.check_snapshot(conn, "transaction_features", features_path)
+            min_id, max_id = parquet_store.key_bounds(features_path)
+            source_sha = columns_sha256(parquet_store.dataset_columns(features_path))
+        else:
+            min_id, max_id = get_key_bounds(conn)
+            source_sha = columns_sha256(source_columns(conn))
+        watermark = read_watermark(conn)
+        has_output = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'suspicious_transactions';")
+        ).fetchone() is not None
 except Exception as e:
-    print("❌ Failed to drop suspicious_transactions table.")
+    print("❌ Failed to prepare transaction_features for scoring.")
     print(e)
     sys.exit(1)
 
-# ----------------------------------------------------
-# 5. Score transaction_features in chunks
-# ----------------------------------------------------
-chunk_size = 100000  # number of rows per batch
-threshold = 0.8      # classify as suspicious if fraud_score >= threshold
+full_rescore = True
+if incremental:
+    if watermark is None or not has_output:
+        print("No scoring watermark / output table yet: running a full rescore.")
+    elif watermark["model_sha256"] != model_sha256:
+        print("Model file changed since the last run (hash mismatch): running a full rescore.")
+    elif watermark["threshold"] != threshold:
+        print("Threshold changed since the last run: running a full rescore.")
+    elif watermark.get("source_columns_sha256") != source_sha:
+        print("transaction_features columns changed since the last run: running a full rescore.")
+    else:
+        full_rescore = False
+
+if full_rescore:
+    start_after = (min_id - 1) if min_id is not None else 0
+    print("Dropping existing 'suspicious_transactions' table if it exists...")
 
-print("Counting rows in transaction_features...")
-
-with engine.connect() as conn:
-    total_rows = conn.execute(text("SELECT COUNT(*) FROM transaction_features;")).scalar()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS suspicious_transactions;"))
+        print("✅ Old suspicious_transactions (if any) dropped.")
+    except Exception as e:
+        print("❌ Failed to drop suspicious_transactions table.")
+        print(e)
+        sys.exit(1)
+else:
+    start_after = watermark["max_transaction_id"]
+    print(
+        f"Incremental run: scoring transaction_id > {start_after} "
+        f"(last scored step {watermark['max_step']} at {watermark['scored_at']})."
+    )
+
+    # Chunks are appended as they are scored but the watermark only moves at
+    # the end, so a run that died part-way left rows past it. They are scored
+    # again below; drop them first or the append hits the unique index.
+    try:
+        with engine.begin() as conn:
+            n_leftover = conn.execute(
+                text("DELETE FROM suspicious_transactions WHERE transaction_id > :wm;"), {"wm": start_after}
+            ).rowcount
+        if n_leftover:
+            print(f"Removed {n_leftover} suspicious rows past the watermark left by an interrupted run.")
+    except Exception as e:
+        print("❌ Failed to clear suspicious rows past the watermark.")
+        print(e)
+        sys.exit(1)
 
-print(f"Total rows in transaction_features: {total_rows}")
+# ----------------------------------------------------
+# 5. Score transaction_features in chunks (keyset pagination)
+# ----------------------------------------------------
+# Pages are fetched with "WHERE transaction_id > last_id ORDER BY transaction_id"
+# instead of LIMIT/OFFSET, so each row is read once and the scan grows linearly.
+# The scan is bounded by the max id seen up front so the watermark is exact.
+print(f"transaction_id range in transaction_features: {min_id} .. {max_id}")
+
+workers = args.workers if args.workers is not None else int(os.getenv("SCORE_WORKERS", "1"))
+
+if workers > 1 and not parallel_scoring_supported():
+    print("WARNING: Parallel scoring needs the 'fork' start method; falling back to 1 worker.")
+    workers = 1
+
+pipeline = args.pipeline or os.getenv("SCORE_PIPELINE", "0") == "1"
+if storage == "parquet" and (workers > 1 or pipeline):
+    # Parallel workers and the pipelined reader page through SQLite
+    print("WARNING: STORAGE_BACKEND=parquet scores serially; ignoring --workers/--pipeline.")
+    workers, pipeline = 1, False
+if pipeline and workers > 1:
+    print("WARNING: --pipeline applies to single-process scoring; using parallel workers instead.")
+    pipeline = False
 
-offset = 0
 processed = 0
 suspicious_total = 0
+scan_start = time.perf_counter()
 
-while offset < total_rows:
-    print(f"\nProcessing chunk starting at offset {offset}...")
-
-    query = f"""
-    SELECT *
-    FROM transaction_features
-    LIMIT {chunk_size} OFFSET {offset};
-    """
 
+def append_suspicious(df_susp: pd.DataFrame):
+    # Single writer: only this process appends to suspicious_transactions.
+    # Scoring only carries (transaction_id, fraud_score); the full feature
+    # rows are fetched here for the few rows that passed the threshold.
     try:
         with engine.connect() as conn:
-            df_chunk = pd.read_sql(query, conn)
+            if storage == "parquet":
+                df_full = parquet_store.fetch_full_rows(features_path, df_susp)
+            else:
+                df_full = fetch_full_rows(conn, df_susp)
+        df_full.to_sql(
+            "suspicious_transactions",
+            engine,
+            if_exists="append",
+            index=False,
+        )
     except Exception as e:
-        print("❌ Failed to read chunk from transaction_features.")
+        print("❌ Failed to write suspicious rows to SQLite.")
         print(e)
         sys.exit(1)
 
-    if df_chunk.empty:
-        print("No more rows to process.")
-        break
 
-    # Make a copy for feature engineering
-    df_feat = df_chunk.copy()
+if workers > 1:
+    # ------------------------------------------------
+    # 5a. Parallel: workers score disjoint id ranges
+    # ------------------------------------------------
+    ranges = split_key_ranges(start_after + 1, max_id, chunk_size) if max_id is not None else []
+    print(f"Scoring {len(ranges)} transaction_id ranges with {workers} worker processes...")
 
-    # One-hot encode transaction_type (same logic as in training)
-    df_feat = pd.get_dummies(df_feat, columns=["transaction_type"], drop_first=True)
+    # Workers open their own connections; don't carry pooled ones across fork
+    engine.dispose()
 
-    # Ensure all feature_cols exist; if missing, add as 0
-    for col in feature_cols:
-        if col not in df_feat.columns:
-            df_feat[col] = 0
-
-    # Keep only the feature columns in the right order
-    X = df_feat[feature_cols]
-
-    # Predict probabilities
     try:
-        proba = model.predict_proba(X)[:, 1]
+        for result in score_ranges_parallel(db_url, model_path, ranges, chunk_size, threshold, workers, backend):
+            df_susp = result["suspicious"]
+            n_susp = 0 if df_susp is None else len(df_susp)
+            suspicious_total += n_susp
+            processed += result["rows"]
+
+            if n_susp > 0:
+                append_suspicious(df_susp)
+
+            worker_seconds = result["read_seconds"] + result["score_seconds"]
+            print(
+                f"Range {result['first_id']} .. {result['last_id']}: {result['rows']} rows, "
+                f"suspicious: {n_susp}, total processed: {processed} "
+                f"| worker {rows_per_sec(result['rows'], worker_seconds):,.0f} rows/s"
+            )
     except Exception as e:
-        print("❌ Failed during model.predict_proba.")
+        print("❌ Parallel scoring failed.")
         print(e)
         sys.exit(1)
+elif pipeline:
+    # ------------------------------------------------
+    # 5b. Pipelined: threaded stages with bounded queues
+    # ------------------------------------------------
+    print("Scoring with pipelined read/featurize/predict/write stages...")
+
+    def report_chunk(n_rows: int, n_susp: int):
+        global processed, suspicious_total
+        processed += n_rows
+        suspicious_total += n_susp
+        print(f"Chunk processed: {n_rows} rows, suspicious: {n_susp}, total processed: {processed}")
 
-    df_chunk["fraud_score"] = proba
-
-    # Filter suspicious rows
-    df_susp = df_chunk[df_chunk["fraud_score"] >= threshold]
-
-    n_susp = len(df_susp)
-    suspicious_total += n_susp
-    processed += len(df_chunk)
-
-    print(f"Chunk processed: {len(df_chunk)} rows, suspicious: {n_susp}, total processed: {processed}")
+    try:
+        stage_stats = score_pipelined(
+            engine, model, encoder, chunk_size, threshold, append_suspicious, on_chunk=report_chunk,
+            start_after=start_after, end_at=max_id,
+        )
+    except Exception as e:
+        print("❌ Pipelined scoring failed.")
+        print(e)
+        sys.exit(1)
 
-    # Append suspicious rows to suspicious_transactions table
-    if n_susp > 0:
-        try:
-            df_susp.to_sql(
-                "suspicious_transactions",
-                engine,
-                if_exists="append",
-                index=False,
+    print("\nPipeline stage timings (busy time, excluding queue waits):")
+    for name in PIPELINE_STAGES:
+        st = stage_stats[name]
+        print(
+            f"  {name:<10} {st['seconds']:8.2f}s over {st['chunks']} chunks "
+            f"({rows_per_sec(st['rows'], st['seconds']):,.0f} rows/s)"
+        )
+    bottleneck = max(PIPELINE_STAGES, key=lambda name: stage_stats[name]["seconds"])
+    print(f"  Bottleneck stage: {bottleneck}")
+else:
+    # ------------------------------------------------
+    # 5c. Serial: one keyset-paginated pass
+    # ------------------------------------------------
+    with (engine.connect() if storage == "sqlite" else contextlib.nullcontext()) as read_conn:
+        if storage == "parquet":
+            # Projected columns, id range pushed into the scan, row-group batches
+            scoring_cols = projected_columns(encoder)
+            chunks = parquet_store.iter_parquet_chunks(
+                features_path, chunk_size, columns=scoring_cols,
+                filters=parquet_store.id_range_filters(start_after, max_id),
+                dtype=projected_dtypes(scoring_cols),
+            )
+        else:
+            chunks = iter_scoring_chunks(read_conn, encoder, chunk_size, start_after, max_id)
+
+        while True:
+            chunk_start = time.perf_counter()
+            try:
+                df_chunk, read_seconds = next(chunks)
+            except StopIteration:
+                print("No more rows to process.")
+                break
+            except Exception as e:
+                print("❌ Failed to read chunk from transaction_features.")
+                print(e)
+                sys.exit(1)
+
+            first_id = int(df_chunk["transaction_id"].iloc[0])
+            last_id = int(df_chunk["transaction_id"].iloc[-1])
+            print(f"\nProcessing chunk transaction_id {first_id} .. {last_id}...")
+
+            # Encode features (fixed schema) + predict probabilities
+            try:
+                df_chunk["fraud_score"] = score_chunk(model, encoder, df_chunk)
+            except Exception as e:
+                print("❌ Failed during model.predict_proba.")
+                print(e)
+                sys.exit(1)
+
+            # Filter suspicious rows (ids + scores; full rows are joined on write)
+            df_susp = df_chunk.loc[df_chunk["fraud_score"] >= threshold, [KEY_COL, "fraud_score"]]
+
+            n_susp = len(df_susp)
+            suspicious_total += n_susp
+            processed += len(df_chunk)
+
+            # Append suspicious rows to suspicious_transactions table
+            if n_susp > 0:
+                append_suspicious(df_susp)
+
+            chunk_seconds = time.perf_counter() - chunk_start
+            print(
+                f"Chunk processed: {len(df_chunk)} rows, suspicious: {n_susp}, total processed: {processed} "
+                f"| read {rows_per_sec(len(df_chunk), read_seconds):,.0f} rows/s, "
+                f"chunk {rows_per_sec(len(df_chunk), chunk_seconds):,.0f} rows/s"
             )
-        except Exception as e:
-            print("❌ Failed to write suspicious rows to SQLite.")
-            print(e)
-            sys.exit(1)
 
-    offset += chunk_size
+scan_seconds = time.perf_counter() - scan_start
+
+# ----------------------------------------------------
+# 6. Index the output & advance the scoring watermark
+# ----------------------------------------------------
+if max_id is not None:
+    try:
+        with engine.begin() as conn:
+            apply_indexes(conn, "suspicious_transactions")
+            write_watermark(conn, model_sha256, threshold, max_id, source_sha)
+        print(f"\n✅ Scoring watermark set to transaction_id {max_id} (model sha256 {model_sha256[:12]}...).")
+    except Exception as e:
+        print("❌ Failed to update scoring watermark.")
+        print(e)
+        sys.exit(1)
 
 print("\n🎉 Scoring completed.")
 print(f"Total processed rows: {processed}")
 print(f"Total suspicious rows (fraud_score >= {threshold}): {suspicious_total}")
+print(f"Total scoring time: {scan_seconds:.1f}s ({rows_per_sec(processed, scan_seconds):,.0f} rows/s)")
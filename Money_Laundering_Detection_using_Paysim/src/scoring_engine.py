@@ -0,0 +1,350 @@
+import hashlib
+import multiprocessing as mp
+import queue
+import threading
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from feature_encoder import encode, projected_columns, projected_dtypes
+from model_store import load_model
+
+# ----------------------------------------------------
+# Keyset pagination over transaction_features
+# ----------------------------------------------------
+# LIMIT/OFFSET makes SQLite re-walk every skipped row on each page, so a full
+# pass costs O(n^2). Seeking on transaction_id (backed by the unique index from
+# db_indexes.INDEX_SPECS) makes each page an index range scan, so every row is
+# read exactly once.
+
+SOURCE_TABLE = "transaction_features"
+KEY_COL = "transaction_id"
+
+
+def get_key_bounds(conn, table: str = SOURCE_TABLE):
+    # Separate subqueries: SQLite only answers a lone MIN() or MAX() with one
+    # index seek; both in one SELECT walk the whole index
+    row = conn.execute(text(
+        f"SELECT (SELECT MIN({KEY_COL}) FROM {table}), (SELECT MAX({KEY_COL}) FROM {table});"
+    )).fetchone()
+    return row[0], row[1]
+
+
+def iter_keyset_chunks(conn, chunk_size: int, start_after: int = 0, end_at=None,
+                       columns="*", dtype=None, table: str = SOURCE_TABLE, where=None):
+    """Yield (df_chunk, read_seconds) pages ordered by transaction_id.
+
+    where: optional extra SQL predicate, applied inside SQLite.
+    """
+    if not isinstance(columns, str):
+        columns = ", ".join(columns)
+    last_id = start_after
+    upper = "" if end_at is None else f"AND {KEY_COL} <= :end_at"
+    if where:
+        upper += f" AND ({where})"
+
+    query = text(f"""
+    SELECT {columns}
+    FROM {table}
+    WHERE {KEY_COL} > :last_id {upper}
+    ORDER BY {KEY_COL}
+    LIMIT :chunk_size;
+    """)
+
+    while True:
+        params = {"last_id": last_id, "chunk_size": chunk_size}
+        if end_at is not None:
+            params["end_at"] = end_at
+
+        t0 = time.perf_counter()
+        df_chunk = pd.read_sql(query, conn, params=params, dtype=dtype)
+        read_seconds = time.perf_counter() - t0
+
+        if df_chunk.empty:
+            return
+
+        yield df_chunk, read_seconds
+
+        last_id = int(df_chunk[KEY_COL].iloc[-1])
+        if len(df_chunk) < chunk_size:
+            return
+
+
+def iter_scoring_chunks(conn, encoder, chunk_size: int, start_after: int = 0, end_at=None):
+    # Projected read: transaction_id + model inputs only, with compact dtypes
+    columns = projected_columns(encoder)
+    return iter_keyset_chunks(conn, chunk_size, start_after, end_at,
+                              columns=columns, dtype=projected_dtypes(columns))
+
+
+def fetch_full_rows(conn, df_scores: pd.DataFrame, table: str = SOURCE_TABLE,
+                    batch_size: int = 900) -> pd.DataFrame:
+    """Join (transaction_id, fraud_score) back to the full feature rows."""
+    ids = df_scores[KEY_COL].astype("int64").tolist()
+    parts = []
+    # Stay under SQLite's host-parameter limit
+    for i in range(0, len(ids), batch_size):
+        batch = ids[i:i + batch_size]
+        placeholders = ", ".join(f":id{j}" for j in range(len(batch)))
+        query = text(f"SELECT * FROM {table} WHERE {KEY_COL} IN ({placeholders}) ORDER BY {KEY_COL};")
+        parts.append(pd.read_sql(query, conn, params={f"id{j}": v for j, v in enumerate(batch)}))
+
+    df_full = pd.concat(parts, ignore_index=True)
+    scores = df_scores.set_index(KEY_COL)["fraud_score"]
+    df_full["fraud_score"] = df_full[KEY_COL].map(scores).astype("float64")
+    return df_full
+
+
+def rows_per_sec(n_rows: int, seconds: float) -> float:
+    return n_rows / seconds if seconds > 0 else float("inf")
+
+
+# ----------------------------------------------------
+# Scoring watermark (incremental scoring)
+# ----------------------------------------------------
+# One row recording how far transaction_features has been scored and with
+# which model/threshold. Rows past max_transaction_id can be scored and
+# appended; any change to the model file (or threshold) needs a full rescore.
+# So does a change to the source columns: suspicious rows are copied whole
+# from transaction_features, and appending rows with a new column set to the
+# old table fails.
+
+WATERMARK_TABLE = "scoring_watermark"
+
+
+def source_columns(conn, table: str = SOURCE_TABLE):
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({table});")).fetchall()]
+
+
+def columns_sha256(columns) -> str:
+    return hashlib.sha256("\n".join(columns).encode("utf-8")).hexdigest()
+
+
+def read_watermark(conn):
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name;"),
+        {"name": WATERMARK_TABLE},
+    ).fetchone()
+    if not exists:
+        return None
+    # SELECT *: watermarks written before source_columns_sha256 existed read
+    # without it, which forces one full rescore
+    row = conn.execute(text(f"SELECT * FROM {WATERMARK_TABLE};")).mappings().fetchone()
+    return dict(row) if row else None
+
+
+def write_watermark(conn, model_sha256: str, threshold: float, max_transaction_id: int,
+                    source_columns_sha256: str = None):
+    max_step = conn.execute(
+        text(f"SELECT step FROM {SOURCE_TABLE} WHERE {KEY_COL} = :id;"), {"id": max_transaction_id}
+    ).scalar()
+    # Recreated every time (it holds one row), so older layouts are upgraded
+    conn.execute(text(f"DROP TABLE IF EXISTS {WATERMARK_TABLE};"))
+    conn.execute(text(f"""
+    CREATE TABLE {WATERMARK_TABLE} (
+        model_sha256 TEXT NOT NULL,
+        threshold REAL NOT NULL,
+        max_transaction_id INTEGER NOT NULL,
+        max_step INTEGER,
+        source_columns_sha256 TEXT,
+        scored_at TEXT NOT NULL
+    );
+    """))
+    conn.execute(
+        text(f"""
+        INSERT INTO {WATERMARK_TABLE}
+            (model_sha256, threshold, max_transaction_id, max_step, source_columns_sha256, scored_at)
+        VALUES (:sha, :threshold, :max_id, :max_step, :columns_sha, datetime('now'));
+        """),
+        {"sha": model_sha256, "threshold": threshold, "max_id": max_transaction_id, "max_step": max_step,
+         "columns_sha": source_columns_sha256},
+    )
+
+
+# ----------------------------------------------------
+# Feature preparation & scoring of a single chunk
+# ----------------------------------------------------
+def score_chunk(model, encoder, df_chunk: pd.DataFrame):
+    # Fixed-schema float32 matrix, no get_dummies/copy of the chunk
+    X = encode(df_chunk, encoder)
+    return model.predict_proba(X)[:, 1]
+
+
+# ----------------------------------------------------
+# Multi-process scoring over disjoint transaction_id ranges
+# ----------------------------------------------------
+# Each worker process loads the model bundle once (pool initializer), owns its
+# own SQLite connection, and scores whole id ranges. Only the suspicious rows
+# travel back to the parent, which stays the single writer.
+
+def split_key_ranges(min_id: int, max_id: int, range_size: int):
+    """Return (start_after, end_at) pairs covering min_id..max_id."""
+    ranges = []
+    start_after = min_id - 1
+    while start_after < max_id:
+        end_at = min(start_after + range_size, max_id)
+        ranges.append((start_after, end_at))
+        start_after = end_at
+    return ranges
+
+
+_worker = {}
+
+
+def _init_worker(db_url: str, model_path: str, backend: str = "sklearn"):
+    # Forked after the parent's load_model(), so this is a cache hit and the
+    # model pages (or the flat backend's memory maps) are shared, not copied
+    loaded = load_model(model_path, backend)
+    _worker["engine"] = create_engine(db_url)
+    _worker["model"] = loaded["model"]
+    # Parallelism comes from the processes; keep each forest single-threaded
+    # so N workers don't each spin up a thread per core.
+    if hasattr(_worker["model"], "n_jobs"):
+        _worker["model"].n_jobs = 1
+    _worker["encoder"] = loaded["encoder"]
+
+
+def _score_key_range(task):
+    start_after, end_at, chunk_size, threshold = task
+    result = {"first_id": start_after + 1, "last_id": end_at, "rows": 0,
+              "read_seconds": 0.0, "score_seconds": 0.0, "suspicious": []}
+
+    with _worker["engine"].connect() as conn:
+        chunks = iter_scoring_chunks(conn, _worker["encoder"], chunk_size, start_after, end_at)
+        for df_chunk, read_seconds in chunks:
+            t0 = time.perf_counter()
+            df_chunk["fraud_score"] = score_chunk(_worker["model"], _worker["encoder"], df_chunk)
+            result["score_seconds"] += time.perf_counter() - t0
+            result["read_seconds"] += read_seconds
+            result["rows"] += len(df_chunk)
+            # Only ids + scores go back to the writer, which joins the full rows
+            passed = df_chunk["fraud_score"] >= threshold
+            result["suspicious"].append(df_chunk.loc[passed, [KEY_COL, "fraud_score"]])
+
+    suspicious = [df for df in result["suspicious"] if not df.empty]
+    result["suspicious"] = pd.concat(suspicious, ignore_index=True) if suspicious else None
+    return result
+
+
+def parallel_scoring_supported() -> bool:
+    # Workers are forked so the module-level pipeline scripts are not re-run in
+    # every child (spawn would re-import __main__).
+    return "fork" in mp.get_all_start_methods()
+
+
+def score_ranges_parallel(db_url: str, model_path: str, ranges, chunk_size: int,
+                          threshold: float, workers: int, backend: str = "sklearn"):
+    """Yield one result dict per id range, in range order."""
+    tasks = [(start_after, end_at, chunk_size, threshold) for start_after, end_at in ranges]
+    ctx = mp.get_context("fork")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(db_url, model_path, backend)) as pool:
+        for result in pool.imap(_score_key_range, tasks):
+            yield result
+
+
+# ----------------------------------------------------
+# Pipelined single-process scoring
+# ----------------------------------------------------
+# read -> featurize -> predict -> write run in their own threads connected by
+# bounded queues, so chunk k+1 is read and chunk k-1 is written while chunk k
+# is being predicted. SQLite reads, predict_proba and the writes all release
+# the GIL for most of their work. Each stage records only its busy time (not
+# time spent waiting on a queue), which points at the bottleneck stage.
+
+PIPELINE_STAGES = ("read", "featurize", "predict", "write")
+_DONE = object()
+
+
+def score_pipelined(engine, model, encoder, chunk_size: int, threshold: float,
+                    write_fn, on_chunk=None, queue_size: int = 2,
+                    start_after: int = 0, end_at=None):
+    """Score transaction_features past start_after; return per-stage timing stats."""
+    stats = {name: {"seconds": 0.0, "chunks": 0, "rows": 0} for name in PIPELINE_STAGES}
+    errors = []
+    to_featurize = queue.Queue(maxsize=queue_size)
+    to_predict = queue.Queue(maxsize=queue_size)
+    to_write = queue.Queue(maxsize=queue_size)
+
+    def record(stage: str, seconds: float, n_rows: int):
+        stats[stage]["seconds"] += seconds
+        stats[stage]["chunks"] += 1
+        stats[stage]["rows"] += n_rows
+
+    def reader():
+        try:
+            with engine.connect() as conn:
+                chunks = iter_scoring_chunks(conn, encoder, chunk_size, start_after, end_at)
+                for df_chunk, read_seconds in chunks:
+                    if errors:
+                        break
+                    record("read", read_seconds, len(df_chunk))
+                    to_featurize.put(df_chunk)
+        except Exception as e:
+            errors.append(("read", e))
+        finally:
+            to_featurize.put(_DONE)
+
+    def run_stage(name: str, fn, in_q: queue.Queue, out_q: queue.Queue):
+        # After an error keep draining the input so upstream never blocks
+        while True:
+            item = in_q.get()
+            if item is _DONE:
+                break
+            if errors:
+                continue
+            try:
+                t0 = time.perf_counter()
+                out, n_rows = fn(item)
+                record(name, time.perf_counter() - t0, n_rows)
+                out_q.put(out)
+            except Exception as e:
+                errors.append((name, e))
+        out_q.put(_DONE)
+
+    def featurize(df_chunk):
+        return (df_chunk, encode(df_chunk, encoder)), len(df_chunk)
+
+    def predict(item):
+        df_chunk, X = item
+        df_chunk["fraud_score"] = model.predict_proba(X)[:, 1]
+        passed = df_chunk["fraud_score"] >= threshold
+        return (df_chunk.loc[passed, [KEY_COL, "fraud_score"]], len(df_chunk)), len(df_chunk)
+
+    threads = [
+        threading.Thread(target=reader, name="score-read", daemon=True),
+        threading.Thread(target=run_stage, name="score-featurize", daemon=True,
+                         args=("featurize", featurize, to_featurize, to_predict)),
+        threading.Thread(target=run_stage, name="score-predict", daemon=True,
+                         args=("predict", predict, to_predict, to_write)),
+    ]
+    for t in threads:
+        t.start()
+
+    # The writer runs on the calling thread (single writer)
+    while True:
+        item = to_write.get()
+        if item is _DONE:
+            break
+        if errors:
+            continue
+        df_susp, n_rows = item
+        try:
+            t0 = time.perf_counter()
+            if len(df_susp) > 0:
+                write_fn(df_susp)
+            record("write", time.perf_counter() - t0, len(df_susp))
+        except Exception as e:
+            errors.append(("write", e))
+            continue
+        if on_chunk is not None:
+            on_chunk(n_rows, len(df_susp))
+
+    for t in threads:
+        t.join()
+
+    if errors:
+        stage, e = errors[0]
+        raise RuntimeError(f"pipeline stage '{stage}' failed: {e}") from e
+
+    return stats
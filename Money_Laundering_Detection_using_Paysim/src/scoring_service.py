@@ -0,0 +1,228 @@
+import json
+import os
+import signal
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from feature_encoder import encode
+from flat_forest import SCORE_BACKENDS
+from micro_batcher import MicroBatcher
+from model_store import load_model
+from online_features import derive_features
+
+# ----------------------------------------------------
+# Online scoring service
+# ----------------------------------------------------
+# Loads the model bundle once and scores raw PaySim-shaped transactions over
+# HTTP, deriving the clean/feature columns in memory (online_features.py).
+#
+#   POST /score   {"step": 1, "type": "TRANSFER", "amount": 181.0, ...}
+#                 -> {"fraud_score": 0.93, "suspicious": true}
+#   POST /score   [{...}, {...}]  or  {"transactions": [{...}, ...]}
+#                 -> {"results": [{"fraud_score": ..., "suspicious": ...}, ...]}
+#   GET  /health  -> {"status": "ok", "model_sha256": ..., "backend": ...}
+#   GET  /stats   -> micro-batcher settings and achieved batch sizes
+#
+# Field names may be the PaySim CSV ones (oldbalanceOrg, ...) or the
+# raw_transactions ones (old_balance_orig, ...). transaction_id is echoed back
+# when given. Run load_test_scoring_service.py against it for p50/p99 latency.
+#
+# Concurrent requests are coalesced into one predict call by
+# micro_batcher.MicroBatcher (SCORE_MICROBATCH=0 scores each request on its own
+# handler thread instead).
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+host = os.getenv("SCORE_SERVICE_HOST", "127.0.0.1")
+port = int(os.getenv("SCORE_SERVICE_PORT", "8765"))
+max_batch = int(os.getenv("SCORE_SERVICE_MAX_BATCH", "1000"))
+threshold = 0.8  # same cut-off as score_transactions.py
+# The flattened forest avoids sklearn's per-estimator overhead, which
+# dominates for the small batches a service sees (benchmark_flat_forest.py).
+# Unless the backend is set explicitly, models that aren't a RandomForest
+# (e.g. the SGD pipeline from train_model_streaming.py) fall back to sklearn.
+backend = os.getenv("SCORE_SERVICE_BACKEND", "flat")
+backend_is_default = "SCORE_SERVICE_BACKEND" not in os.environ
+
+# Micro-batching: starting limits; with ADAPTIVE=1 they are re-tuned from the
+# observed predict latency to keep batch predict + wait within TARGET_MS
+microbatch = os.getenv("SCORE_MICROBATCH", "1") == "1"
+microbatch_max_batch = int(os.getenv("SCORE_MICROBATCH_MAX_BATCH", "256"))
+microbatch_max_wait_ms = float(os.getenv("SCORE_MICROBATCH_MAX_WAIT_MS", "2"))
+microbatch_target_ms = float(os.getenv("SCORE_MICROBATCH_TARGET_MS", "10"))
+microbatch_adaptive = os.getenv("SCORE_MICROBATCH_ADAPTIVE", "1") == "1"
+
+if backend not in SCORE_BACKENDS:
+    print(f"ERROR: SCORE_SERVICE_BACKEND must be one of {SCORE_BACKENDS}, got '{backend}'")
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 2. Load trained model
+# ----------------------------------------------------
+model_path = os.path.join(BASE_DIR, "models", os.getenv("MODEL_FILE", "rf_aml_model.pkl"))
+
+if not os.path.exists(model_path):
+    print(f"ERROR: Model file not found at {model_path}")
+    sys.exit(1)
+
+print(f"Loading model from: {model_path}")
+try:
+    try:
+        loaded = load_model(model_path, backend)
+    except ValueError as e:
+        if not (backend == "flat" and backend_is_default):
+            raise
+        print(f"WARNING: {e}; falling back to the sklearn backend.")
+        backend = "sklearn"
+        loaded = load_model(model_path, backend)
+except ValueError as e:
+    print(f"ERROR: {e}")
+    sys.exit(1)
+
+model = loaded["model"]
+encoder = loaded["encoder"]
+# Requests are scored on the handler threads; keep predict single-threaded
+if hasattr(model, "n_jobs"):
+    model.n_jobs = 1
+
+print(f"✅ Model loaded (backend: {backend}, sha256 {loaded['sha256'][:12]}...).")
+
+
+# ----------------------------------------------------
+# 3. Scoring
+# ----------------------------------------------------
+def score_records(records):
+    features = derive_features(records)
+    scores = model.predict_proba(encode(features, encoder))[:, 1]
+
+    results = [{"fraud_score": score, "suspicious": score >= threshold} for score in scores.tolist()]
+    if "transaction_id" in features:
+        for result, transaction_id in zip(results, features["transaction_id"]):
+            result["transaction_id"] = transaction_id
+    return results
+
+
+batcher = None
+if microbatch:
+    batcher = MicroBatcher(
+        score_records,
+        max_batch=microbatch_max_batch,
+        max_wait_ms=microbatch_max_wait_ms,
+        target_ms=microbatch_target_ms,
+        adaptive=microbatch_adaptive,
+        hard_max_batch=max_batch,
+    )
+
+
+class ScoringServer(ThreadingHTTPServer):
+    # The default listen backlog (5) drops SYNs under a burst of new clients,
+    # which then retry after a full second
+    request_queue_size = 128
+
+
+class ScoringHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients don't pay a TCP handshake per request; headers
+    # and body are separate writes, so Nagle + delayed ACK would add ~40 ms
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def send_json(self, status: int, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok", "model_sha256": loaded["sha256"], "backend": backend})
+        elif self.path == "/stats":
+            self.send_json(200, batcher.report() if batcher else {"microbatch": False})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", "0"))
+            payload = json.loads(self.rfile.read(length) or b"null")
+        except ValueError:
+            self.send_json(400, {"error": "request body must be JSON"})
+            return
+
+        single = isinstance(payload, dict) and "transactions" not in payload
+        records = [payload] if single else payload.get("transactions") if isinstance(payload, dict) else payload
+
+        if not isinstance(records, list) or not records or not all(isinstance(r, dict) for r in records):
+            self.send_json(400, {"error": "expected a transaction object or a non-empty list of them"})
+            return
+        if len(records) > max_batch:
+            self.send_json(413, {"error": f"at most {max_batch} transactions per request"})
+            return
+
+        try:
+            results = batcher.score(records) if batcher else score_records(records)
+        except ValueError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self.send_json(500, {"error": f"scoring failed: {e}"})
+            return
+
+        self.send_json(200, results[0] if single else {"results": results})
+
+    def log_message(self, format, *args):
+        # Per-request access logging would dominate the latency budget
+        pass
+
+
+# ----------------------------------------------------
+# 4. Serve
+# ----------------------------------------------------
+# Warm-up: the first predict pays one-off allocation / page-in costs
+score_records([{"step": 1, "type": "PAYMENT", "amount": 1.0, "oldbalanceOrg": 0.0, "newbalanceOrig": 0.0,
+                "oldbalanceDest": 0.0, "newbalanceDest": 0.0}])
+
+try:
+    server = ScoringServer((host, port), ScoringHandler)
+except OSError as e:
+    print(f"❌ Could not bind {host}:{port}.")
+    print(e)
+    sys.exit(1)
+
+# Shut down cleanly on SIGTERM (service managers) as well as Ctrl+C
+signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+print(f"✅ Scoring service listening on http://{host}:{port} (POST /score, GET /health, GET /stats)")
+if batcher:
+    print(f"Micro-batching: max_batch {batcher.max_batch}, max_wait {batcher.max_wait_ms} ms, "
+          f"target {batcher.target_ms} ms, adaptive {batcher.adaptive}")
+started = time.perf_counter()
+
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.server_close()
+    print(f"Scoring service stopped after {time.perf_counter() - started:.0f}s.")
+    if batcher:
+        batcher.close()
+        print("Micro-batching:", json.dumps(batcher.report()))
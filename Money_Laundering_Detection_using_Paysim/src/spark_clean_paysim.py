@@ -1,9 +1,43 @@
+import argparse
 import os
 import sys
 import glob
 
+from pyspark import StorageLevel
 from pyspark.sql import SparkSession
 from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    ByteType, DoubleType, IntegerType, LongType, StringType, StructField, StructType,
+)
+
+# ----------------------------------------------------
+# 0. Command-line options (output layout)
+# ----------------------------------------------------
+# Readers skip data three ways, and the layout decides how much:
+#   partitions  event_day=<n>/transaction_type=<t>/ directories, pruned from the
+#               path alone ("last N days", "TRANSFER/CASH_OUT only")
+#   files       sorted output gives each file a narrow min/max range
+#   row groups  smaller row groups make the min/max statistics finer grained
+# The defaults keep the original output (unpartitioned, unsorted, no file cap,
+# 128 MB row groups, no event_day column); pass the options to opt in, e.g.
+# --partition-by day --sort-by step --max-records-per-file 1000000 --row-group-mb 32
+PARTITION_COLUMNS = {"day": "event_day", "type": "transaction_type"}
+
+parser = argparse.ArgumentParser(description="Clean the PaySim CSV with Spark and write it as Parquet.")
+parser.add_argument("--partition-by", nargs="+", choices=["none", *PARTITION_COLUMNS], default=["none"],
+                    help="Partition directories: day (step // 24) and/or type, or none (default: none).")
+parser.add_argument("--sort-by", choices=["none", "step", "src_account_id"], default="none",
+                    help="Sort order within each file (default: none).")
+parser.add_argument("--max-records-per-file", type=int, default=0,
+                    help="Target file size in rows (Spark caps files by rows, not bytes; default 0 = no cap).")
+parser.add_argument("--row-group-mb", type=int, default=128,
+                    help="Parquet row group size in MB (default: 128, Spark's own default).")
+parser.add_argument("--output", default=os.path.join("data", "spark", "clean_transactions"),
+                    help="Output directory, relative to the project (default: data/spark/clean_transactions).")
+args = parser.parse_args()
+
+partition_cols = [PARTITION_COLUMNS[p] for p in args.partition_by if p != "none"]
+sort_col = None if args.sort_by == "none" else args.sort_by
 
 # ----------------------------------------------------
 # 1. Locate the CSV file
@@ -12,7 +46,7 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_DIR = os.path.dirname(BASE_DIR)
 
 raw_dir = os.path.join(PROJECT_DIR, "data", "raw")
-csv_files = glob.glob(os.path.join(raw_dir, "*.csv"))
+csv_files = sorted(glob.glob(os.path.join(raw_dir, "*.csv")))
 
 if not csv_files:
     print(f"ERROR: No CSV files found in {raw_dir}")
@@ -36,10 +70,40 @@ spark.sparkContext.setLogLevel("WARN")
 # ----------------------------------------------------
 # 3. Read CSV into Spark DataFrame
 # ----------------------------------------------------
+# Declared schema (same types as csv_dtypes in ingest_paysim.py): the CSV is
+# read in one pass instead of an inferSchema pass plus the real one.
+paysim_schema = StructType([
+    StructField("step", IntegerType()),
+    StructField("type", StringType()),
+    StructField("amount", DoubleType()),
+    StructField("nameOrig", StringType()),
+    StructField("oldbalanceOrg", DoubleType()),
+    StructField("newbalanceOrig", DoubleType()),
+    StructField("nameDest", StringType()),
+    StructField("oldbalanceDest", DoubleType()),
+    StructField("newbalanceDest", DoubleType()),
+    StructField("isFraud", ByteType()),
+    StructField("isFlaggedFraud", ByteType()),
+])
+expected_cols = paysim_schema.fieldNames()
+
+# A declared schema is applied by position, so check the header names first
+with open(csv_path, newline="") as f:
+    header = f.readline().strip().split(",")
+if header != expected_cols:
+    missing = [c for c in expected_cols if c not in header]
+    if missing:
+        print("ERROR: Missing expected columns:", missing)
+    else:
+        print("ERROR: Unexpected column order:", header)
+    spark.stop()
+    sys.exit(1)
+
 df = (
     spark.read
     .option("header", "true")
-    .option("inferSchema", "true")
+    .option("mode", "FAILFAST")  # bad values raise instead of becoming NULLs
+    .schema(paysim_schema)
     .csv(csv_path)
 )
 
@@ -48,27 +112,19 @@ print("Schema:")
 df.printSchema()
 
 # ----------------------------------------------------
-# 4. Basic column checks / renames
+# 4. transaction_id and column renames
 # ----------------------------------------------------
-expected_cols = [
-    "step",
-    "type",
-    "amount",
-    "nameOrig",
-    "oldbalanceOrg",
-    "newbalanceOrig",
-    "nameDest",
-    "oldbalanceDest",
-    "newbalanceDest",
-    "isFraud",
-    "isFlaggedFraud",
-]
-
-missing = [c for c in expected_cols if c not in df.columns]
-if missing:
-    print("ERROR: Missing expected columns:", missing)
-    spark.stop()
-    sys.exit(1)
+# Dense ids in file order, 1..n, as ingest_paysim.py assigns them, so the
+# Spark and SQLite outputs join on transaction_id. zipWithIndex numbers rows
+# by (partition, position); CSV splits are byte ranges in file order. It runs
+# a job to count each partition first, so the rows are persisted and that
+# count is the only read of the CSV.
+df = df.persist(StorageLevel.MEMORY_AND_DISK)
+id_schema = StructType([StructField("transaction_id", LongType(), False)] + paysim_schema.fields)
+df = spark.createDataFrame(
+    df.rdd.zipWithIndex().map(lambda row_idx: (row_idx[1] + 1, *row_idx[0])),
+    id_schema,
+)
 
 df = (
     df
@@ -82,9 +138,6 @@ df = (
     .withColumnRenamed("isFlaggedFraud", "is_flagged_fraud")
 )
 
-# Add transaction_id similar to SQLite (monotonically increasing)
-df = df.withColumn("transaction_id", F.monotonically_increasing_id() + 1)
-
 # ----------------------------------------------------
 # 5. Time-based features (event_time, hour_of_day, day_of_week)
 # ----------------------------------------------------
@@ -100,6 +153,11 @@ df = df.withColumn(
     F.from_unixtime(base_unix + F.col("step") * F.lit(3600)).cast("timestamp")
 )
 
+# Day offset of event_time from base_time, only added as the partition key
+# for --partition-by day
+if "event_day" in partition_cols:
+    df = df.withColumn("event_day", F.floor(F.col("step") / 24).cast("int"))
+
 df = df.withColumn("hour_of_day", F.hour("event_time"))
 
 # day_of_week: Monday=0, Sunday=6
@@ -136,6 +194,7 @@ df = (
 cols_order = [
     "transaction_id",
     "event_time",
+    "event_day",
     "step",
     "hour_of_day",
     "day_of_week",
@@ -162,17 +221,43 @@ df.printSchema()
 # ----------------------------------------------------
 # 8. Write output as Parquet
 # ----------------------------------------------------
-output_dir = os.path.join(PROJECT_DIR, "data", "spark", "clean_transactions")
+output_dir = os.path.join(PROJECT_DIR, args.output)
+
+if partition_cols:
+    # Shuffle so each task holds whole partition values: one file per directory
+    # (split by maxRecordsPerFile) instead of one per task per directory
+    df = df.repartition(*partition_cols)
+    if sort_col:
+        # The writer sorts by the partition columns anyway; leading with them avoids a second sort
+        df = df.sortWithinPartitions(*partition_cols, sort_col)
+elif sort_col:
+    # Global sort (range partitioned): files cover disjoint sort_col ranges
+    df = df.orderBy(sort_col)
 
 print(f"Writing Spark clean dataset to: {output_dir}")
+print(f"Layout: partition_by={partition_cols or 'none'}, sort_by={sort_col or 'none'}, "
+      f"max_records_per_file={args.max_records_per_file or 'unlimited'}, row_group={args.row_group_mb} MB")
 
-(
+writer = (
     df.write
     .mode("overwrite")
-    .parquet(output_dir)
+    .option("compression", "snappy")
+    .option("maxRecordsPerFile", args.max_records_per_file)
+    .option("parquet.block.size", args.row_group_mb * 1024 * 1024)
 )
+if partition_cols:
+    writer = writer.partitionBy(*partition_cols)
+writer.parquet(output_dir)
+
+n_files, n_bytes = 0, 0
+for root, _, files in os.walk(output_dir):
+    for name in files:
+        if name.endswith(".parquet"):
+            n_files += 1
+            n_bytes += os.path.getsize(os.path.join(root, name))
+print(f"✅ {n_files} Parquet files, {n_bytes / 1e6:.1f} MB "
+      "(compare layouts with benchmark_parquet_layout.py).")
 
 print("🎉 Spark clean_transactions written successfully.")
 
 spark.stop()
-
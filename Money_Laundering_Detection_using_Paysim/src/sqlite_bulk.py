@@ -0,0 +1,62 @@
+import contextlib
+import sqlite3
+
+# ----------------------------------------------------
+# Raw sqlite3 bulk-load helpers
+# ----------------------------------------------------
+# DataFrame.to_sql goes through SQLAlchemy's generic executemany and commits
+# per chunk. For large loads it is much faster to use the sqlite3 driver
+# directly, keep everything in one transaction, and relax durability PRAGMAs
+# for the duration of the load (restoring them afterwards).
+
+# Load-time settings. journal_mode OFF/WAL and synchronous OFF trade crash
+# safety for speed, which is fine for tables that are rebuilt from source.
+# A crash with journal_mode OFF can corrupt the whole file, though, so stages
+# that write into the shared warehouse DB use WAL + synchronous NORMAL.
+FAST_LOAD_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "cache_size": -262144,  # negative = KiB, i.e. 256 MiB of page cache
+    "temp_store": "MEMORY",
+}
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves
+    return sqlite3.connect(db_path, isolation_level=None)
+
+
+@contextlib.contextmanager
+def fast_load_pragmas(conn: sqlite3.Connection, journal_mode: str = "OFF", synchronous: str = "OFF"):
+    """Apply FAST_LOAD_PRAGMAS for the block, then restore the previous values."""
+    settings = dict(FAST_LOAD_PRAGMAS, journal_mode=journal_mode, synchronous=synchronous)
+    saved = {name: conn.execute(f"PRAGMA {name};").fetchone()[0] for name in settings}
+
+    for name, value in settings.items():
+        conn.execute(f"PRAGMA {name} = {value};")
+    try:
+        yield
+    finally:
+        # journal_mode can't be changed inside an open transaction
+        if conn.in_transaction:
+            conn.rollback()
+        for name, value in saved.items():
+            conn.execute(f"PRAGMA {name} = {value};")
+
+
+def create_table(conn: sqlite3.Connection, table: str, schema, replace: bool = True):
+    """schema: list of (column, sqlite_type) pairs."""
+    if replace:
+        conn.execute(f"DROP TABLE IF EXISTS {table};")
+    cols = ",\n    ".join(f"{name} {sql_type}" for name, sql_type in schema)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n    {cols}\n);")
+
+
+def insert_frame(conn: sqlite3.Connection, table: str, df, columns) -> int:
+    """executemany the given DataFrame columns into table; returns row count."""
+    placeholders = ", ".join("?" for _ in columns)
+    sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders});"
+    # tolist() hands sqlite3 plain Python scalars (it can't bind NumPy types)
+    rows = zip(*(df[c].tolist() for c in columns))
+    conn.executemany(sql, rows)
+    return len(df)
@@ -2,6 +2,7 @@ import os
 import sys
 
 from dotenv import load_dotenv
+import numpy as np
 import pandas as pd
 from sqlalchemy import create_engine, text
 
@@ -10,6 +11,17 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import classification_report, roc_auc_score
 import joblib
 
+from feature_encoder import (
+    BASE_FEATURE_COLS,
+    build_encoder,
+    encode,
+    projected_columns,
+    projected_dtypes,
+)
+from model_compaction import build_candidates, measure_candidate, select_candidate
+from parquet_store import check_snapshot, dataset_dir, read_table, sample_table, storage_backend
+from sampling import sample_rows
+
 # ----------------------------------------------------
 # 1. Load environment variables
 # ----------------------------------------------------
@@ -31,6 +43,16 @@ db_full_path = os.path.join(BASE_DIR, DB_PATH)
 db_url = f"sqlite:///{db_full_path}"
 print(f"Using SQLite database at: {db_full_path}")
 
+# STORAGE_BACKEND=parquet reads transaction_features from its Parquet export
+try:
+    backend = storage_backend()
+except ValueError as e:
+    print(f"ERROR: {e}")
+    sys.exit(1)
+features_path = dataset_dir(BASE_DIR, "transaction_features")
+if backend == "parquet":
+    print(f"Reading transaction_features from Parquet: {features_path}")
+
 # ----------------------------------------------------
 # 2. Connect to SQLite
 # ----------------------------------------------------
@@ -44,24 +66,52 @@ except Exception as e:
     print(e)
     sys.exit(1)
 
+if backend == "parquet":
+    try:
+        with engine.connect() as conn:
+            check_snapshot(conn, "transaction_features", features_path)
+    except Exception as e:
+        print("❌ Cannot train from the Parquet copy of transaction_features.")
+        print(e)
+        sys.exit(1)
+
 # ----------------------------------------------------
 # 3. Load a balanced SAMPLE from transaction_features
 # ----------------------------------------------------
 # Strategy:
 #  - load ALL fraud rows (is_fraud = 1)
-#  - load an equal number of non-fraud rows (is_fraud = 0, random sample)
+#  - load TRAIN_NEG_RATIO x as many non-fraud rows (is_fraud = 0, random sample;
+#    1:1 by default)
 #  => small, balanced training set that fits in memory
+#
+# Only the model inputs, transaction_type and the id/label columns are read
+# (no SELECT *), with compact dtypes.
+
+# The encoder fixes the one-hot layout of transaction_type (all five PaySim
+# types, CASH_IN as reference) so it doesn't depend on which types happen to
+# be in the sample. It is saved in the model bundle and reused by the scorer.
+encoder = build_encoder(BASE_FEATURE_COLS)
+feature_cols_extended = encoder["feature_cols"]
+
+train_cols = projected_columns(encoder, key_cols=("transaction_id", "is_fraud"))
+train_dtypes = projected_dtypes(train_cols)
+select_cols = ", ".join(train_cols)
 
 print("Loading fraud rows...")
-fraud_query = """
-SELECT *
+fraud_query = f"""
+SELECT {select_cols}
 FROM transaction_features
 WHERE is_fraud = 1;
 """
 
 try:
-    with engine.connect() as conn:
-        df_fraud = pd.read_sql(fraud_query, conn)
+    if backend == "parquet":
+        # Projection + is_fraud pushed into the Parquet scan
+        df_fraud = read_table(features_path, columns=train_cols, filters=[("is_fraud", "=", 1)],
+                              dtype=train_dtypes)
+    else:
+        with engine.connect() as conn:
+            df_fraud = pd.read_sql(fraud_query, conn, dtype=train_dtypes)
 except Exception as e:
     print("❌ Failed to read fraud rows.")
     print(e)
@@ -74,18 +124,35 @@ if n_fraud == 0:
     print("ERROR: No fraud rows found in transaction_features. Cannot train model.")
     sys.exit(1)
 
-print("Loading non-fraud sample...")
-nonfraud_query = f"""
-SELECT *
-FROM transaction_features
-WHERE is_fraud = 0
-ORDER BY RANDOM()
-LIMIT {n_fraud};
-"""
+# Non-fraud rows are drawn by random transaction_id (see sampling.py) rather
+# than "ORDER BY RANDOM() LIMIT n", which sorts every non-fraud row.
+# TRAIN_NEG_RATIO sets non-fraud rows per fraud row, TRAIN_SEED the draw.
+neg_ratio = float(os.getenv("TRAIN_NEG_RATIO", "1.0"))
+sample_seed = int(os.getenv("TRAIN_SEED", "42"))
+n_nonfraud = int(round(n_fraud * neg_ratio))
+
+print(f"Loading non-fraud sample ({n_nonfraud} rows, ratio {neg_ratio}:1, seed {sample_seed})...")
 
 try:
-    with engine.connect() as conn:
-        df_nonfraud = pd.read_sql(nonfraud_query, conn)
+    if backend == "parquet":
+        df_nonfraud = sample_table(
+            features_path,
+            n_nonfraud,
+            train_cols,
+            filters=[("is_fraud", "=", 0)],
+            seed=sample_seed,
+            dtype=train_dtypes,
+        )
+    else:
+        with engine.connect() as conn:
+            df_nonfraud = sample_rows(
+                conn,
+                n_nonfraud,
+                train_cols,
+                where="is_fraud = 0",
+                seed=sample_seed,
+                dtype=train_dtypes,
+            )
 except Exception as e:
     print("❌ Failed to read non-fraud sample.")
     print(e)
@@ -99,30 +166,12 @@ print("Combined sample shape:", df.shape)
 # ----------------------------------------------------
 # 4. Feature selection
 # ----------------------------------------------------
-feature_cols = [
-    "transaction_amount",
-    "hour_of_day",
-    "day_of_week",
-    "is_high_value",
-    "is_night_txn",
-    "src_balance_change",
-    "dst_balance_change",
-]
-
-# simple one-hot encode for transaction_type
-df = pd.get_dummies(df, columns=["transaction_type"], drop_first=True)
-
-# update feature_cols to include the new one-hot columns
-feature_cols_extended = feature_cols + [
-    c for c in df.columns if c.startswith("transaction_type_")
-]
-
-for c in feature_cols_extended:
+for c in encoder["numeric_cols"] + [encoder["type_col"]]:
     if c not in df.columns:
         print(f"ERROR: Expected feature column missing: {c}")
         sys.exit(1)
 
-X = df[feature_cols_extended]
+X = encode(df, encoder)
 y = df["is_fraud"].astype(int)
 
 print("Feature matrix shape:", X.shape)
@@ -170,16 +219,74 @@ except Exception as e:
     print("Could not compute ROC AUC:", e)
 
 # ----------------------------------------------------
-# 8. Save model artifact
+# 8. Optional model compaction (TRAIN_COMPACT=1)
 # ----------------------------------------------------
+# Fits the capped/pruned candidates from model_compaction.COMPACTION_CANDIDATES,
+# reports AUC vs predict latency vs size for each, and keeps the fastest one
+# whose test AUC is within TRAIN_MAX_AUC_LOSS of the full forest (and, if
+# TRAIN_LATENCY_BUDGET_MS is set, whose latency per TRAIN_LATENCY_ROWS-row
+# batch fits the budget). The report is written next to the model.
 models_dir = os.path.join(BASE_DIR, "models")
 os.makedirs(models_dir, exist_ok=True)
 
+compaction = None
+
+if os.getenv("TRAIN_COMPACT", "0") == "1":
+    max_auc_loss = float(os.getenv("TRAIN_MAX_AUC_LOSS", "0.002"))
+    latency_budget = os.getenv("TRAIN_LATENCY_BUDGET_MS")
+    latency_budget_ms = float(latency_budget) if latency_budget else None
+    latency_rows = int(os.getenv("TRAIN_LATENCY_ROWS", "1000"))
+
+    print(f"\nCompacting model (max AUC loss {max_auc_loss}, latency budget "
+          f"{latency_budget_ms if latency_budget_ms is not None else 'none'} ms per {latency_rows} rows)...")
+
+    results, candidates = {}, {}
+    try:
+        for name, params, candidate in build_candidates(model, X_train, y_train):
+            candidates[name] = candidate
+            results[name] = measure_candidate(candidate, X_test, y_test, latency_rows=latency_rows)
+            r = results[name]
+            print(f"  {name:<11} AUC {r['auc']:.4f} | {r['predict_ms']:7.1f} ms/{latency_rows} rows "
+                  f"| {r['size_mb']:7.2f} MB | load {r['load_ms']:6.1f} ms | {r['nodes']:>8,} nodes")
+    except Exception as e:
+        print("❌ Model compaction failed.")
+        print(e)
+        sys.exit(1)
+
+    # Rounding thresholds down to float32 must not change a single prediction
+    if not np.array_equal(candidates["full"].predict_proba(X_test), model.predict_proba(X_test)):
+        # Compacted candidates share these thresholds; save the forest as trained
+        print("WARNING: float32 threshold rounding changed predictions; keeping the original model.")
+    else:
+        print("✅ float32 thresholds: predictions identical to the float64 forest.")
+
+        chosen = select_candidate(results, max_auc_loss, latency_budget_ms)
+        model = candidates[chosen]
+        compaction = dict(results[chosen], candidate=chosen,
+                          auc_loss=results["full"]["auc"] - results[chosen]["auc"])
+
+        report = pd.DataFrame.from_dict(results, orient="index")
+        report.index.name = "candidate"
+        report["selected"] = report.index == chosen
+        report_path = os.path.join(models_dir, "rf_aml_compaction_report.csv")
+        report.to_csv(report_path)
+
+        print(f"✅ Selected '{chosen}': AUC {results[chosen]['auc']:.4f} "
+              f"(full {results['full']['auc']:.4f}), {results[chosen]['predict_ms']:.1f} ms vs "
+              f"{results['full']['predict_ms']:.1f} ms, {results[chosen]['size_mb']:.2f} MB vs "
+              f"{results['full']['size_mb']:.2f} MB")
+        print(f"Compaction report written to: {report_path}")
+
+# ----------------------------------------------------
+# 9. Save model artifact
+# ----------------------------------------------------
 model_path = os.path.join(models_dir, "rf_aml_model.pkl")
 joblib.dump(
     {
         "model": model,
         "feature_cols": feature_cols_extended,
+        "encoder": encoder,
+        "compaction": compaction,
     },
     model_path,
 )
@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import classification_report, roc_auc_score
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+import joblib
+
+from feature_encoder import (
+    BASE_FEATURE_COLS,
+    build_encoder,
+    encode,
+    projected_columns,
+    projected_dtypes,
+)
+from scoring_engine import iter_keyset_chunks, rows_per_sec
+
+# ----------------------------------------------------
+# 1. Load environment variables
+# ----------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    print(f"ERROR: .env file not found at {ENV_PATH}")
+    sys.exit(1)
+
+DB_PATH = os.getenv("DB_PATH")
+if not DB_PATH:
+    print("ERROR: DB_PATH is not set in .env")
+    sys.exit(1)
+
+db_full_path = os.path.join(BASE_DIR, DB_PATH)
+db_url = f"sqlite:///{db_full_path}"
+print(f"Using SQLite database at: {db_full_path}")
+
+# ----------------------------------------------------
+# 2. Connect to SQLite
+# ----------------------------------------------------
+try:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    print("✅ Successfully connected to SQLite database.")
+except Exception as e:
+    print("❌ Failed to connect to SQLite.")
+    print(e)
+    sys.exit(1)
+
+# ----------------------------------------------------
+# 3. Out-of-core training setup
+# ----------------------------------------------------
+# Unlike train_model.py (all fraud rows + an equal random sample of the rest,
+# held in memory), this streams ALL of transaction_features in keyset chunks
+# and fits incrementally, so memory is bounded by one chunk:
+#   pass 1      : class counts + StandardScaler.partial_fit
+#   epochs      : SGDClassifier(log_loss).partial_fit, class-weighted
+#                 (n / (2 * n_class)) instead of undersampling
+#   final pass  : score the holdout rows for evaluation
+# Rows with transaction_id % 10 == 0 are held out of training.
+#
+# The saved bundle has the same {"model", "feature_cols", "encoder"} layout as
+# rf_aml_model.pkl; the model is a scaler + SGD Pipeline with predict_proba.
+chunk_rows = int(os.getenv("TRAIN_CHUNK_ROWS", "200000"))
+epochs = int(os.getenv("TRAIN_STREAM_EPOCHS", "2"))
+holdout_mod = 10
+seed = int(os.getenv("TRAIN_SEED", "42"))
+
+encoder = build_encoder(BASE_FEATURE_COLS)
+feature_cols_extended = encoder["feature_cols"]
+
+train_cols = projected_columns(encoder, key_cols=("transaction_id", "is_fraud"))
+train_dtypes = projected_dtypes(train_cols)
+
+
+def iter_batches():
+    """Yield (X, y, is_holdout) per chunk of transaction_features."""
+    with engine.connect() as conn:
+        for df_chunk, _ in iter_keyset_chunks(conn, chunk_rows, columns=train_cols, dtype=train_dtypes):
+            X = encode(df_chunk, encoder)
+            y = df_chunk["is_fraud"].to_numpy(dtype=np.int8)
+            is_holdout = (df_chunk["transaction_id"].to_numpy() % holdout_mod) == 0
+            yield X, y, is_holdout
+
+
+scaler = StandardScaler()
+clf = SGDClassifier(loss="log_loss", alpha=1e-5, average=True, random_state=seed)
+rng = np.random.default_rng(seed)
+
+# ----------------------------------------------------
+# 4. Pass 1: class counts + scaler statistics
+# ----------------------------------------------------
+print(f"Pass 1: class counts and feature scaling ({chunk_rows} rows per chunk)...")
+class_counts = np.zeros(2, dtype=np.int64)
+pass_start = time.perf_counter()
+
+try:
+    for X, y, is_holdout in iter_batches():
+        train = ~is_holdout
+        if train.any():
+            scaler.partial_fit(X[train])
+            class_counts += np.bincount(y[train], minlength=2)
+except Exception as e:
+    print("❌ Failed while streaming transaction_features.")
+    print(e)
+    sys.exit(1)
+
+n_train = int(class_counts.sum())
+print(f"✅ Training rows: {n_train} (non-fraud {class_counts[0]}, fraud {class_counts[1]}) "
+      f"in {time.perf_counter() - pass_start:.1f}s")
+
+if class_counts.min() == 0:
+    missing = "fraud" if class_counts[1] == 0 else "non-fraud"
+    print(f"ERROR: No {missing} training rows found in transaction_features. Cannot train model.")
+    sys.exit(1)
+
+# 'balanced' weighting computed from the streamed counts
+class_weight = n_train / (2.0 * class_counts)
+print(f"Class weights: non-fraud {class_weight[0]:.4f}, fraud {class_weight[1]:.4f}")
+
+# ----------------------------------------------------
+# 5. Incremental fitting
+# ----------------------------------------------------
+for epoch in range(1, epochs + 1):
+    print(f"\nEpoch {epoch}/{epochs}...")
+    epoch_start = time.perf_counter()
+    seen = 0
+
+    try:
+        for X, y, is_holdout in iter_batches():
+            train = np.flatnonzero(~is_holdout)
+            if len(train) == 0:
+                continue
+            # Chunks arrive in step order; shuffle within the chunk for SGD
+            train = rng.permutation(train)
+            X_train = scaler.transform(X[train])
+            y_train = y[train]
+            clf.partial_fit(X_train, y_train, classes=[0, 1], sample_weight=class_weight[y_train])
+            seen += len(train)
+    except Exception as e:
+        print(f"❌ Failed while fitting epoch {epoch}.")
+        print(e)
+        sys.exit(1)
+
+    epoch_seconds = time.perf_counter() - epoch_start
+    print(f"✅ Epoch {epoch}: {seen} rows in {epoch_seconds:.1f}s ({rows_per_sec(seen, epoch_seconds):,.0f} rows/s)")
+
+model = Pipeline([("scaler", scaler), ("clf", clf)])
+
+# ----------------------------------------------------
+# 6. Evaluate on the holdout rows
+# ----------------------------------------------------
+print("\nScoring holdout rows...")
+y_test_parts, proba_parts = [], []
+
+try:
+    for X, y, is_holdout in iter_batches():
+        if is_holdout.any():
+            y_test_parts.append(y[is_holdout])
+            proba_parts.append(model.predict_proba(X[is_holdout])[:, 1].astype(np.float32))
+except Exception as e:
+    print("❌ Failed while scoring the holdout rows.")
+    print(e)
+    sys.exit(1)
+
+if not y_test_parts:
+    print("❌ No holdout rows found in transaction_features (table empty or too small). Cannot evaluate model.")
+    sys.exit(1)
+
+y_test = np.concatenate(y_test_parts)
+y_proba = np.concatenate(proba_parts)
+y_pred = (y_proba >= 0.5).astype(np.int8)
+
+print(f"Holdout rows: {len(y_test)} (fraud {int(y_test.sum())})")
+print("\nClassification report:")
+print(classification_report(y_test, y_pred, digits=4))
+
+try:
+    auc = roc_auc_score(y_test, y_proba)
+    print(f"ROC AUC: {auc:.4f}")
+except Exception as e:
+    print("Could not compute ROC AUC:", e)
+
+# ----------------------------------------------------
+# 7. Save model artifact
+# ----------------------------------------------------
+models_dir = os.path.join(BASE_DIR, "models")
+os.makedirs(models_dir, exist_ok=True)
+
+model_path = os.path.join(models_dir, os.getenv("STREAM_MODEL_FILE", "sgd_aml_model.pkl"))
+joblib.dump(
+    {
+        "model": model,
+        "feature_cols": feature_cols_extended,
+        "encoder": encoder,
+    },
+    model_path,
+)
+
+print(f"✅ Saved model to: {model_path}")
+print("To score with it, set MODEL_FILE to this file name in .env.")
+print("🎉 Streaming model training script finished successfully.")
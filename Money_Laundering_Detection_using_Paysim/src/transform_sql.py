@@ -0,0 +1,107 @@
+# ----------------------------------------------------
+# SQL for raw_transactions -> clean_transactions
+# ----------------------------------------------------
+# 'step' counts whole hours from BASE_TIME. BASE_TIME is midnight on a Monday,
+# so the calendar columns are plain integer arithmetic on step:
+#   hour_of_day = step % 24
+#   day_of_week = (step / 24 + BASE_DOW) % 7     (Monday = 0)
+# The original statement formatted the same datetime three times per row and
+# parsed it back with strftime; it is kept as the "legacy" engine so the
+# benchmark can compare against it.
+
+BASE_TIME = "2018-01-01 00:00:00"
+BASE_UNIX = 1514764800  # strftime('%s', BASE_TIME)
+BASE_DOW = 0            # 2018-01-01 was a Monday
+
+TRANSFORM_ENGINES = ("arith", "lookup", "legacy")
+
+# step -> calendar columns, one row per hour (used by the "lookup" engine)
+STEP_CALENDAR_TABLE = "step_calendar"
+
+_PASSTHROUGH_COLUMNS = """
+    r.type AS transaction_type,
+    r.amount AS transaction_amount,
+    r.name_orig AS src_account_id,
+    r.old_balance_orig AS old_balance_orig,
+    r.new_balance_orig AS new_balance_orig,
+    (r.new_balance_orig - r.old_balance_orig) AS src_balance_change,
+    r.name_dest AS dst_account_id,
+    r.old_balance_dest AS old_balance_dest,
+    r.new_balance_dest AS new_balance_dest,
+    (r.new_balance_dest - r.old_balance_dest) AS dst_balance_change,
+    r.is_fraud AS is_fraud,
+    r.is_flagged_fraud AS is_flagged_fraud"""
+
+_LEGACY_SELECT = f"""
+SELECT
+    r.transaction_id AS transaction_id,
+    datetime(strftime('%s','{BASE_TIME}') + r.step * 3600, 'unixepoch') AS event_time,
+    r.step AS step,
+    CAST(strftime('%H', datetime(strftime('%s','{BASE_TIME}') + r.step * 3600, 'unixepoch')) AS INTEGER) AS hour_of_day,
+    ((CAST(strftime('%w', datetime(strftime('%s','{BASE_TIME}') + r.step * 3600, 'unixepoch')) AS INTEGER) + 6) % 7) AS day_of_week,{_PASSTHROUGH_COLUMNS}
+FROM raw_transactions r"""
+
+_ARITH_SELECT = f"""
+SELECT
+    r.transaction_id AS transaction_id,
+    datetime({BASE_UNIX} + r.step * 3600, 'unixepoch') AS event_time,
+    r.step AS step,
+    (r.step % 24) AS hour_of_day,
+    ((r.step / 24 + {BASE_DOW}) % 7) AS day_of_week,{_PASSTHROUGH_COLUMNS}
+FROM raw_transactions r"""
+
+_LOOKUP_SELECT = f"""
+SELECT
+    r.transaction_id AS transaction_id,
+    c.event_time AS event_time,
+    r.step AS step,
+    c.hour_of_day AS hour_of_day,
+    c.day_of_week AS day_of_week,{_PASSTHROUGH_COLUMNS}
+FROM raw_transactions r
+JOIN {STEP_CALENDAR_TABLE} c ON c.step = r.step"""
+
+# Builds the per-hour calendar for every step in raw_transactions (~750 rows
+# for PaySim). MAX(step) is served by the natural-key index when it exists.
+STEP_CALENDAR_SQL = f"""
+DROP TABLE IF EXISTS {STEP_CALENDAR_TABLE};
+
+CREATE TABLE {STEP_CALENDAR_TABLE} (
+    step INTEGER PRIMARY KEY,
+    event_time TEXT NOT NULL,
+    hour_of_day INTEGER NOT NULL,
+    day_of_week INTEGER NOT NULL
+);
+
+INSERT INTO {STEP_CALENDAR_TABLE} (step, event_time, hour_of_day, day_of_week)
+WITH RECURSIVE steps(step) AS (
+    SELECT MIN(step) FROM raw_transactions
+    UNION ALL
+    SELECT step + 1 FROM steps WHERE step < (SELECT MAX(step) FROM raw_transactions)
+)
+SELECT
+    step,
+    datetime({BASE_UNIX} + step * 3600, 'unixepoch'),
+    step % 24,
+    (step / 24 + {BASE_DOW}) % 7
+FROM steps
+"""
+
+
+def clean_select(engine: str = "arith") -> str:
+    if engine == "arith":
+        return _ARITH_SELECT
+    if engine == "lookup":
+        return _LOOKUP_SELECT
+    if engine == "legacy":
+        return _LEGACY_SELECT
+    raise ValueError(f"Unknown transform engine '{engine}', expected one of {TRANSFORM_ENGINES}")
+
+
+def build_clean_sql(engine: str = "arith", table: str = "clean_transactions") -> str:
+    """Full ';'-separated script that rebuilds the clean table."""
+    prelude = STEP_CALENDAR_SQL + ";\n" if engine == "lookup" else ""
+    return f"""{prelude}
+DROP TABLE IF EXISTS {table};
+
+CREATE TABLE {table} AS{clean_select(engine)};
+"""
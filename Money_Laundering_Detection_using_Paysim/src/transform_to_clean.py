@@ -4,6 +4,10 @@ import sys
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
 
+from db_indexes import apply_indexes
+
+from transform_sql import TRANSFORM_ENGINES, build_clean_sql
+
 # ----------------------------------------------------
 # 1. Load environment variables from .env
 # ----------------------------------------------------
@@ -44,39 +48,25 @@ except Exception as e:
 # ----------------------------------------------------
 # We will:
 # - derive event_time from step (step is hours from a base date)
-# - compute hour_of_day and day_of_week from event_time
+# - derive hour_of_day and day_of_week from step with integer arithmetic
+#   (step % 24, (step / 24 + base_dow) % 7) instead of re-parsing event_time
 # - compute src_balance_change and dst_balance_change
 # - rename columns for clarity
 #
-# In SQLite:
-#   event_time = datetime(strftime('%s','2018-01-01 00:00:00') + step*3600, 'unixepoch')
-
-create_sql = """
-DROP TABLE IF EXISTS clean_transactions;
-
-CREATE TABLE clean_transactions AS
-SELECT
-    transaction_id,
-    datetime(strftime('%s','2018-01-01 00:00:00') + step * 3600, 'unixepoch') AS event_time,
-    step,
-    CAST(strftime('%H', datetime(strftime('%s','2018-01-01 00:00:00') + step * 3600, 'unixepoch')) AS INTEGER) AS hour_of_day,
-    ((CAST(strftime('%w', datetime(strftime('%s','2018-01-01 00:00:00') + step * 3600, 'unixepoch')) AS INTEGER) + 6) % 7) AS day_of_week,
-    type AS transaction_type,
-    amount AS transaction_amount,
-    name_orig AS src_account_id,
-    old_balance_orig,
-    new_balance_orig,
-    (new_balance_orig - old_balance_orig) AS src_balance_change,
-    name_dest AS dst_account_id,
-    old_balance_dest,
-    new_balance_dest,
-    (new_balance_dest - old_balance_dest) AS dst_balance_change,
-    is_fraud,
-    is_flagged_fraud
-FROM raw_transactions;
-"""
-
-print("Creating table 'clean_transactions' in SQLite using SQL...")
+# TRANSFORM_ENGINE in .env picks the SQL (see transform_sql.py):
+#   arith  (default) - integer arithmetic, one datetime() per row
+#   lookup           - join a ~750-row step -> calendar table
+#   legacy           - the original datetime/strftime expressions
+# benchmark_transform.py times them against each other on the full table.
+transform_engine = os.getenv("TRANSFORM_ENGINE", "arith").lower()
+
+if transform_engine not in TRANSFORM_ENGINES:
+    print(f"ERROR: TRANSFORM_ENGINE must be one of {TRANSFORM_ENGINES}, got '{transform_engine}'")
+    sys.exit(1)
+
+create_sql = build_clean_sql(transform_engine)
+
+print(f"Creating table 'clean_transactions' in SQLite using SQL (engine: {transform_engine})...")
 
 try:
     with engine.begin() as conn:
@@ -84,7 +74,9 @@ try:
             stmt = statement.strip()
             if stmt:
                 conn.execute(text(stmt + ";"))
-    print("✅ Successfully created table 'clean_transactions'.")
+        # CREATE TABLE AS carries no indexes; re-apply the declared ones
+        apply_indexes(conn, "clean_transactions")
+    print("✅ Successfully created table 'clean_transactions' (with indexes).")
 except Exception as e:
     print("❌ Failed to create 'clean_transactions' table.")
     print(e)